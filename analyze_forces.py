@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+#
+# This reads the wing force history (e.g. wingForces64M.dat), detects
+# the end of the transient and reports the statistics of the lift and
+# drag after it: mean, standard deviation, number of independent
+# samples and standard error of the mean. It also gives the number of
+# Exodus outputs after the transient, i.e. the averaging window of the
+# slice averaging scripts.
+#
+# With --follow, the file is read again as it grows until the
+# statistics are converged, and --on-converged runs a command (e.g. to
+# cancel the job) once they are.
+#
+# Run this in the run directory, e.g. from /scratch/mhenryde/McalisterWing/DES:
+#    > /path/to/script/analyze_forces.py wingForces64M.dat --follow --on-converged "scancel 1234"
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import time
+import subprocess
+from forces import ForceReader, ForceHistory
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def is_converged(stats, tol, min_samples):
+    """True if the mean of each signal is known within tol"""
+    for name in ForceHistory.signals:
+        s = stats[name]
+        if s['neff'] < min_samples or s['sem'] > tol * abs(s['mean']):
+            return False
+    return True
+
+
+def report(stats, output_frequency):
+    """Print the statistics"""
+    print('Steps: {0:d}, transient cutoff: step {1:d} (time {2:e})'.format(
+        stats['nsteps'], stats['cutoff'], stats['cutoff_time']))
+    for name in ForceHistory.signals:
+        s = stats[name]
+        print('  {0:s}: mean {1:e}, std {2:e}, g {3:.1f}, '
+              'independent samples {4:.1f}, sem {5:e} ({6:.2%})'.format(
+                  name, s['mean'], s['std'], s['g'], s['neff'], s['sem'],
+                  s['sem'] / abs(s['mean']) if s['mean'] else float('nan')))
+    navg = (stats['nsteps'] - stats['cutoff']) // output_frequency
+    print('  averaging window: {0:d} outputs'.format(navg))
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Statistics of the wing force history')
+    parser.add_argument(
+        'fname', help='Force file', nargs='?', default='wingForces64M.dat')
+    parser.add_argument(
+        '-f', '--follow', help='Read the file as it grows until converged',
+        action='store_true')
+    parser.add_argument(
+        '-i', '--interval', help='Seconds between reads with --follow',
+        type=float, default=60)
+    parser.add_argument(
+        '-t', '--tol',
+        help='Convergence tolerance on the relative standard error',
+        type=float, default=0.01)
+    parser.add_argument(
+        '-m', '--min-samples', help='Minimum number of independent samples',
+        type=float, default=20)
+    parser.add_argument(
+        '--output-frequency', help='Time steps between Exodus outputs',
+        type=int, default=400)
+    parser.add_argument(
+        '--on-converged', help='Shell command to run once converged')
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Read and analyze
+    reader = ForceReader(args.fname)
+    history = ForceHistory()
+    while True:
+        history.update(reader.read())
+        if len(history) > 1:
+            stats = history.analyze()
+            report(stats, args.output_frequency)
+            converged = is_converged(stats, args.tol, args.min_samples)
+            if converged:
+                print('Converged')
+                if args.on_converged:
+                    subprocess.run(args.on_converged, shell=True)
+                break
+        if not args.follow:
+            break
+        time.sleep(args.interval)
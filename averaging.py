@@ -0,0 +1,271 @@
+#
+# Temporal averaging of slice data
+#
+# The averagers fold one time step at a time into running accumulators
+# so that the memory footprint does not grow with the number of
+# averaged time steps. Points are identified by integer IDs (see
+# PointIndex) so that each time step is a bincount scatter-add.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import hashlib
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from slice_io import point_columns
+
+
+# ========================================================================
+#
+# Class definitions
+#
+# ========================================================================
+class PointIndex:
+    """Stable integer IDs of the points of a slice
+
+    Points within the tolerance `tol` of each other (e.g. a point
+    printed differently by two ranks, or duplicated on a partition
+    boundary) get a single ID. The members of an ID can chain further
+    than `tol` apart, so a point is looked up as the member within
+    `tol` of it and the point of an ID is the centroid of its members.
+    With `fold_y`, the points at -y and y are merged (symmetric wing
+    slices). IDs are in lexicographic order of (x, y, z).
+    """
+
+    def __init__(self, points, tol=1e-6, fold_y=False):
+        self.tol = tol
+        self.fold_y = fold_y
+        points = self._fold(points)
+
+        # Quantized keys remove the exact duplicates cheaply, then the
+        # keys on either side of a rounding boundary are merged
+        keys = np.round(points / tol).astype(np.int64)
+        keys, first, ids = np.unique(keys, axis=0, return_index=True,
+                                     return_inverse=True)
+        candidates = points[first]
+        pairs = cKDTree(candidates).query_pairs(tol, output_type='ndarray')
+        n = len(candidates)
+        graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])),
+                           shape=(n, n))
+        _, labels = connected_components(graph, directed=False)
+        count = np.bincount(labels)
+
+        self.members = candidates
+        self.labels = labels
+        self.points = np.column_stack(
+            [np.bincount(labels, weights=candidates[:, k]) / count
+             for k in range(candidates.shape[1])])
+        self.tree = cKDTree(candidates)
+        self._cache = (np.array(points, dtype=np.float64),
+                       labels[ids.ravel()])
+
+    def __len__(self):
+        return len(self.points)
+
+    def _fold(self, points):
+        points = np.array(points, dtype=np.float64)
+        if self.fold_y:
+            points[:, 1] = np.abs(points[:, 1])
+        return points
+
+    def lookup(self, points):
+        """IDs of an array of points"""
+        cached, ids = self._cache
+        if points.shape == cached.shape and np.array_equal(points, cached):
+            return ids
+
+        dist, nearest = self.tree.query(self._fold(points),
+                                        distance_upper_bound=self.tol)
+        if np.isinf(dist).any():
+            raise ValueError('Points are missing from the point index')
+        ids = self.labels[nearest]
+        self._cache = (np.array(points, dtype=np.float64), ids)
+        return ids
+
+    def digest(self):
+        """Hash of the members and options of the index"""
+        sha = hashlib.sha1(np.ascontiguousarray(self.members).tobytes())
+        sha.update('{0!r} {1!r}'.format(self.tol, self.fold_y).encode())
+        return sha.hexdigest()
+
+    def save(self, fname):
+        """Save the index (its members) to a npz file"""
+        np.savez(fname, members=self.members, tol=self.tol,
+                 fold_y=self.fold_y)
+
+    @classmethod
+    def load(cls, fname):
+        """Load an index saved with `save`"""
+        dat = np.load(fname)
+        return cls(dat['members'], tol=float(dat['tol']),
+                   fold_y=bool(dat['fold_y']))
+
+
+class StreamingAverager:
+    """Running mean and variance of slice fields at each point
+
+    The accumulators are the per-point counts, sums and sums of
+    squares of the fields, shifted by the values of the first time
+    step to limit the round-off in the variance. Time steps can be
+    added and removed (sliding windows) and the accumulators saved to
+    resume the average when new time steps are available. The saved
+    accumulators record the point index they were made with.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.fields = None
+        self.steps = []
+        self.count = np.zeros(len(index))
+        self.shift = None
+        self.sum = None
+        self.sumsq = None
+
+    def _accumulate(self, df, sign):
+        if self.fields is None:
+            self.fields = [col for col in df.columns
+                           if col not in point_columns]
+            shape = (len(self.fields), len(self.index))
+            self.shift = np.zeros(shape)
+            self.sum = np.zeros(shape)
+            self.sumsq = np.zeros(shape)
+            initialize = True
+        else:
+            initialize = False
+
+        n = len(self.index)
+        ids = self.index.lookup(df[point_columns].values)
+        count = np.bincount(ids, minlength=n)
+        if initialize:
+            found = count > 0
+            for j, field in enumerate(self.fields):
+                self.shift[j, found] = (
+                    np.bincount(ids, weights=df[field].values, minlength=n)
+                    [found] / count[found])
+
+        self.count += sign * count
+        for j, field in enumerate(self.fields):
+            values = df[field].values.astype(np.float64) - self.shift[j, ids]
+            self.sum[j] += sign * np.bincount(ids, weights=values,
+                                              minlength=n)
+            self.sumsq[j] += sign * np.bincount(ids, weights=values**2,
+                                                minlength=n)
+
+    def add(self, df, step=None):
+        """Fold a dataframe of one time step into the accumulators"""
+        self._accumulate(df, 1)
+        self.steps.append(step)
+
+    def remove(self, df, step=None):
+        """Take a time step previously added out of the accumulators"""
+        self._accumulate(df, -1)
+        self.steps.remove(step)
+
+    def save(self, fname):
+        """Save the accumulators to a npz file"""
+        np.savez(fname, fields=np.array(self.fields), steps=self.steps,
+                 count=self.count, shift=self.shift, sum=self.sum,
+                 sumsq=self.sumsq, npoints=len(self.index),
+                 index=self.index.digest())
+
+    @classmethod
+    def load(cls, fname, index):
+        """Load accumulators saved with `save`
+
+        Accumulators saved with another point index are discarded (an
+        empty averager is returned).
+        """
+        dat = np.load(fname)
+        averager = cls(index)
+        if ('index' not in dat or str(dat['index']) != index.digest()
+                or len(dat['count']) != len(index)):
+            return averager
+        averager.fields = [str(field) for field in dat['fields']]
+        averager.steps = [int(step) for step in dat['steps']]
+        averager.count = dat['count']
+        averager.shift = dat['shift']
+        averager.sum = dat['sum']
+        averager.sumsq = dat['sumsq']
+        return averager
+
+    def _frame(self, values):
+        df = pd.DataFrame(self.index.points, columns=point_columns)
+        for j, field in enumerate(self.fields):
+            df[field] = values[j]
+        return df[self.count > 0].reset_index(drop=True)
+
+    def _variance(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.sum / self.count
+            return np.maximum(self.sumsq / self.count - mean**2, 0.0)
+
+    def average(self):
+        """Dataframe of the mean at each point"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._frame(self.shift + self.sum / self.count)
+
+    def variance(self):
+        """Dataframe of the (population) variance at each point"""
+        return self._frame(self._variance())
+
+    def rms(self):
+        """Dataframe of the root mean square fluctuation at each point"""
+        return self._frame(np.sqrt(self._variance()))
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def build_index(steps, read_step, nsteps=2, **kwargs):
+    """Point index of the union of the points of the last time steps
+
+    The last time step may still be written (or partially sampled) and
+    miss points, so the points of the last `nsteps` steps are merged.
+    """
+    points = [read_step(step)[point_columns].values
+              for step in sorted(steps)[-nsteps:]]
+    return PointIndex(np.concatenate(points), **kwargs)
+
+
+def update_windows(averagers, steps, read_step):
+    """Bring sliding window averagers up to date with the time steps
+
+    `averagers` maps a window length to an averager (possibly loaded
+    from a previous run). Each averager is updated to cover the last
+    window length time steps by adding the new steps and removing the
+    steps that dropped out of the window. Every time step is read at
+    most once for all windows. Averagers whose steps can no longer be
+    read, or that do not match their point index, are restarted from
+    scratch.
+    """
+    steps = sorted(steps)
+    for nwin, averager in averagers.items():
+        if (not set(averager.steps) <= set(steps)
+                or len(averager.count) != len(averager.index)):
+            averagers[nwin] = StreamingAverager(averager.index)
+
+    needed = {}
+    for nwin, averager in averagers.items():
+        window = set(steps[-nwin:])
+        for step in window - set(averager.steps):
+            needed.setdefault(step, []).append((averager, 1))
+        for step in set(averager.steps) - window:
+            needed.setdefault(step, []).append((averager, -1))
+
+    for step in sorted(needed):
+        df = read_step(step)
+        for averager, sign in needed[step]:
+            if sign > 0:
+                averager.add(df, step)
+            else:
+                averager.remove(df, step)
+
+    return averagers
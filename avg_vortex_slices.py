@@ -11,28 +11,14 @@
 # Imports
 #
 # ========================================================================
+import argparse
 import sys
 import os
-import re
-import glob
-import numpy as np
-import pandas as pd
-
-
-# ========================================================================
-#
-# Function definitions
-#
-# ========================================================================
-def get_merged_csv(fnames, **kwargs):
-    lst = []
-    for fname in fnames:
-        try:
-            df = pd.read_csv(fname, **kwargs)
-            lst.append(df)
-        except pd.io.common.EmptyDataError:
-            pass
-    return pd.concat(lst, ignore_index=True)
+from averaging import (PointIndex, StreamingAverager, build_index,
+                       update_windows)
+from slice_io import open_slices
+import instrument
+from instrument import stage
 
 
 # ========================================================================
@@ -42,37 +28,95 @@ def get_merged_csv(fnames, **kwargs):
 # ========================================================================
 if __name__ == '__main__':
 
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Temporal average of the last slices')
+    parser.add_argument(
+        '-n', '--navg', help='Number of time steps to average', type=int,
+        default=20)
+    parser.add_argument(
+        '-p', '--nprocs', help='Number of processes reading the files',
+        type=int, default=1)
+    parser.add_argument(
+        '-w', '--windows', help='Additional numbers of time steps to average',
+        type=int, nargs='+', default=[])
+    parser.add_argument(
+        '--stream', help='Average one time step at a time (constant memory)',
+        action='store_true')
+    parser.add_argument(
+        '--restart', help='Rebuild the point index and ignore the saved '
+        'state of the streaming average',
+        action='store_true')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+    instrument.setup(args)
+
     # ========================================================================
     # Setup
     fdir = os.getcwd()
     oname = os.path.join(fdir, 'avg_slice.csv')
+    iname = os.path.join(fdir, 'point_index.npz')
     prefix = 'output'
-    suffix = '.csv'
 
     # average over these time steps
-    navg = 20
+    navg = args.navg
+
+    # Get time steps (from the columnar store if there is one), keep
+    # only last navg steps (the streaming average handles its windows)
+    with stage('discover') as s:
+        times, read_step = open_slices(fdir, prefix, nprocs=args.nprocs)
+        s['rows'] = len(times)
+    if not args.stream:
+        times = times[-navg:]
+
+    def read(time):
+        with stage('read') as s:
+            df = read_step(time)
+            s['rows'] = len(df)
+            s['bytes'] = df.memory_usage().sum()
+        return df
+
+    # Integer IDs of the points of the slices
+    with stage('index'):
+        if os.path.exists(iname) and not args.restart:
+            index = PointIndex.load(iname)
+        else:
+            index = build_index(times, read_step)
+            index.save(iname)
 
-    # Get time steps, keep only last navg steps
-    pattern = prefix + '*' + suffix
-    fnames = sorted(glob.glob(os.path.join(fdir, pattern)))
-    times = []
-    for fname in fnames:
-        times.append(int(re.findall(r'\d+', fname)[-1]))
-    times = np.unique(sorted(times))[-navg:]
+    # Streaming average: update the saved accumulators of each window
+    # with the new time steps, removing those that dropped out
+    if args.stream:
+        averagers = {}
+        snames = {nwin: os.path.join(fdir, 'avg_state_n{0:d}.npz'.format(nwin))
+                  for nwin in [navg] + args.windows}
+        for nwin, sname in snames.items():
+            if os.path.exists(sname) and not args.restart:
+                averagers[nwin] = StreamingAverager.load(sname, index)
+            else:
+                averagers[nwin] = StreamingAverager(index)
+        with stage('stream'):
+            update_windows(averagers, times, read)
 
-    # Loop over each time step and get the dataframe
-    lst = []
-    for time in times:
-        pattern = prefix + '*.' + str(time) + suffix
-        fnames = sorted(glob.glob(os.path.join(fdir, pattern)))
-        df = get_merged_csv(fnames)
-        lst.append(df)
-        df['time'] = time
-    df = pd.concat(lst, ignore_index=True)
+        for nwin, averager in averagers.items():
+            tag = '' if nwin == navg else '_n{0:d}'.format(nwin)
+            with stage('write', rows=len(averager.index)):
+                averager.save(snames[nwin])
+                averager.average().to_csv(
+                    os.path.join(fdir, 'avg_slice{0:s}.csv'.format(tag)),
+                    index=False)
+                averager.rms().to_csv(
+                    os.path.join(fdir, 'rms_slice{0:s}.csv'.format(tag)),
+                    index=False)
+        sys.exit()
 
-    # Average
-    avgdf = df.groupby(['Points:0', 'Points:1', 'Points:2'],
-                       as_index=False).mean()
+    # Average the last navg time steps, one at a time
+    averager = StreamingAverager(index)
+    with stage('stream'):
+        for time in times:
+            averager.add(read(time), time)
 
     # Output to file
-    avgdf.to_csv(oname, index=False)
+    with stage('write', rows=len(index)):
+        averager.average().to_csv(oname, index=False)
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+#
+# This benchmarks the averaging and plotting stages on synthetic slice
+# directories, so that their scaling can be measured (and regressions
+# caught) without the simulation data.
+#
+# The synthetic directories look like those written by the ParaView
+# scripts (pp_vortex.py, pp_wing.py): one output<rank>.<step>.csv file
+# per rank and time step, with the ParaView column names, 5 decimals,
+# and the points on the partition boundaries written by both ranks.
+# The sizes are set by presets equivalent to the 64M and 300M meshes
+# (scaled with --scale) or by the command line.
+#
+# Each stage (index, average, streaming average, interpolate, render)
+# is timed and its peak resident memory is measured. The results are
+# written to a JSON file and compared to a baseline with --baseline.
+#
+# Generate the 64M-equivalent directories and benchmark them:
+#    > /path/to/script/benchmark.py run --sizes 64M -o bench
+#
+# Quick check against a saved baseline at a tenth of the size:
+#    > /path/to/script/benchmark.py run --sizes 64M 300M --scale 0.1 --baseline bench/baseline.json
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from slice_io import open_slices, point_columns
+from averaging import StreamingAverager, build_index, update_windows
+from vortex import get_slice_ids
+from wing import sort_sections, sectional_coefficients
+from compare import renames, core_lineouts
+from rendering import render
+from instrument import reset_peak_rss, peak_rss
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+# Points per time step of the slices (all ranks, without the
+# duplicates) and number of ranks writing them. The 300M sizes are the
+# 64M ones scaled by the ratio of the surface mesh sizes (300/64)^(2/3).
+sizes = {'64M': {'vortex': {'npoints': 320000, 'nranks': 64},
+                 'wing': {'npoints': 64000, 'nranks': 64}},
+         '300M': {'vortex': {'npoints': 900000, 'nranks': 256},
+                  'wing': {'npoints': 180000, 'nranks': 256}}}
+
+vortex_offsets = [0.0, 0.1, 0.2, 0.5, 1.0, 2.0, 4.0, 6.0]
+wing_offsets = [0.0, 0.0198, 0.0528, 0.0858, 0.1353, 0.1848, 0.3333,
+                0.5181, 0.7491, 1.0164, 1.3299, 1.6797, 2.079, 2.5146,
+                2.9898]
+columns = {'vortex': ['pressure', 'velocity_:0', 'velocity_:1',
+                      'velocity_:2'],
+           'wing': ['pressure', 'pressure_force_:0', 'pressure_force_:1',
+                    'pressure_force_:2', 'tau_wall', 'velocity_:0',
+                    'velocity_:1', 'velocity_:2']}
+
+u0 = 150.0
+rho0 = 0.0023
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def vortex_points(npoints):
+    """Points of the vortex slices (y-z grids at each x)"""
+    n = max(2, int(np.sqrt(npoints / len(vortex_offsets))))
+    grid = np.linspace(-1.0, 1.0, n)
+    x, y, z = np.meshgrid(1.0 + np.array(vortex_offsets), grid, grid,
+                          indexing='ij')
+    return np.column_stack((x.ravel(), y.ravel(), z.ravel()))
+
+
+def wing_points(npoints):
+    """Points of the wing sections (NACA 0015 at each span station)
+
+    The stations are mirrored at -y, so that the averages fold them.
+    """
+    stations = np.unique(np.concatenate((wing_offsets,
+                                         np.negative(wing_offsets))))
+    n = max(4, npoints // len(stations))
+    theta = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    xc = 0.5 * (1 - np.cos(theta))
+    t = 0.15
+    zc = 5 * t * (0.2969 * np.sqrt(xc) - 0.1260 * xc - 0.3516 * xc**2
+                  + 0.2843 * xc**3 - 0.1036 * xc**4)
+    zc[theta > np.pi] *= -1
+    y = np.repeat(stations, n)
+    return np.column_stack((np.tile(xc, len(stations)), y,
+                            np.tile(zc, len(stations))))
+
+
+def get_points(kind, npoints):
+    """Points of the vortex or wing slices"""
+    if kind == 'vortex':
+        return vortex_points(npoints)
+    return wing_points(npoints)
+
+
+def vortex_fields(points, rng, rc=0.05, yc=0.03, zc=0.0):
+    """Fields of a Lamb-Oseen vortex with random fluctuations"""
+    y = points[:, 1] - yc
+    z = points[:, 2] - zc
+    r2 = y**2 + z**2 + 1e-12
+    g = np.exp(-r2 / rc**2)
+    vt = 0.4 * u0 * rc / np.sqrt(r2) * (1 - g)
+    noise = 0.02 * u0 * rng.standard_normal((len(points), 3))
+    return {'pressure': -0.5 * rho0 * (0.4 * u0)**2 * g
+            + 0.01 * rng.standard_normal(len(points)),
+            'velocity_:0': u0 * (1 + 0.05 * g) + noise[:, 0],
+            'velocity_:1': -vt * z / np.sqrt(r2) + noise[:, 1],
+            'velocity_:2': vt * y / np.sqrt(r2) + noise[:, 2]}
+
+
+def wing_fields(points, rng):
+    """Surface fields of a wing section with random fluctuations"""
+    x = points[:, 0]
+    upper = points[:, 2] > 0
+    cp = np.where(upper, -2.0 * np.exp(-8 * x), 0.5 * np.exp(-8 * x)) \
+        * (1 - np.abs(points[:, 1]) / 3.3)**0.5
+    p = 0.5 * rho0 * u0**2 * (cp + 0.02 * rng.standard_normal(len(x)))
+    fields = {'pressure': p,
+              'pressure_force_:0': 1e-3 * p,
+              'pressure_force_:1': np.zeros(len(x)),
+              'pressure_force_:2': -1e-2 * p * np.where(upper, 1, -1),
+              'tau_wall': 0.01 * np.abs(rng.standard_normal(len(x)))}
+    for k in range(3):
+        fields['velocity_:{0:d}'.format(k)] = np.zeros(len(x))
+    return fields
+
+
+def get_partition(npoints, nranks, duplicates):
+    """Rows of the points written by each rank
+
+    The points are split in contiguous blocks and each rank also
+    writes the first `duplicates` fraction of the next block (the
+    points on the partition boundary).
+    """
+    bounds = np.linspace(0, npoints, nranks + 1).astype(np.int64)
+    parts = []
+    for k in range(nranks):
+        end = bounds[k + 1]
+        if k < nranks - 1:
+            end += int(np.ceil(duplicates * (bounds[k + 2] - bounds[k + 1])))
+        parts.append(np.arange(bounds[k], end))
+    return parts
+
+
+def write_rank(fname, df):
+    """Write a rank's slice like ParaView (quoted header, 5 decimals)"""
+    with open(fname, 'w') as f:
+        f.write(','.join('"{0:s}"'.format(c) for c in df.columns) + '\n')
+        df.to_csv(f, header=False, index=False, float_format='%.5f')
+
+
+def _write_step(args):
+    """Write all the rank files of one time step"""
+    fdir, kind, points, parts, step, seed = args
+    rng = np.random.default_rng(seed)
+    if kind == 'vortex':
+        fields = vortex_fields(points, rng)
+    else:
+        fields = wing_fields(points, rng)
+    df = pd.DataFrame({col: fields[col] for col in columns[kind]})
+    for k, col in enumerate(point_columns):
+        df[col] = points[:, k]
+    nbytes = 0
+    for rank, rows in enumerate(parts):
+        fname = os.path.join(fdir, 'output{0:d}.{1:d}.csv'.format(rank, step))
+        write_rank(fname, df.iloc[rows])
+        nbytes += os.path.getsize(fname)
+    return nbytes
+
+
+def generate(fdir, kind, npoints, nranks, nsteps, duplicates=0.01,
+             output_frequency=400, nprocs=1, seed=0):
+    """Write a synthetic slice directory, returns its size in bytes"""
+    os.makedirs(fdir, exist_ok=True)
+    points = get_points(kind, npoints)
+    parts = get_partition(len(points), nranks, duplicates)
+    todo = [(fdir, kind, points, parts, k * output_frequency, seed + k)
+            for k in range(nsteps)]
+    if nprocs > 1:
+        with ProcessPoolExecutor(max_workers=nprocs) as executor:
+            nbytes = sum(executor.map(_write_step, todo))
+    else:
+        nbytes = sum(_write_step(args) for args in todo)
+    with open(os.path.join(fdir, 'benchmark.json'), 'w') as f:
+        json.dump({'kind': kind, 'npoints': len(points), 'nranks': nranks,
+                   'nsteps': nsteps, 'duplicates': duplicates,
+                   'rows': int(sum(len(rows) for rows in parts)) * nsteps,
+                   'bytes': nbytes}, f, indent=2)
+    return nbytes
+
+
+def is_generated(fdir, kind, npoints, nranks, nsteps, duplicates):
+    """True if a directory was generated with these settings"""
+    fname = os.path.join(fdir, 'benchmark.json')
+    if not os.path.exists(fname):
+        return False
+    with open(fname, 'r') as f:
+        case = json.load(f)
+    return (case['kind'], case['npoints'], case['nranks'], case['nsteps'],
+            case['duplicates']) == \
+        (kind, len(get_points(kind, npoints)), nranks, nsteps, duplicates)
+
+
+def timed(stages, name, func, *args):
+    """Run a stage, record its wall time and peak memory"""
+    reset_peak_rss()
+    start = time.perf_counter()
+    out = func(*args)
+    stages[name] = {'time': time.perf_counter() - start,
+                    'peak_rss_mb': peak_rss()}
+    print('  {0:<12s} {1:8.2f} s {2:10.1f} MB'.format(
+        name, stages[name]['time'], stages[name]['peak_rss_mb']),
+        flush=True)
+    return out
+
+
+def index_points(fdir, kind, navg, nprocs):
+    """Point index of the last navg time steps of a slice directory"""
+    times, read_step = open_slices(fdir, nprocs=nprocs)
+    times = times[-navg:]
+    return times, read_step, build_index(times, read_step,
+                                         fold_y=kind == 'wing')
+
+
+def average(times, read_step, index):
+    """Average of the time steps as in avg_*_slices.py"""
+    averager = StreamingAverager(index)
+    for time in times:
+        averager.add(read_step(time), time)
+    return averager.average()
+
+
+def stream_average(fdir, kind, navg, nprocs):
+    """Streaming average of the time steps as in avg_*_slices.py --stream"""
+    times, read_step = open_slices(fdir, nprocs=nprocs)
+    index = build_index(times, read_step, fold_y=kind == 'wing')
+    averagers = update_windows({navg: StreamingAverager(index)}, times,
+                               read_step)
+    return averagers[navg].average()
+
+
+def interpolate(avgdf, kind, cache_dir):
+    """Lineouts of the vortex slices or sectional loads of the wing"""
+    df = avgdf.rename(columns=renames)
+    if kind == 'vortex':
+        xslices, _ = get_slice_ids(df['x'].values)
+        return [core_lineouts(df, x, cache_dir=cache_dir) for x in xslices]
+    df['cp'] = df['p'] / (0.5 * rho0 * u0**2)
+    df, starts = sort_sections(df)
+    return df, starts, sectional_coefficients(df, starts)
+
+
+def get_figures(out, kind, odir):
+    """Figures of the plot scripts for the interpolated data"""
+    if kind == 'vortex':
+        from plot_vortex import plot_lineout
+        figures = []
+        for k, (y, lines) in enumerate(out):
+            for field in lines:
+                figures.append((plot_lineout,
+                                os.path.join(odir, '{0:s}_{1:d}.png'.format(
+                                    field, k)),
+                                {'lines': [{'y': y, 'u': lines[field] / u0,
+                                            'color': 'k',
+                                            'dashes': (None, None),
+                                            'label': 'bench'}],
+                                 'exp': {'y': [], 'u': [], 'label': None},
+                                 'ylabel': field}))
+        return figures
+
+    from plot_wing import plot_cp
+    df, starts, _ = out
+    xs = np.split(df['x'].values, starts[1:])
+    cps = np.split(-df['cp'].values, starts[1:])
+    return [(plot_cp, os.path.join(odir, 'cp_{0:d}.png'.format(k)),
+             {'lines': [{'x': x, 'cp': cp, 'color': 'k',
+                         'dashes': (None, None), 'label': 'bench'}]})
+            for k, (x, cp) in enumerate(zip(xs, cps))]
+
+
+def benchmark(fdir, kind, navg, nprocs=1):
+    """Time the stages on a slice directory"""
+    with open(os.path.join(fdir, 'benchmark.json'), 'r') as f:
+        case = json.load(f)
+    odir = os.path.join(fdir, 'results')
+    os.makedirs(odir, exist_ok=True)
+    stages = {}
+    times, read_step, index = timed(stages, 'index', index_points, fdir,
+                                    kind, navg, nprocs)
+    stages['index']['rows'] = len(index)
+    avgdf = timed(stages, 'average', average, times, read_step, index)
+    stages['average']['rows'] = len(avgdf)
+    timed(stages, 'stream', stream_average, fdir, kind, navg, nprocs)
+    out = timed(stages, 'interpolate', interpolate, avgdf, kind,
+                os.path.join(odir, 'cache'))
+    figures = get_figures(out, kind, odir)
+    timed(stages, 'render', render, figures, 1, True,
+          os.path.join(odir, '.render_cache.json'), True)
+    stages['render']['figures'] = len(figures)
+    for stage in stages.values():
+        if 'rows' in stage and stage['time'] > 0:
+            stage['rows_per_s'] = stage['rows'] / stage['time']
+    case.update({'navg': navg, 'nprocs': nprocs, 'stages': stages})
+    return case
+
+
+def regressions(results, baseline, tol):
+    """Stages slower or larger than in the baseline by more than tol"""
+    ref = {(c['size'], c['kind']): c['stages'] for c in baseline['cases']}
+    lst = []
+    for case in results['cases']:
+        stages = ref.get((case['size'], case['kind']), {})
+        for name, stage in case['stages'].items():
+            if name not in stages:
+                continue
+            for key in ['time', 'peak_rss_mb']:
+                ratio = stage[key] / max(stages[name][key], 1e-12)
+                if ratio > 1 + tol:
+                    lst.append((case['size'], case['kind'], name, key, ratio))
+    return lst
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Benchmark the averaging and plotting stages')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    gen = subparsers.add_parser(
+        'generate', help='Write a synthetic slice directory')
+    gen.add_argument('odir', help='Slice directory')
+    gen.add_argument(
+        '-k', '--kind', help='Vortex or wing slices',
+        choices=['vortex', 'wing'], default='vortex')
+    gen.add_argument(
+        '--npoints', help='Points per time step', type=int, default=320000)
+    gen.add_argument(
+        '--nranks', help='Number of ranks', type=int, default=64)
+
+    run = subparsers.add_parser(
+        'run', help='Generate the directories of the presets and benchmark')
+    run.add_argument(
+        '--sizes', help='Mesh size presets', nargs='+',
+        choices=sorted(sizes), default=['64M'])
+    run.add_argument(
+        '--kinds', help='Slice kinds', nargs='+',
+        choices=['vortex', 'wing'], default=['vortex', 'wing'])
+    run.add_argument(
+        '--scale', help='Scale factor of the number of points', type=float,
+        default=1.0)
+    run.add_argument(
+        '-o', '--odir', help='Directory of the benchmark', default='bench')
+    run.add_argument(
+        '--navg', help='Number of time steps to average', type=int,
+        default=20)
+    run.add_argument(
+        '--baseline', help='Results to compare to (exit 1 on regression)')
+    run.add_argument(
+        '--tol', help='Tolerated relative slowdown or memory growth',
+        type=float, default=0.2)
+
+    for sub in [gen, run]:
+        sub.add_argument(
+            '-n', '--nsteps', help='Number of time steps', type=int,
+            default=20)
+        sub.add_argument(
+            '--duplicates',
+            help='Fraction of the points of a rank also written by another',
+            type=float, default=0.01)
+        sub.add_argument(
+            '-p', '--nprocs', help='Number of processes', type=int,
+            default=1)
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Generate
+    if args.command == 'generate':
+        nbytes = generate(args.odir, args.kind, args.npoints, args.nranks,
+                          args.nsteps, args.duplicates, nprocs=args.nprocs)
+        print('Wrote {0:.1f} MB in {1:s}'.format(nbytes / 1024**2,
+                                                 args.odir))
+        sys.exit()
+
+    # ========================================================================
+    # Benchmark the presets
+    results = {'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'machine': platform.node(),
+               'platform': platform.platform(),
+               'python': platform.python_version(),
+               'numpy': np.__version__,
+               'pandas': pd.__version__,
+               'scale': args.scale,
+               'cases': []}
+    for size in args.sizes:
+        for kind in args.kinds:
+            npoints = int(args.scale * sizes[size][kind]['npoints'])
+            nranks = sizes[size][kind]['nranks']
+            fdir = os.path.join(args.odir, '{0:s}_slices{1:s}'.format(
+                kind, size))
+            if args.scale != 1:
+                fdir += '_x{0:g}'.format(args.scale)
+            if not is_generated(fdir, kind, npoints, nranks, args.nsteps,
+                                args.duplicates):
+                print('Generating {0:s}'.format(fdir), flush=True)
+                shutil.rmtree(fdir, ignore_errors=True)
+                generate(fdir, kind, npoints, nranks, args.nsteps,
+                         args.duplicates, nprocs=args.nprocs)
+            print('{0:s} {1:s}'.format(size, kind), flush=True)
+            case = benchmark(fdir, kind, min(args.navg, args.nsteps),
+                             args.nprocs)
+            case.update({'size': size, 'kind': kind})
+            results['cases'].append(case)
+
+    oname = os.path.join(args.odir, 'results_{0:s}.json'.format(
+        time.strftime('%Y%m%d_%H%M%S')))
+    with open(oname, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('Results in ' + oname)
+
+    # ========================================================================
+    # Compare to the baseline
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        lst = regressions(results, baseline, args.tol)
+        for size, kind, name, key, ratio in lst:
+            print('Regression: {0:s} {1:s} {2:s} {3:s} x{4:.2f}'.format(
+                size, kind, name, key, ratio))
+        if lst:
+            sys.exit(1)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+#
+# This indexes the run directories (input decks, job scripts, Exodus
+# output, slice directories) in a local SQLite catalog, so that the
+# time steps and per-rank files of a slice directory are known without
+# globbing a directory of tens of thousands of files on scratch.
+#
+# A directory is only listed again (with a single os.scandir) if its
+# mtime changed since it was indexed, so updating the catalog after a
+# run produced new data only lists the directories that changed.
+#
+# Run this from the top directory, e.g. /scratch/mhenryde/McalisterWing:
+#    > /path/to/script/catalog.py DES NSO viz_runs
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+import re
+import sqlite3
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+# The catalog is kept on a local file system by default (SQLite locking
+# is not reliable on Lustre)
+default_db = os.environ.get(
+    'MCALISTER_CATALOG',
+    os.path.join(os.path.expanduser('~'), '.mcalister_catalog.sqlite'))
+
+schema = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT,
+    name TEXT,
+    kind TEXT,
+    size INTEGER,
+    mtime REAL,
+    prefix TEXT,
+    rank INTEGER,
+    step INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir, kind, prefix);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE VIEW IF NOT EXISTS runs AS
+    SELECT dir, name AS deck, mtime FROM files WHERE kind = 'deck';
+CREATE VIEW IF NOT EXISTS steps AS
+    SELECT dir, prefix, step, COUNT(*) AS nfiles, SUM(size) AS size
+    FROM files WHERE kind = 'slice' GROUP BY dir, prefix, step;
+"""
+
+# e.g. output12.400.csv (rank 12, step 400) or output.400.npz (step 400)
+slice_pattern = re.compile(r'^([A-Za-z_]+?)(\d*)\.(\d+)\.(csv|npz)$')
+
+# e.g. mcalisterWing.e.2880.12 (rank 12)
+exodus_pattern = re.compile(r'\.e(\.\d+\.(\d+))?$')
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def connect(db=None):
+    """Connect to the catalog (created if it does not exist)"""
+    conn = sqlite3.connect(db or default_db, timeout=60)
+    conn.executescript(schema)
+    return conn
+
+
+def classify(name):
+    """Kind, prefix, rank and step of a file from its name"""
+    m = slice_pattern.match(name)
+    if m:
+        return ('slice', m.group(1),
+                int(m.group(2)) if m.group(2) else None, int(m.group(3)))
+    m = exodus_pattern.search(name)
+    if m:
+        return ('exodus', None,
+                int(m.group(2)) if m.group(2) else None, None)
+
+    ext = os.path.splitext(name)[1]
+    if ext == '.i':
+        return 'deck', None, None, None
+    if ext in ('.job', '.pbs', '.sh'):
+        return 'job', None, None, None
+    if re.match(r'^\.(o\d*|log|out)$', ext):
+        return 'log', None, None, None
+    return 'other', None, None, None
+
+
+def index_dir(conn, path, parent, mtime):
+    """List a directory and replace its files in the catalog
+
+    Returns the paths of its subdirectories.
+    """
+    rows = []
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                st = entry.stat()
+                rows.append((entry.path, path, entry.name)
+                            + (st.st_size, st.st_mtime)
+                            + classify(entry.name))
+
+    conn.execute('DELETE FROM files WHERE dir = ?', (path,))
+    conn.executemany('INSERT INTO files (path, dir, name, size, mtime, '
+                     'kind, prefix, rank, step) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.execute('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)',
+                 (path, parent, mtime))
+    return subdirs
+
+
+def remove_dir(conn, path):
+    """Remove a directory and everything below it from the catalog"""
+    below = path.rstrip(os.sep) + os.sep + '%'
+    conn.execute('DELETE FROM files WHERE dir = ? OR dir LIKE ?',
+                 (path, below))
+    conn.execute('DELETE FROM dirs WHERE path = ? OR path LIKE ?',
+                 (path, below))
+
+
+def update(conn, roots, full=False):
+    """Update the catalog of the directory trees under `roots`
+
+    Directories whose mtime did not change are not listed again (their
+    known subdirectories are still visited), unless `full`. Returns the
+    number of directories listed.
+    """
+    nlisted = 0
+    stack = [(os.path.abspath(root), None) for root in roots]
+    while stack:
+        path, parent = stack.pop()
+        known = conn.execute('SELECT mtime FROM dirs WHERE path = ?',
+                             (path,)).fetchone()
+        children = [row[0] for row in conn.execute(
+            'SELECT path FROM dirs WHERE parent = ?', (path,))]
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            remove_dir(conn, path)
+            continue
+
+        if full or known is None or known[0] != mtime:
+            subdirs = index_dir(conn, path, parent, mtime)
+            nlisted += 1
+            for child in set(children) - set(subdirs):
+                remove_dir(conn, child)
+        else:
+            subdirs = children
+        stack.extend((subdir, path) for subdir in subdirs)
+
+    conn.commit()
+    return nlisted
+
+
+def catalog_time_steps(fdir, prefix='output', suffix=None, db=None):
+    """Dictionary of the per-rank file names of each time step
+
+    None if the catalog does not exist, does not index `fdir` or has
+    no matching files in it (so that the caller scans the directory).
+    The directory is indexed again first if it changed since it was
+    indexed. Like `slice_io.get_suffix`, the npz files are used if
+    there are any.
+    """
+    db = db or default_db
+    if not os.path.exists(db):
+        return None
+    fdir = os.path.abspath(fdir)
+    conn = connect(db)
+    try:
+        known = conn.execute('SELECT parent, mtime FROM dirs WHERE path = ?',
+                             (fdir,)).fetchone()
+        if known is None:
+            return None
+        if os.stat(fdir).st_mtime != known[1]:
+            index_dir(conn, fdir, known[0], os.stat(fdir).st_mtime)
+            conn.commit()
+
+        if suffix is None:
+            npz = conn.execute(
+                "SELECT 1 FROM files WHERE dir = ? AND kind = 'slice' "
+                "AND prefix = ? AND name LIKE '%.npz' LIMIT 1",
+                (fdir, prefix)).fetchone()
+            suffix = '.npz' if npz else '.csv'
+
+        steps = {}
+        for path, step in conn.execute(
+                "SELECT path, step FROM files WHERE dir = ? "
+                "AND kind = 'slice' AND prefix = ? AND name LIKE ? "
+                "ORDER BY step, path", (fdir, prefix, '%' + suffix)):
+            steps.setdefault(step, []).append(path)
+        return steps or None
+    finally:
+        conn.close()
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Index the run directories in a SQLite catalog')
+    parser.add_argument(
+        'roots', help='Directories to index', nargs='*',
+        default=['DES', 'NSO', 'viz_runs'])
+    parser.add_argument('--db', help='Catalog file', default=default_db)
+    parser.add_argument(
+        '--full', help='List all the directories again',
+        action='store_true')
+    parser.add_argument(
+        '-s', '--summary', help='Print the runs and slice directories',
+        action='store_true')
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Update the catalog
+    conn = connect(args.db)
+    roots = [root for root in args.roots if os.path.isdir(root)]
+    nlisted = update(conn, roots, args.full)
+    print('Listed {0:d} directories'.format(nlisted))
+
+    # ========================================================================
+    # Summary
+    if args.summary:
+        for fdir, deck in conn.execute(
+                'SELECT dir, deck FROM runs ORDER BY dir, deck'):
+            print('Run: {0:s}'.format(os.path.join(fdir, deck)))
+        for fdir, prefix, nsteps, first, last, nfiles, size in conn.execute(
+                'SELECT dir, prefix, COUNT(*), MIN(step), MAX(step), '
+                'SUM(nfiles), SUM(size) FROM steps '
+                'GROUP BY dir, prefix ORDER BY dir'):
+            print('Slices: {0:s}/{1:s}* {2:d} steps ({3:d} to {4:d}), '
+                  '{5:d} files, {6:.1f} MB'.format(fdir, prefix, nsteps,
+                                                   first, last, nfiles,
+                                                   size / 1e6))
+    conn.close()
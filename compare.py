@@ -0,0 +1,223 @@
+#
+# Comparison of the vortex lineouts of simulations to the experiment
+#
+# The experimental lineouts (digitized with DataThief, exp_data/) are
+# read once and the lineouts across the vortex core of any number of
+# runs are interpolated onto the experimental stations at once (runs x
+# stations). The error metrics are the L2 norm of the difference
+# relative to the experiment, the peak velocity error and the core
+# radius error (half the distance between the swirl velocity peaks).
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import os
+import numpy as np
+import pandas as pd
+from interpolation import SliceInterpolator
+from vortex import track_cores
+from slice_io import read_average
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+mm2ft = 0.003281
+
+# Shift in ft to align the experimental coordinates with the mesh
+yshift = 0.0749174
+
+renames = {'Points:0': 'x',
+           'Points:1': 'y',
+           'Points:2': 'z',
+           'pressure': 'p',
+           'velocity_:0': 'ux',
+           'velocity_:1': 'uy',
+           'velocity_:2': 'uz',
+           'time': 'avg_time'}
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def read_dtf(fname):
+    """Digitized points of a DataThief file, calibrated
+
+    The pixel coordinates of the three axis reference points (`point`
+    lines flagged as references) and their values (`refs` line) define
+    the affine map from pixels to data, applied to the `dpoint` lines.
+    """
+    refs, values, points = [], None, []
+    with open(fname, 'r') as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == 'point' and fields[-2] == '1':
+                refs.append([float(fields[1]), float(fields[2])])
+            elif fields[0] == 'refs':
+                values = np.array(fields[1:7], dtype=np.float64)
+            elif fields[0] == 'dpoint':
+                points.append([float(fields[1]), float(fields[2])])
+    if len(refs) < 3 or values is None:
+        raise ValueError('No axis calibration in ' + fname)
+    pixels = np.column_stack((np.array(refs[:3]), np.ones(3)))
+    calibration = np.linalg.solve(pixels, values.reshape(3, 2))
+    points = np.array(points)
+    return np.column_stack((points, np.ones(len(points)))) @ calibration
+
+
+def read_exp(fname, chord=1.0):
+    """Experimental lineout (.txt export or .dtf file) in y/c
+
+    Returns the stations (sorted) and the values.
+    """
+    if os.path.splitext(fname)[1] == '.dtf':
+        dat = read_dtf(fname)
+    else:
+        dat = np.loadtxt(fname, delimiter=',', comments='#', ndmin=2)
+    dat = dat[np.argsort(dat[:, 0])]
+    return (dat[:, 0] * mm2ft - yshift) / chord, dat[:, 1]
+
+
+def load_exp(edir, fields=('ux', 'uz'), xname='x4', fmt='txt', chord=1.0):
+    """Experimental lineouts of the fields at a station"""
+    return {field: read_exp(os.path.join(edir, '{0:s}_{1:s}.{2:s}'.format(
+        field, xname, fmt)), chord) for field in fields}
+
+
+def read_slices(sdir, fname='avg_slice.csv'):
+    """Averaged slices of a run with the short column names"""
+    df = read_average(sdir, fname)
+    df.columns = [renames.get(col, col) for col in df.columns]
+    return df
+
+
+def core_lineouts(df, xslice, fields=('ux', 'uz'), ninterp=200,
+                  cache_dir=None):
+    """Lineouts of fields along y through the vortex core of a slice"""
+    subdf = df[np.isclose(df['x'], xslice)]
+    core = track_cores(subdf[['x', 'y', 'z']].values, subdf['p'].values,
+                       subdf['uy'].values, subdf['uz'].values)
+    zc = core['zc'].values[0]
+    interp = SliceInterpolator(subdf['y'], subdf['z'],
+                               cache_dir=cache_dir).fit(
+                                   subdf[list(fields)].values)
+    yline = np.linspace(subdf['y'].min(), subdf['y'].max(), ninterp)
+    vi = interp(yline, np.full(ninterp, zc))
+    return yline, {field: vi[:, k] for k, field in enumerate(fields)}
+
+
+def stack_lines(lines):
+    """Array (runs x points) of lines of different lengths, NaN padded"""
+    n = max(len(line) for line in lines)
+    out = np.full((len(lines), n), np.nan)
+    for k, line in enumerate(lines):
+        out[k, :len(line)] = line
+    return out
+
+
+def interp_stations(y, u, ys):
+    """Linear interpolation of all the runs at the stations
+
+    `y` and `u` are (runs x points) with increasing y in each row (NaN
+    padded at the end), `ys` are the stations. Stations outside a run's
+    lineout are NaN.
+    """
+    y = np.atleast_2d(y)
+    u = np.atleast_2d(u)
+    n = y.shape[1]
+    idx = np.sum(y[:, :, None] <= ys[None, None, :], axis=1)
+    lo = np.clip(idx - 1, 0, n - 2)
+    y0 = np.take_along_axis(y, lo, axis=1)
+    y1 = np.take_along_axis(y, lo + 1, axis=1)
+    u0 = np.take_along_axis(u, lo, axis=1)
+    u1 = np.take_along_axis(u, lo + 1, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w = (ys[None, :] - y0) / (y1 - y0)
+    out = u0 + w * (u1 - u0)
+    inside = (idx > 0) & (ys[None, :] <= np.nanmax(y, axis=1)[:, None])
+    out[~inside] = np.nan
+    return out
+
+
+def l2_error(us, ue):
+    """L2 norm of the difference relative to the experiment, per run
+
+    Only the stations covered by a run are counted.
+    """
+    ok = np.isfinite(us)
+    diff = np.where(ok, us - ue[None, :], 0.0)
+    ref = np.where(ok, ue[None, :], 0.0)
+    return np.sqrt(np.sum(diff ** 2, axis=1) / np.sum(ref ** 2, axis=1))
+
+
+def peak_excess(u):
+    """Value of the largest departure from the median, per row"""
+    u = np.atleast_2d(u)
+    dev = np.abs(u - np.nanmedian(u, axis=1)[:, None])
+    dev[np.isnan(dev)] = -np.inf
+    return np.take_along_axis(u, np.argmax(dev, axis=1)[:, None], axis=1)[:, 0]
+
+
+def swirl_peaks(y, u):
+    """Peak swirl velocity and core radius, per row
+
+    Half the difference and half the distance between the maximum and
+    minimum of the swirl velocity across the core.
+    """
+    y = np.atleast_2d(y)
+    u = np.atleast_2d(u)
+    imax = np.nanargmax(u, axis=1)[:, None]
+    imin = np.nanargmin(u, axis=1)[:, None]
+    umax = np.take_along_axis(u, imax, axis=1)[:, 0]
+    umin = np.take_along_axis(u, imin, axis=1)[:, 0]
+    ymax = np.take_along_axis(y, imax, axis=1)[:, 0]
+    ymin = np.take_along_axis(y, imin, axis=1)[:, 0]
+    return 0.5 * (umax - umin), 0.5 * np.abs(ymax - ymin)
+
+
+def compare(exp, y, lines, labels):
+    """Table of the error metrics of the runs
+
+    `exp` is from `load_exp`, `y` (runs x points) are the lineout
+    coordinates and `lines` the (runs x points) lineouts of each field
+    (axial ux and swirl uz). The peaks of the runs are taken on their
+    lineouts, not at the experimental stations.
+    """
+    df = pd.DataFrame({'label': labels})
+    l2 = []
+    for field, (ye, ue) in exp.items():
+        us = interp_stations(y, lines[field], ye)
+        df['l2_' + field] = l2_error(us, ue)
+        l2.append(df['l2_' + field])
+    df['l2'] = np.mean(l2, axis=0)
+
+    if 'ux' in exp:
+        peak = peak_excess(lines['ux'])
+        peak_exp = peak_excess(exp['ux'][1])[0]
+        df['peak_ux'] = peak
+        df['peak_ux_err'] = (peak - peak_exp) / abs(peak_exp)
+    if 'uz' in exp:
+        peak, radius = swirl_peaks(y, lines['uz'])
+        peak_exp, radius_exp = swirl_peaks(*exp['uz'])
+        df['peak_uz'] = peak
+        df['peak_uz_err'] = (peak - peak_exp[0]) / abs(peak_exp[0])
+        df['core_radius'] = radius
+        df['core_radius_err'] = (radius - radius_exp[0]) / radius_exp[0]
+    return df
+
+
+def rank(df, by='l2'):
+    """Runs sorted by the magnitude of a metric (best first)"""
+    order = np.argsort(np.abs(df[by].values), kind='stable')
+    df = df.iloc[order].reset_index(drop=True)
+    df.insert(0, 'rank', np.arange(1, len(df) + 1))
+    return df
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+#
+# This scores any number of runs (mesh or model variants) against the
+# experimental lineouts across the vortex core: the lineouts of the
+# averaged slices of each run are interpolated onto the experimental
+# stations and the runs are ranked by an error metric (relative L2
+# norm, peak velocity error, core radius error).
+#
+# Run this in the simulations directory, e.g. from /scratch/mhenryde/McalisterWing/DES:
+#    > /path/to/script/compare_runs.py --sdirs vortex_slices*M --edir ../exp_data
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+from nalu_log import parse_deck
+from compare import (load_exp, read_slices, core_lineouts, stack_lines,
+                     compare, rank)
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Rank runs against the experimental vortex lineouts')
+    parser.add_argument(
+        '--sdirs', help='Slice directories', nargs='+', required=True)
+    parser.add_argument(
+        '--labels', help='Labels of the slice directories (default: names)',
+        nargs='+')
+    parser.add_argument(
+        '--deck', help='Nalu input file (for the free stream velocity)',
+        default='mcalisterWing64M.i')
+    parser.add_argument(
+        '--edir', help='Directory of the experimental data',
+        default='exp_data')
+    parser.add_argument(
+        '--format', help='Experimental data files', choices=['txt', 'dtf'],
+        default='txt')
+    parser.add_argument(
+        '-x', '--xslice', help='x location of the slice', type=float,
+        default=5)
+    parser.add_argument(
+        '-n', '--ninterp', help='Number of points of the lineouts', type=int,
+        default=200)
+    parser.add_argument(
+        '-r', '--rank-by', help='Metric the runs are ranked by',
+        default='l2')
+    parser.add_argument(
+        '-o', '--output', help='Ranked table', default='compare.csv')
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Setup
+    fname = 'avg_slice.csv'
+    labels = args.labels or [os.path.basename(os.path.normpath(sdir))
+                             for sdir in args.sdirs]
+    if len(labels) != len(args.sdirs):
+        raise SystemExit('One label per slice directory')
+    _, u0 = parse_deck(args.deck)
+    chord = 1
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(args.deck)),
+                             'cache')
+    exp = load_exp(args.edir, fmt=args.format, chord=chord)
+
+    # ========================================================================
+    # Lineouts of the runs
+    ys = []
+    lines = {field: [] for field in exp}
+    for sdir in args.sdirs:
+        df = read_slices(sdir, fname)
+        y, vals = core_lineouts(df, args.xslice, list(exp), args.ninterp,
+                                cache_dir)
+        ys.append(y / chord)
+        for field in exp:
+            lines[field].append(vals[field] / u0)
+
+    # ========================================================================
+    # Score and rank
+    df = compare(exp, stack_lines(ys),
+                 {field: stack_lines(lines[field]) for field in exp}, labels)
+    df = rank(df, args.rank_by)
+    df.to_csv(args.output, index=False)
+    print(df.to_string(index=False, float_format='{0:.4f}'.format))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+#
+# This converts the CSV files of a slice directory to a columnar store
+# (geometry once, float32 fields per time step, see slice_io.py), or
+# with --archive packs them into a compressed archive file for long
+# term storage (optionally quantizing fields to a tolerance)
+#
+# Run this in the data directory, e.g. from /scratch/mhenryde/McalisterWing/DES/vortex_slices64M:
+#    > /path/to/script/convert_slices.py
+#    > /path/to/script/convert_slices.py --archive --tol pressure=0.01 velocity_:0=0.001 --remove
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+import numpy as np
+from slice_io import (write_store, write_archive, get_time_steps,
+                      get_merged_csv, align_points, SliceArchive)
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def parse_tolerances(items):
+    """Dictionary of field tolerances from name=value strings"""
+    tolerances = {}
+    for item in items:
+        name, value = item.split('=')
+        tolerances[name] = float(value)
+    return tolerances
+
+
+def verify_archive(fdir, aname, nprocs=1):
+    """Files of the time steps that the archive reproduces
+
+    A step is reproduced if every field is within its tolerance (or
+    within float32 precision for lossless fields).
+    """
+    archive = SliceArchive(aname)
+    tolerances = archive.index['tolerances']
+    points = archive.points()
+    fnames = []
+    for step, files in get_time_steps(fdir).items():
+        if step not in archive.steps:
+            continue
+        df = align_points(get_merged_csv(files, nprocs=nprocs), points)
+        ok = True
+        for name in archive.fields:
+            ref = df[name].values.astype(np.float64)
+            err = np.max(np.abs(archive.field(step, name) - ref),
+                         initial=0.0)
+            tol = tolerances.get(name, 0.0) * (1 + 1e-6) \
+                + 1e-6 * np.max(np.abs(ref), initial=0.0)
+            ok = ok and err <= tol
+        if ok:
+            fnames += files
+    archive.close()
+    return fnames
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Convert slice CSV files to a columnar store')
+    parser.add_argument(
+        '-p', '--nprocs', help='Number of processes reading the files',
+        type=int, default=1)
+    parser.add_argument(
+        '-a', '--archive', help='Pack the files into a compressed archive',
+        action='store_true')
+    parser.add_argument(
+        '-t', '--tol',
+        help='Absolute tolerances of lossy fields (e.g. pressure=0.01)',
+        nargs='+', default=[])
+    parser.add_argument(
+        '--chunk-size', help='Points per compressed chunk of the archive',
+        type=int, default=65536)
+    parser.add_argument(
+        '--remove', help='Remove the files of the archived time steps',
+        action='store_true')
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Convert
+    if not args.archive:
+        odir = write_store(os.getcwd(), nprocs=args.nprocs)
+        print('Wrote store in', odir)
+    else:
+        fdir = os.getcwd()
+        tolerances = parse_tolerances(args.tol) if args.tol else None
+        aname = write_archive(fdir, tolerances=tolerances,
+                              chunk_size=args.chunk_size,
+                              nprocs=args.nprocs)
+        size = os.path.getsize(aname)
+        print('Wrote archive {0:s} ({1:.1f} MB)'.format(aname,
+                                                        size / 1024**2))
+        if args.remove:
+            fnames = verify_archive(fdir, aname, args.nprocs)
+            for fname in fnames:
+                os.remove(fname)
+            print('Removed {0:d} files'.format(len(fnames)))
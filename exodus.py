@@ -0,0 +1,344 @@
+#
+# Extraction of slices from Exodus II files without ParaView
+#
+# The Exodus files are read with netCDF4 (or the netCDF classic
+# reader of scipy if netCDF4 is not installed). Planes are cut through
+# the edges of the elements (volume slices) or of the faces of a side
+# set (wing slices) and the nodal variables are linearly interpolated
+# to the intersection points, which is what the ParaView Slice filter
+# outputs with FieldAssociation='Points'.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import numpy as np
+import pandas as pd
+
+try:
+    import netCDF4
+
+    def open_exodus(fname):
+        ds = netCDF4.Dataset(fname, 'r')
+        ds.set_auto_mask(False)
+        return ds
+
+except ImportError:
+    import scipy.io
+
+    def open_exodus(fname):
+        return scipy.io.netcdf_file(fname, 'r', mmap=False)
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+# Local (0-based) node pairs of the edges of each element type
+edges = {'HEX': [(0, 1), (1, 2), (2, 3), (3, 0), (4, 5), (5, 6), (6, 7),
+                 (7, 4), (0, 4), (1, 5), (2, 6), (3, 7)],
+         'TET': [(0, 1), (1, 2), (2, 0), (0, 3), (1, 3), (2, 3)],
+         'WEDGE': [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (0, 3),
+                   (1, 4), (2, 5)],
+         'PYRAMID': [(0, 1), (1, 2), (2, 3), (3, 0), (0, 4), (1, 4), (2, 4),
+                     (3, 4)]}
+
+# Local (0-based) nodes of the sides of each element type (Exodus II
+# side numbering)
+sides = {'HEX': [[0, 1, 5, 4], [1, 2, 6, 5], [2, 3, 7, 6], [0, 4, 7, 3],
+                 [0, 3, 2, 1], [4, 5, 6, 7]],
+         'TET': [[0, 1, 3], [1, 2, 3], [0, 3, 2], [0, 2, 1]],
+         'WEDGE': [[0, 1, 4, 3], [1, 2, 5, 4], [0, 3, 5, 2], [0, 2, 1],
+                   [3, 4, 5]],
+         'PYRAMID': [[0, 1, 4], [1, 2, 4], [2, 3, 4], [0, 4, 3],
+                     [0, 3, 2, 1]]}
+
+components = {'x': 0, 'y': 1, 'z': 2}
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def element_family(elem_type):
+    """Family (HEX, TET, WEDGE, PYRAMID) of an Exodus element type"""
+    elem_type = elem_type.upper()
+    for family in edges:
+        if elem_type.startswith(family):
+            return family
+    raise ValueError('Unsupported element type {0:s}'.format(elem_type))
+
+
+def get_names(ds, name):
+    """List of strings stored in an Exodus character array"""
+    if name not in ds.variables:
+        return []
+    arr = np.asarray(ds.variables[name][:])
+    return [b''.join(row).decode().strip('\x00').strip()
+            for row in arr.astype('S1')]
+
+
+def get_attribute(var, name):
+    """String attribute of a variable"""
+    value = getattr(var, name)
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def paraview_name(name):
+    """Column name ParaView gives to an Exodus nodal variable
+
+    Vector components (velocity_x) become velocity_:0
+    """
+    base, _, comp = name.rpartition('_')
+    if base and comp in components:
+        return '{0:s}_:{1:d}'.format(base, components[comp])
+    return name
+
+
+def get_coordinates(ds):
+    """Array of the nodal coordinates"""
+    if 'coord' in ds.variables:
+        return np.asarray(ds.variables['coord'][:]).T.astype(np.float64)
+    return np.column_stack([np.asarray(ds.variables[name][:])
+                            for name in ['coordx', 'coordy', 'coordz']]
+                           ).astype(np.float64)
+
+
+def get_times(ds):
+    """Array of the output times"""
+    return np.asarray(ds.variables['time_whole'][:])
+
+
+def get_nodal_variables(ds, step, names):
+    """Dataframe of nodal variables at a time step
+
+    `names` are ParaView names (e.g. velocity_ for all the components
+    of the velocity).
+    """
+    all_names = get_names(ds, 'name_nod_var')
+    df = pd.DataFrame()
+    for k, name in enumerate(all_names):
+        column = paraview_name(name)
+        if column.split(':')[0] not in names and column not in names:
+            continue
+        if 'vals_nod_var' in ds.variables:
+            df[column] = np.asarray(ds.variables['vals_nod_var'][step, k, :])
+        else:
+            df[column] = np.asarray(
+                ds.variables['vals_nod_var{0:d}'.format(k + 1)][step, :])
+    return df
+
+
+def get_blocks(ds):
+    """List of (name, element family, connectivity variable) of the blocks
+
+    The connectivity is not read, see `get_connectivity`.
+    """
+    names = get_names(ds, 'eb_names')
+    blocks = []
+    k = 1
+    while 'connect{0:d}'.format(k) in ds.variables:
+        var = ds.variables['connect{0:d}'.format(k)]
+        name = names[k - 1].lower() if k <= len(names) else ''
+        blocks.append((name,
+                       element_family(get_attribute(var, 'elem_type')),
+                       var))
+        k += 1
+    return blocks
+
+
+def get_connectivity(var, elems=slice(None)):
+    """0-based connectivity of (a subset of the elements of) a block"""
+    return np.asarray(var[:])[elems].astype(np.int64) - 1
+
+
+def unique_edges(lst):
+    """Unique, sorted node pairs of a list of edge arrays"""
+    if not lst:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.unique(np.sort(np.vstack(lst), axis=1), axis=0)
+
+
+def get_block_edges(ds, blocks=None):
+    """Unique edges (global 0-based node pairs) of element blocks
+
+    All the blocks are used if `blocks` is None.
+    """
+    lst = []
+    for name, family, var in get_blocks(ds):
+        if blocks is not None and name not in blocks:
+            continue
+        connect = get_connectivity(var)
+        for i, j in edges[family]:
+            lst.append(np.column_stack((connect[:, i], connect[:, j])))
+    return unique_edges(lst)
+
+
+def get_sideset_edges(ds, sideset):
+    """Unique edges (global 0-based node pairs) of the faces of a side set"""
+    names = [name.lower() for name in get_names(ds, 'ss_names')]
+    if sideset not in names:
+        return unique_edges([])
+    k = names.index(sideset) + 1
+    elems = np.asarray(ds.variables['elem_ss{0:d}'.format(k)][:]) - 1
+    elem_sides = np.asarray(ds.variables['side_ss{0:d}'.format(k)][:]) - 1
+
+    # Elements are numbered contiguously across the blocks
+    offset = 0
+    lst = []
+    for name, family, var in get_blocks(ds):
+        nelems = var.shape[0]
+        mask = (elems >= offset) & (elems < offset + nelems)
+        offset += nelems
+        if not mask.any():
+            continue
+        connect = get_connectivity(var, elems[mask] - (offset - nelems))
+        for s, side in enumerate(sides[family]):
+            face = connect[elem_sides[mask] == s][:, side]
+            for i in range(len(side)):
+                lst.append(np.column_stack(
+                    (face[:, i], face[:, (i + 1) % len(side)])))
+    return unique_edges(lst)
+
+
+def cut_edges(coords, edge_list, origin, normal, offsets):
+    """Intersections of edges with a family of parallel planes
+
+    Returns the node pairs and interpolation weights of the
+    intersection points such that the value at a point is
+    (1 - w) * value[i] + w * value[j]. Nodes lying exactly on a plane
+    are returned once (w = 0).
+    """
+    normal = np.asarray(normal, dtype=np.float64)
+    normal /= np.linalg.norm(normal)
+    dist = (coords - np.asarray(origin)).dot(normal)
+
+    pairs = []
+    weights = []
+    for offset in offsets:
+        d = dist - offset
+        di, dj = d[edge_list[:, 0]], d[edge_list[:, 1]]
+        cut = (di * dj < 0)
+        w = di[cut] / (di[cut] - dj[cut])
+        pairs.append(edge_list[cut])
+        weights.append(w)
+
+        on_plane = np.nonzero(d == 0)[0]
+        on_plane = np.intersect1d(on_plane, edge_list)
+        pairs.append(np.column_stack((on_plane, on_plane)))
+        weights.append(np.zeros(len(on_plane)))
+
+    return np.vstack(pairs), np.concatenate(weights)
+
+
+def interpolate(values, pairs, weights):
+    """Interpolate nodal values to the intersection points"""
+    return ((1 - weights) * values[pairs[:, 0]]
+            + weights * values[pairs[:, 1]])
+
+
+def slice_frame(points, variables, pairs, weights):
+    """Dataframe of the slice points with the ParaView CSV columns"""
+    df = pd.DataFrame()
+    for column in variables.columns:
+        df[column] = interpolate(variables[column].values, pairs, weights)
+    for k in range(3):
+        df['Points:{0:d}'.format(k)] = points[:, k]
+    return df
+
+
+def cut_geometry(fname, config):
+    """Slice points of one (decomposed) Exodus file
+
+    The static part of the slicing (coordinates, edges, culling to the
+    box and cutting), done once per file. See `extract_slices` for
+    `config`. Returns the node pairs, the weights and the coordinates
+    of the slice points.
+    """
+    ds = open_exodus(fname)
+    try:
+        coords = get_coordinates(ds)
+        if config.get('sideset') is not None:
+            edge_list = get_sideset_edges(ds, config['sideset'])
+        else:
+            edge_list = get_block_edges(ds, config.get('blocks'))
+    finally:
+        ds.close()
+
+    # Discard the edges whose bounding box misses the box before
+    # cutting
+    box = config.get('box')
+    if box is not None:
+        lo, hi = np.asarray(box[0]), np.asarray(box[1])
+        ci, cj = coords[edge_list[:, 0]], coords[edge_list[:, 1]]
+        overlap = np.all((np.maximum(ci, cj) >= lo)
+                         & (np.minimum(ci, cj) <= hi), axis=1)
+        edge_list = edge_list[overlap]
+
+    pairs, weights = cut_edges(coords, edge_list, config['origin'],
+                               config['normal'], config['offsets'])
+    points = interpolate(coords, pairs, weights[:, None])
+
+    if box is not None:
+        keep = np.all((points >= lo) & (points <= hi), axis=1)
+        pairs, weights, points = pairs[keep], weights[keep], points[keep]
+    return pairs, weights, points
+
+
+def slice_steps(fname, config, geometry, steps=None):
+    """Slices of time steps of one Exodus file from its cut geometry
+
+    `geometry` is from `cut_geometry`, so only the nodal variables
+    are read. Returns a dictionary of dataframes for each time step
+    index.
+    """
+    pairs, weights, points = geometry
+    ds = open_exodus(fname)
+    try:
+        if steps is None:
+            steps = range(len(get_times(ds)))
+        frames = {}
+        for step in steps:
+            variables = get_nodal_variables(ds, step, config['variables'])
+            frames[step] = slice_frame(points, variables, pairs, weights)
+        return frames
+    finally:
+        ds.close()
+
+
+def extract_slices(fname, config, steps=None):
+    """Slices of all the time steps of one (decomposed) Exodus file
+
+    `config` is a dictionary with the keys
+    - `variables`: ParaView names of the nodal variables to keep
+    - `blocks`: element blocks to slice (lower case), or
+    - `sideset`: side set to slice (lower case)
+    - `origin`, `normal`, `offsets`: the slice planes
+    - `box`: optional [[xmin, ymin, zmin], [xmax, ymax, zmax]]
+
+    Returns a dictionary of dataframes for each time step index.
+    """
+    return slice_steps(fname, config, cut_geometry(fname, config), steps)
+
+
+def extract_chunks(fnames, config, steps, chunk=10, executor=None):
+    """Slices of time steps of all the (decomposed) files, chunk by chunk
+
+    The geometry of each file is cut once, then the files are read
+    `chunk` time steps at a time (by the `executor` if given), so that
+    only one chunk of slices is in memory. Yields a dictionary of the
+    merged dataframes of each time step of a chunk.
+    """
+    mapper = executor.map if executor is not None else map
+    geometries = list(mapper(cut_geometry, fnames, [config] * len(fnames)))
+    for i in range(0, len(steps), chunk):
+        chunk_steps = steps[i:i + chunk]
+        results = list(mapper(slice_steps, fnames, [config] * len(fnames),
+                              geometries, [chunk_steps] * len(fnames)))
+        yield {step: pd.concat([frames[step] for frames in results],
+                               ignore_index=True)
+               for step in chunk_steps}
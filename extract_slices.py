@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# This extracts the vortex or wing slices from the Exodus output
+# directly into a columnar slice store (see slice_io.py), without
+# ParaView. It is the equivalent of pp_vortex.py and pp_wing.py.
+#
+# Run this with something like:
+#    > /path/to/script/extract_slices.py -k vortex -p 32 \
+#          /global/cscratch1/sd/spdomin/mcalister_nso_les_des/mc_des_300M/output \
+#          /global/cscratch1/sd/marchdf/McalisterWing/DES/vortex_slices300M
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+import sys
+import glob
+from concurrent.futures import ProcessPoolExecutor
+from exodus import open_exodus, get_times, extract_chunks
+from slice_io import StoreWriter, store_name
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+configs = {
+    # Same planes and box as pp_vortex.py
+    'vortex': {'variables': ['pressure', 'velocity_'],
+               'blocks': ['upstream-hex',
+                          'tipvortex-hex',
+                          'testsection-tetra',
+                          'testsection-pyramid',
+                          'wingbox-9-hex',
+                          'wingbox-9-tetra',
+                          'wingbox-9-wedge',
+                          'wingbox-9-pyramid'],
+               'origin': [1.0, 0.0, 0.0],
+               'normal': [1.0, 0.0, 0.0],
+               'offsets': [0.0, 0.1, 0.2, 0.5, 1.0, 2.0, 4.0, 6.0],
+               'box': [[-1e16, -1.0, -1.0], [1e16, 1.0, 1.0]]},
+
+    # Same span stations as pp_wing.py
+    'wing': {'variables': ['pressure', 'pressure_force_', 'tau_wall',
+                           'velocity_'],
+             'sideset': 'wing',
+             'origin': [0.0, 0.0, 0.0],
+             'normal': [0.0, 1.0, 0.0],
+             'offsets': [0.0, 0.0198, 0.0528, 0.0858, 0.1353, 0.1848,
+                         0.3333, 0.5181, 0.7491, 1.0164, 1.3299, 1.6797,
+                         2.079, 2.5146, 2.9898]}}
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Extract slices from Exodus files without ParaView')
+    parser.add_argument('fdir', help='Directory of the Exodus files')
+    parser.add_argument('odir', help='Slice directory')
+    parser.add_argument(
+        '-k', '--kind', help='Kind of slices', choices=sorted(configs),
+        default='vortex')
+    parser.add_argument(
+        '--pattern', help='Exodus file names', default='mcalisterWing.e.*')
+    parser.add_argument(
+        '--chunk', help='Number of time steps read at once', type=int,
+        default=10)
+    parser.add_argument(
+        '-p', '--nprocs', help='Number of processes reading the files',
+        type=int, default=1)
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Setup
+    fnames = sorted(glob.glob(os.path.join(os.path.abspath(args.fdir),
+                                           args.pattern)))
+    if not fnames:
+        sys.exit('No Exodus files matching {0:s} in {1:s}'.format(
+            args.pattern, args.fdir))
+    writer = StoreWriter(os.path.join(os.path.abspath(args.odir), store_name))
+    config = configs[args.kind]
+
+    # Time steps still to extract
+    ds = open_exodus(fnames[0])
+    steps = [step for step in range(len(get_times(ds)))
+             if step not in writer.steps]
+    ds.close()
+
+    # ========================================================================
+    # Slice the decomposed files in parallel, `chunk` time steps at a
+    # time, and write each chunk to the store before reading the next
+    with ProcessPoolExecutor(max_workers=args.nprocs) as executor:
+        for frames in extract_chunks(fnames, config, steps, args.chunk,
+                                     executor):
+            for step, df in frames.items():
+                writer.append(step, df)
@@ -0,0 +1,187 @@
+#
+# Statistics of the wing force history
+#
+# The force file written every time step by the
+# surface_force_and_moment_wall_function post-processor is read
+# incrementally as the simulation runs. The transient is detected by
+# maximizing the number of independent samples left after discarding
+# it (Chodera, J. Chem. Theory Comput. 12, 2016), with the integrated
+# autocorrelation time computed with Sokal's automatic windowing.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import os
+import numpy as np
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+force_columns = ['Time', 'Fpx', 'Fpy', 'Fpz', 'Fvx', 'Fvy', 'Fvz',
+                 'Mtx', 'Mty', 'Mtz', 'Y+min', 'Y+max']
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def autocorrelation(x):
+    """Normalized autocorrelation function of a signal (with an FFT)"""
+    x = np.asarray(x, dtype=np.float64) - np.mean(x)
+    n = len(x)
+    nfft = 1 << (2 * n - 1).bit_length()
+    f = np.fft.rfft(x, nfft)
+    acf = np.fft.irfft(f * np.conjugate(f), nfft)[:n]
+    if acf[0] <= 0:
+        return np.zeros(n)
+    return acf / acf[0]
+
+
+def statistical_inefficiency(x, c=5):
+    """Statistical inefficiency g = 1 + 2 sum(rho) of a signal
+
+    The sum of the autocorrelation function is truncated at the
+    smallest window M such that M >= c * tau(M) (Sokal). The number of
+    independent samples in x is len(x) / g.
+    """
+    if len(x) < 2:
+        return 1.0
+    rho = autocorrelation(x)
+    tau = 2 * np.cumsum(rho) - 1
+    windows = np.arange(len(rho))
+    m = np.argmax(windows >= c * tau) if np.any(windows >= c * tau) \
+        else len(rho) - 1
+    return max(1.0, tau[m])
+
+
+def detect_transient(x, ncandidates=100):
+    """Transient cutoff maximizing the number of independent samples
+
+    Returns the cutoff index, the statistical inefficiency and the
+    number of independent samples after the cutoff. Cutoffs beyond
+    half of the signal are not considered.
+    """
+    n = len(x)
+    candidates = np.unique(np.linspace(0, n // 2, ncandidates).astype(int))
+    best = (0, 1.0, 0.0)
+    for t0 in candidates:
+        g = statistical_inefficiency(x[t0:])
+        neff = (n - t0) / g
+        if neff > best[2]:
+            best = (t0, g, neff)
+    return best
+
+
+# ========================================================================
+#
+# Class definitions
+#
+# ========================================================================
+class ForceReader:
+    """Read the rows appended to a force file since the last read
+
+    Only complete lines are read, so the file can be read while the
+    simulation writes it. Header lines are skipped.
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.offset = 0
+
+    def read(self):
+        """New rows (nrows x ncolumns) of the force file"""
+        if not os.path.exists(self.fname):
+            return np.empty((0, len(force_columns)))
+        with open(self.fname, 'rb') as f:
+            f.seek(self.offset)
+            text = f.read()
+        end = text.rfind(b'\n') + 1
+        self.offset += end
+
+        rows = []
+        for line in text[:end].decode().splitlines():
+            try:
+                row = [float(v) for v in line.split()]
+            except ValueError:
+                continue
+            if len(row) == len(force_columns):
+                rows.append(row)
+        return np.array(rows).reshape(-1, len(force_columns))
+
+
+class ForceHistory:
+    """Growing history of the lift and drag of the wing
+
+    Lift and drag are the total (pressure and viscous) forces in z and
+    x. Running sums are kept so that the mean and variance of any
+    trailing part of the history are computed in constant time.
+    Restarted runs rewrite some time steps: rows whose time is not
+    after the last one kept are ignored.
+    """
+
+    signals = {'lift': ('Fpz', 'Fvz'), 'drag': ('Fpx', 'Fvx')}
+
+    def __init__(self):
+        self.time = np.empty(0)
+        self.data = {name: np.empty(0) for name in self.signals}
+        self.sums = {name: np.zeros(1) for name in self.signals}
+        self.sqsums = {name: np.zeros(1) for name in self.signals}
+
+    def __len__(self):
+        return len(self.time)
+
+    def update(self, rows):
+        """Append rows of the force file"""
+        last = self.time[-1] if len(self.time) else -np.inf
+        rows = rows[rows[:, 0] > last]
+        if len(rows) == 0:
+            return
+        rows = rows[np.concatenate(([True], np.diff(rows[:, 0]) > 0))]
+        self.time = np.append(self.time, rows[:, 0])
+        for name, (cp, cv) in self.signals.items():
+            x = rows[:, force_columns.index(cp)] + \
+                rows[:, force_columns.index(cv)]
+            self.data[name] = np.append(self.data[name], x)
+            self.sums[name] = np.append(self.sums[name],
+                                        self.sums[name][-1] + np.cumsum(x))
+            self.sqsums[name] = np.append(
+                self.sqsums[name], self.sqsums[name][-1] + np.cumsum(x**2))
+
+    def moments(self, name, start=0):
+        """Mean and variance of a signal from `start` on"""
+        n = len(self) - start
+        mean = (self.sums[name][-1] - self.sums[name][start]) / n
+        sq = (self.sqsums[name][-1] - self.sqsums[name][start]) / n
+        return mean, max(sq - mean**2, 0.0)
+
+    def analyze(self, ncandidates=100):
+        """Statistics of each signal after the transient
+
+        The transient cutoff is the latest of the cutoffs of the
+        signals. Returns a dictionary with the cutoff (index and time)
+        and the mean, standard deviation, statistical inefficiency,
+        number of independent samples and standard error of the mean of
+        each signal after the cutoff.
+        """
+        cutoff = max(detect_transient(self.data[name], ncandidates)[0]
+                     for name in self.signals)
+        stats = {'nsteps': len(self),
+                 'cutoff': int(cutoff),
+                 'cutoff_time': float(self.time[cutoff])}
+        for name in self.signals:
+            mean, var = self.moments(name, cutoff)
+            g = statistical_inefficiency(self.data[name][cutoff:])
+            neff = (len(self) - cutoff) / g
+            stats[name] = {'mean': mean,
+                           'std': np.sqrt(var),
+                           'g': g,
+                           'neff': neff,
+                           'sem': np.sqrt(var / neff)}
+        return stats
@@ -0,0 +1,245 @@
+#
+# Stage timing and memory instrumentation of the post-processing scripts
+#
+# The scripts wrap their stages (file discovery, reading, concat,
+# groupby, interpolation, rendering, ...) in `stage` blocks. When the
+# instrumentation is off (the default), a stage is a no-op. When it is
+# on (--profile or the MCALISTER_PROFILE environment variable), the
+# wall time, rows and bytes processed and memory high-water mark of
+# each stage are recorded, and a summary is printed at exit. The
+# records can also be written to a JSON file (--profile-json or
+# MCALISTER_PROFILE_JSON) and the whole run profiled with cProfile
+# (--cprofile or MCALISTER_CPROFILE).
+#
+# Stages can be nested and a stage entered several times (e.g. once
+# per slice directory) is accumulated into one record.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import os
+import sys
+import json
+import time
+import atexit
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+# Environment variables turning the instrumentation on
+env_profile = 'MCALISTER_PROFILE'
+env_json = 'MCALISTER_PROFILE_JSON'
+env_cprofile = 'MCALISTER_CPROFILE'
+
+# Profiler shared by the modules of a script (see `get_profiler`)
+profiler = None
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def reset_peak_rss():
+    """Reset the peak resident memory of this process (Linux)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss():
+    """Peak resident memory of this process in MB
+
+    Since the last `reset_peak_rss` on Linux, since the start of the
+    process otherwise.
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return float(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+def add_arguments(parser):
+    """Add the instrumentation options to a script's parser"""
+    parser.add_argument(
+        '--profile', help='Print the time and memory of each stage',
+        action='store_true')
+    parser.add_argument(
+        '--profile-json', help='Write the stage records to a JSON file')
+    parser.add_argument(
+        '--cprofile', help='Write cProfile statistics to a file')
+
+
+def get_profiler():
+    """Profiler shared by the modules of a script (created on first use)"""
+    global profiler
+    if profiler is None:
+        profiler = Profiler()
+    return profiler
+
+
+def setup(args=None):
+    """Turn the instrumentation on from the options or the environment
+
+    Returns the profiler of the scripts (possibly disabled).
+    """
+    env = os.environ
+    json_name = getattr(args, 'profile_json', None) or env.get(env_json)
+    cprofile_name = getattr(args, 'cprofile', None) or env.get(env_cprofile)
+    enabled = getattr(args, 'profile', False) \
+        or env.get(env_profile, '') not in ('', '0') \
+        or json_name is not None or cprofile_name is not None
+    profiler = get_profiler()
+    if enabled and not profiler.enabled:
+        profiler.start(json_name, cprofile_name)
+        atexit.register(profiler.finish)
+    return profiler
+
+
+def stage(name, rows=None, nbytes=None):
+    """Instrumented stage of the profiler of the scripts
+
+    Use as `with stage('read') as s:` and set `s['rows']` and
+    `s['bytes']` inside the block if they are not known beforehand.
+    """
+    return get_profiler().stage(name, rows, nbytes)
+
+
+# ========================================================================
+#
+# Class definitions
+#
+# ========================================================================
+class NullStage:
+    """Stage of a disabled profiler"""
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Stage:
+    """Stage of an enabled profiler"""
+
+    def __init__(self, profiler, name, rows, nbytes):
+        self.profiler = profiler
+        self.name = name
+        self.info = {'rows': rows, 'bytes': nbytes}
+
+    def __enter__(self):
+        stack = self.profiler.stack
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, peak_rss())
+        self.record = self.profiler.record(
+            '/'.join([s.name for s in stack] + [self.name]), len(stack))
+        self.peak = 0.0
+        stack.append(self)
+        reset_peak_rss()
+        self.start = time.perf_counter()
+        return self.info
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.peak = max(self.peak, peak_rss())
+        stack = self.profiler.stack
+        stack.pop()
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, self.peak)
+        rec = self.record
+        rec['calls'] += 1
+        rec['time'] += elapsed
+        rec['peak_rss_mb'] = max(rec['peak_rss_mb'], self.peak)
+        for key in ['rows', 'bytes']:
+            if self.info.get(key) is not None:
+                rec[key] = (rec[key] or 0) + int(self.info[key])
+        return False
+
+
+class Profiler:
+    """Records of the stages of a script"""
+
+    def __init__(self):
+        self.enabled = False
+        self.stack = []
+        self.records = {}
+
+    def start(self, json_name=None, cprofile_name=None):
+        """Enable the profiler"""
+        self.enabled = True
+        self.json_name = json_name
+        self.cprofile_name = cprofile_name
+        self.start_time = time.perf_counter()
+        self.cprofile = None
+        if cprofile_name:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def stage(self, name, rows=None, nbytes=None):
+        """Context manager of a stage (a no-op when disabled)"""
+        if not self.enabled:
+            return NullStage()
+        return Stage(self, name, rows, nbytes)
+
+    def record(self, path, depth):
+        """Record of a stage (in the order the stages are first entered)"""
+        return self.records.setdefault(path, {
+            'stage': path, 'depth': depth, 'calls': 0, 'time': 0.0,
+            'rows': None, 'bytes': None, 'peak_rss_mb': 0.0})
+
+    def summary(self):
+        """Dictionary of the run and the records of its stages"""
+        return {'script': os.path.basename(sys.argv[0]),
+                'argv': sys.argv[1:],
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'time': time.perf_counter() - self.start_time,
+                'stages': list(self.records.values())}
+
+    def report(self, summary, stream=sys.stderr):
+        """Print the table of the stages"""
+        print('{0:<32s} {1:>6s} {2:>10s} {3:>12s} {4:>10s} {5:>10s}'.format(
+            'stage', 'calls', 'time (s)', 'rows', 'MB', 'peak MB'),
+            file=stream)
+        fmt = '{0:<32s} {1:6d} {2:10.3f} {3:>12s} {4:>10s} {5:10.1f}'
+        for rec in summary['stages']:
+            name = '  ' * rec['depth'] + rec['stage'].split('/')[-1]
+            print(fmt.format(
+                name[:32], rec['calls'], rec['time'],
+                '' if rec['rows'] is None else str(rec['rows']),
+                '' if rec['bytes'] is None
+                else '{0:.1f}'.format(rec['bytes'] / 1024**2),
+                rec['peak_rss_mb']), file=stream)
+        print('{0:<32s} {1:6s} {2:10.3f}'.format('total', '',
+                                                  summary['time']),
+              file=stream)
+
+    def finish(self):
+        """Print the summary and write the JSON and cProfile files"""
+        if not self.enabled:
+            return
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_name)
+        summary = self.summary()
+        self.report(summary)
+        if self.json_name:
+            with open(self.json_name, 'w') as f:
+                json.dump(summary, f, indent=2)
+        self.enabled = False
+
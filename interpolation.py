@@ -0,0 +1,73 @@
+#
+# Interpolation of scattered slice data
+#
+# The Delaunay triangulation of a slice is built once, shared by all
+# the fields and cached on disk, keyed by a hash of the coordinates,
+# so that runs on the same mesh reuse it.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import os
+import hashlib
+import pickle
+import numpy as np
+import scipy.interpolate as spi
+from scipy.spatial import Delaunay
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def coordinates_hash(points):
+    """Hash of an array of coordinates"""
+    points = np.ascontiguousarray(points, dtype=np.float64)
+    return hashlib.sha1(points.tobytes()).hexdigest()
+
+
+def get_triangulation(points, cache_dir=None):
+    """Delaunay triangulation of points, from the cache if possible"""
+    if cache_dir is None:
+        return Delaunay(points)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fname = os.path.join(cache_dir,
+                         'tri_{0:s}.pkl'.format(coordinates_hash(points)))
+    if os.path.exists(fname):
+        with open(fname, 'rb') as f:
+            return pickle.load(f)
+
+    tri = Delaunay(points)
+    with open(fname + '.tmp', 'wb') as f:
+        pickle.dump(tri, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(fname + '.tmp', fname)
+    return tri
+
+
+# ========================================================================
+#
+# Class definitions
+#
+# ========================================================================
+class SliceInterpolator:
+    """Cubic (Clough-Tocher) interpolation of the fields of a slice
+
+    Equivalent to scipy.interpolate.griddata(..., method='cubic') but
+    the triangulation is computed (or loaded from `cache_dir`) once.
+    """
+
+    def __init__(self, y, z, cache_dir=None):
+        self.tri = get_triangulation(np.column_stack((y, z)), cache_dir)
+
+    def fit(self, values):
+        """Interpolant of an array of fields (npoints x nfields)"""
+        return spi.CloughTocher2DInterpolator(self.tri, values)
+
+    def __call__(self, values, yi, zi):
+        """Interpolate an array of fields to the points (yi, zi)"""
+        return self.fit(values)(yi, zi)
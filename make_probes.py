@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+#
+# This replaces the full field Exodus output used by pp_vortex.py and
+# pp_wing.py with in-situ sampling: it writes a copy of a deck with
+# Nalu data probes on the vortex planes, the wing sections and the
+# experimental lineout at x/c=4 (see probes.py), and converts the probe
+# files written by the run to slice directories (one npz file per
+# sampled step) that the averaging and plotting scripts read directly.
+#
+# Write the deck, e.g. from /scratch/mhenryde/McalisterWing/DES:
+#    > /path/to/script/make_probes.py deck -i mcalisterWing64M.i --frequency 10 --exodus-frequency 4000
+#
+# and convert the probe files once (or while) it runs:
+#    > /path/to/script/make_probes.py convert -i mcalisterWing64M_probes.i --pdir probes64M
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+from collections import OrderedDict
+import numpy as np
+from probes import (vortex_specification, wing_specification,
+                    lineout_specification, probe_block, volume_parts,
+                    insert_probes, get_probe_fields, get_probe_lines,
+                    read_probes, split_steps)
+from slice_io import write_npz, write_manifest
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def npz_rows(fname):
+    """Number of points of a slice file written by `write_npz`"""
+    with np.load(fname) as dat:
+        return len(dat[dat.files[0]]) if dat.files else 0
+
+
+def convert(deck, pdir, odir):
+    """Write the probe data of a run as slice directories
+
+    The probe specifications are grouped by the prefix of their name
+    (vortex, wing, lineout), one slice directory each. Only the
+    samples complete in every probe file are converted. Steps already
+    converted are skipped, unless their file has a different number
+    of points than the complete sample.
+    """
+    with open(deck, 'r') as f:
+        text = f.read()
+    specs, frequency = get_probe_fields(text)
+    lines = get_probe_lines(text)
+    groups = OrderedDict()
+    for name, fields in specs.items():
+        groups.setdefault(name.split('_')[0], []).append((name, fields))
+
+    written = {}
+    for group, lst in groups.items():
+        sdir = os.path.join(odir, '{0:s}_slices'.format(group))
+        os.makedirs(sdir, exist_ok=True)
+        steps = {}
+        for k, (name, fields) in enumerate(lst):
+            df, times = read_probes(pdir, lines[name], fields)
+            for step, df in split_steps(df, frequency, times).items():
+                steps.setdefault(step, []).append((k, df))
+        count = 0
+        for step, dfs in steps.items():
+            for k, df in dfs:
+                fname = os.path.join(sdir, 'output{0:d}.{1:d}.npz'.format(
+                    k, step))
+                if not os.path.exists(fname) or npz_rows(fname) != len(df):
+                    write_npz(fname, df)
+                    count += 1
+        write_manifest(sdir)
+        written[sdir] = count
+    return written
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='In-situ sampling of the slices with data probes')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    dck = subparsers.add_parser('deck', help='Write a deck with probes')
+    dck.add_argument('-i', '--deck', help='Input deck', required=True)
+    dck.add_argument(
+        '-o', '--output', help='Output deck (default: <deck>_probes.i)')
+    dck.add_argument(
+        '-f', '--frequency', help='Time steps between samples', type=int,
+        default=10)
+    dck.add_argument(
+        '--exodus-frequency', help='New output frequency of the Exodus files',
+        type=int)
+    dck.add_argument(
+        '--ny', help='Points along y of the vortex planes', type=int,
+        default=200)
+    dck.add_argument(
+        '--nz', help='Points along z of the vortex planes', type=int,
+        default=200)
+    dck.add_argument(
+        '--nsection', help='Points around each wing section', type=int,
+        default=200)
+    dck.add_argument(
+        '--aoa', help='Angle of attack of the wing (degrees)', type=float,
+        default=12.0)
+    dck.add_argument(
+        '--skip', help='Probes not to write', nargs='+',
+        choices=['vortex', 'wing', 'lineout'], default=[])
+
+    cnv = subparsers.add_parser(
+        'convert', help='Convert probe files to slice directories')
+    cnv.add_argument(
+        '-i', '--deck', help='Deck with the probes', required=True)
+    cnv.add_argument(
+        '--pdir', help='Directory of the probe files', default='.')
+    cnv.add_argument(
+        '-o', '--odir', help='Directory of the slice directories',
+        default='.')
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Deck
+    if args.command == 'deck':
+        with open(args.deck, 'r') as f:
+            text = f.read()
+        parts = volume_parts(text)
+        specs = []
+        if 'vortex' not in args.skip:
+            specs += vortex_specification(parts, ny=args.ny, nz=args.nz)
+        if 'wing' not in args.skip:
+            specs += wing_specification(npoints=args.nsection, aoa=args.aoa)
+        if 'lineout' not in args.skip:
+            specs += lineout_specification(parts)
+        oname = args.output or \
+            os.path.splitext(args.deck)[0] + '_probes.i'
+        with open(oname, 'w') as f:
+            f.write(insert_probes(text, probe_block(specs, args.frequency),
+                                  args.exodus_frequency))
+        nlines = sum(len(s['line_of_site_specifications']) for s in specs)
+        print('Wrote {0:s} ({1:d} probe lines)'.format(oname, nlines))
+
+    # ========================================================================
+    # Convert
+    else:
+        for sdir, count in convert(args.deck, args.pdir, args.odir).items():
+            print('{0:s}: {1:d} new files'.format(sdir, count))
@@ -0,0 +1,244 @@
+#
+# Parsing of the Nalu log files (naluX -o mcalisterWing64M.o)
+#
+# The log is parsed line by line so that it can be followed while the
+# simulation runs. For each time step, the parser keeps the time step
+# size, the maximum Courant and Reynolds numbers, the wall time (if
+# Nalu prints it), and the number of linear iterations (total and
+# largest of a single solve, <eq>_max) and the last nonlinear residual
+# (<eq>_norm) of each equation. The timers printed at the end of the
+# run are kept too.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+import yaml
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+# Equation system of each solved field
+equations = {'MomentumEQS': 'velocity',
+             'ContinuityEQS': 'pressure',
+             'TurbKineticEnergyEQS': 'turbulent_ke',
+             'SpecDissRateEQS': 'specific_dissipation_rate'}
+
+number = r'([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|nan|inf)'
+patterns = {
+    'step': re.compile(r'Time Step Count:\s*(\d+)\s+Current Time:\s*'
+                       + number),
+    'dt': re.compile(r'dtN:\s*' + number),
+    'courant': re.compile(r'Max Courant:\s*' + number
+                          + r'\s+Max Reynolds:\s*' + number),
+    'wall': re.compile(r'WallClockTime:\s*(\d+)\s+Pre:\s*' + number
+                       + r'\s+NLI:\s*' + number + r'\s+Post:\s*' + number),
+    'equation': re.compile(r'^\s*(\w+EQS)\s+(\d+)\s+' + number + r'\s+'
+                           + number),
+    'section': re.compile(r'^\s*Timing for (.+?):?\s*(?:avg:|$)'),
+    'timer': re.compile(r'^\s*(.*?)\s*--\s*avg:\s*' + number
+                        + r'\s+min:\s*' + number + r'\s+max:\s*' + number),
+    'inline_timer': re.compile(r'^\s*Timing for (.+?):\s*avg:\s*' + number
+                               + r'\s+min:\s*' + number
+                               + r'\s+max:\s*' + number),
+    'muelu': re.compile(r'^\s*(MueLu: .+?)\s{2,}' + number),
+}
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def parse_deck(deck):
+    """Linear solver of each equation and free stream velocity"""
+    with open(deck, 'r') as f:
+        dat = yaml.safe_load(f)
+    realm = dat['realms'][0]
+    spec = realm['equation_systems']['solver_system_specification']
+    solvers = {eq: spec.get(field, eq) for eq, field in equations.items()}
+    u0 = float(realm['initial_conditions'][0]['value']['velocity'][0])
+    return solvers, u0
+
+
+def get_ncores(fdir):
+    """Number of MPI ranks from the job scripts of a run directory"""
+    regexes = [r'--ntasks=(\d+)', r'totalCores=(\d+)', r'-np\s+(\d+)']
+    for fname in sorted(os.listdir(fdir)):
+        if os.path.splitext(fname)[1] not in ('.job', '.pbs'):
+            continue
+        with open(os.path.join(fdir, fname), 'r') as f:
+            text = f.read()
+        for regex in regexes:
+            m = re.search(regex, text)
+            if m:
+                return int(m.group(1))
+    return None
+
+
+def wall_per_step(df):
+    """Wall time of each step: printed by Nalu or when the step was seen
+
+    Steps seen in the same read of the log (e.g. the steps already in
+    the log when it is first read) have no wall time.
+    """
+    wall = df['wall'].values.astype(np.float64)
+    if np.all(np.isnan(wall)):
+        wall = np.append(np.diff(df['seen'].values), np.nan)
+        wall[wall < 1e-3] = np.nan
+    return wall
+
+
+def throughput(df, ncores=None, tconv=None, timers=None):
+    """Throughput summary of the steps of a run
+
+    `tconv` is the convective time (chord over free stream velocity).
+    Without per-step wall times, the total wall time of the timers
+    (maximum over the ranks) is spread over the steps.
+    """
+    wall = wall_per_step(df)
+    ok = ~np.isnan(wall)
+    if not ok.any():
+        if timers is not None and len(timers) > 0:
+            keep = (timers['section'] != 'MueLu') & \
+                (timers['name'] != 'linear iterations')
+            total = timers.loc[keep, 'max'].sum()
+            wall = np.full(len(df), total / max(len(df), 1))
+            ok = np.ones(len(df), dtype=bool)
+    summary = {'nsteps': len(df),
+               'wall_per_step': np.mean(wall[ok]) if ok.any() else np.nan,
+               'dt': df['dt'].mean(),
+               'courant': df['courant'].mean()}
+    summary['steps_per_hour'] = 3600.0 / summary['wall_per_step']
+    if tconv is not None:
+        summary['steps_per_tconv'] = tconv / summary['dt']
+        if ncores is not None:
+            summary['core_hours_per_tconv'] = \
+                ncores * summary['wall_per_step'] / 3600.0 * \
+                summary['steps_per_tconv']
+    return summary
+
+
+# ========================================================================
+#
+# Class definitions
+#
+# ========================================================================
+class LogReader:
+    """Read the lines appended to a log file since the last read
+
+    A partially written last line is kept until it is complete.
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.offset = 0
+
+    def read(self):
+        """New complete lines of the log"""
+        with open(self.fname, 'rb') as f:
+            f.seek(self.offset)
+            text = f.read()
+        end = text.rfind(b'\n') + 1
+        self.offset += end
+        return text[:end].decode(errors='replace').splitlines()
+
+
+class LogParser:
+    """Line by line parser of a Nalu log"""
+
+    def __init__(self):
+        self.steps = []
+        self.timers = []
+        self.section = None
+
+    def feed(self, line):
+        """Parse a line, returns the previous step when a new one starts"""
+        m = patterns['step'].search(line)
+        if m:
+            done = self.steps[-1] if self.steps else None
+            self.steps.append({'step': int(m.group(1)),
+                               'time': float(m.group(2)),
+                               'seen': time.time()})
+            return done
+
+        if self.steps:
+            step = self.steps[-1]
+            m = patterns['dt'].search(line)
+            if m:
+                step['dt'] = float(m.group(1))
+                return None
+            m = patterns['courant'].search(line)
+            if m:
+                step['courant'] = float(m.group(1))
+                step['reynolds'] = float(m.group(2))
+                return None
+            m = patterns['wall'].search(line)
+            if m:
+                step['wall'] = sum(float(m.group(k)) for k in (2, 3, 4))
+                return None
+            m = patterns['equation'].match(line)
+            if m:
+                key = m.group(1)
+                iters = int(m.group(2))
+                step[key] = step.get(key, 0) + iters
+                step[key + '_max'] = max(step.get(key + '_max', 0), iters)
+                step[key + '_norm'] = float(m.group(4))
+                return None
+
+        m = patterns['inline_timer'].match(line)
+        if m:
+            self.timers.append({'section': m.group(1), 'name': m.group(1),
+                                'avg': float(m.group(2)),
+                                'min': float(m.group(3)),
+                                'max': float(m.group(4))})
+            return None
+        m = patterns['section'].match(line)
+        if m:
+            self.section = m.group(1)
+            return None
+        m = patterns['timer'].match(line)
+        if m and self.section is not None:
+            self.timers.append({'section': self.section, 'name': m.group(1),
+                                'avg': float(m.group(2)),
+                                'min': float(m.group(3)),
+                                'max': float(m.group(4))})
+            return None
+        m = patterns['muelu'].match(line)
+        if m:
+            self.timers.append({'section': 'MueLu', 'name': m.group(1),
+                                'avg': float(m.group(2)),
+                                'min': np.nan, 'max': np.nan})
+        return None
+
+    def step_table(self, solvers=None):
+        """Dataframe of the time steps
+
+        With `solvers` (see `parse_deck`), the linear iterations of
+        the equations are also summed per linear solver.
+        """
+        df = pd.DataFrame(self.steps)
+        for col in ['dt', 'courant', 'reynolds', 'wall']:
+            if col not in df.columns:
+                df[col] = np.nan
+        if solvers:
+            for solver in sorted(set(solvers.values())):
+                eqs = [eq for eq, s in solvers.items()
+                       if s == solver and eq in df.columns]
+                df[solver] = df[eqs].sum(axis=1) if eqs else np.nan
+        return df
+
+    def timer_table(self):
+        """Dataframe of the timers"""
+        return pd.DataFrame(self.timers,
+                            columns=['section', 'name', 'avg', 'min', 'max'])
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+#
+# This parses a Nalu log file and writes the per-step table (time step
+# size, Courant number, wall time, linear iterations of each solver)
+# and the timers to CSV files, then prints a throughput summary
+# (steps per hour, core-hours per convective time).
+#
+# With --follow, the log of a running job is read as it grows and a
+# line is printed for each completed time step.
+#
+# Run this in the run directory, e.g. from /scratch/mhenryde/McalisterWing/DES:
+#    > /path/to/script/parse_log.py mcalisterWing64M.o
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+import time
+import numpy as np
+from nalu_log import (LogReader, LogParser, parse_deck, get_ncores,
+                      throughput)
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def step_line(step, solvers):
+    """Compact line of a time step"""
+    line = '{0:8d} {1:12.6e} {2:10.3e} {3:6.2f}'.format(
+        step['step'], step['time'], step.get('dt', np.nan),
+        step.get('courant', np.nan))
+    for solver in sorted(set(solvers.values())):
+        iters = sum(step.get(eq, 0) for eq, s in solvers.items()
+                    if s == solver)
+        line += ' {0:>12d}'.format(iters)
+    return line
+
+
+def print_summary(summary, timers):
+    """Print the throughput summary and the linear solver timers"""
+    print('Steps: {0:d}'.format(summary['nsteps']))
+    print('Wall time per step: {0:.3f} s, {1:.1f} steps/hour'.format(
+        summary['wall_per_step'], summary['steps_per_hour']))
+    print('Mean time step: {0:e} s, mean max Courant: {1:.2f}'.format(
+        summary['dt'], summary['courant']))
+    if 'steps_per_tconv' in summary:
+        print('Steps per convective time: {0:.0f}'.format(
+            summary['steps_per_tconv']))
+    if 'core_hours_per_tconv' in summary:
+        print('Core-hours per convective time: {0:.1f}'.format(
+            summary['core_hours_per_tconv']))
+
+    # Preconditioner setup vs solve (apply and Krylov iterations)
+    for section, grp in timers.groupby('section', sort=False):
+        if not section.startswith('Eq'):
+            continue
+        times = dict(zip(grp['name'], grp['max']))
+        if 'solve' in times:
+            print('{0:s}: precond setup {1:.1f} s, solve {2:.1f} s'.format(
+                section, times.get('precond setup', np.nan), times['solve']))
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Parse a Nalu log file')
+    parser.add_argument(
+        'fname', help='Log file', nargs='?', default='mcalisterWing64M.o')
+    parser.add_argument(
+        '-d', '--deck', help='Input file (default: log name with .i)')
+    parser.add_argument(
+        '-n', '--ncores',
+        help='Number of cores (default: from the job scripts)', type=int)
+    parser.add_argument(
+        '-c', '--chord', help='Chord length', type=float, default=1.0)
+    parser.add_argument(
+        '-f', '--follow', help='Follow the log of a running job',
+        action='store_true')
+    parser.add_argument(
+        '-i', '--interval', help='Seconds between reads with --follow',
+        type=float, default=30)
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Setup
+    fdir = os.path.dirname(os.path.abspath(args.fname))
+    base = os.path.splitext(args.fname)[0]
+    deck = args.deck or base + '.i'
+    solvers, u0 = parse_deck(deck) if os.path.exists(deck) else ({}, None)
+    ncores = args.ncores or get_ncores(fdir)
+    tconv = args.chord / u0 if u0 else None
+
+    # ========================================================================
+    # Parse the log
+    reader = LogReader(args.fname)
+    log = LogParser()
+    if args.follow:
+        print('{0:>8s} {1:>12s} {2:>10s} {3:>6s}'.format(
+            'step', 'time', 'dt', 'CFL')
+            + ''.join(' {0:>12s}'.format(s)
+                      for s in sorted(set(solvers.values()))))
+    try:
+        while True:
+            for line in reader.read():
+                done = log.feed(line)
+                if done is not None and args.follow:
+                    print(step_line(done, solvers), flush=True)
+            if not args.follow:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+    # ========================================================================
+    # Tables and summary
+    steps = log.step_table(solvers)
+    timers = log.timer_table()
+    steps.to_csv(base + '_steps.csv', index=False)
+    timers.to_csv(base + '_timers.csv', index=False)
+    if len(steps) > 0:
+        print_summary(throughput(steps, ncores, tconv, timers), timers)
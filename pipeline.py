@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+#
+# This runs the post-processing pipeline (extract -> average -> plot)
+# of the cases of a case configuration file (see cases.yaml). A stage
+# is only run if one of its outputs is missing, its parameters changed
+# or one of its inputs (data files and scripts) changed since it last
+# ran. The stages of independent cases run concurrently.
+#
+# Run this with something like:
+#    > /path/to/script/pipeline.py -j 4 cases.yaml
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+import sys
+import glob
+import json
+import hashlib
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import yaml
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+script_dir = os.path.dirname(os.path.abspath(__file__))
+state_name = '.pipeline_state.json'
+
+# Code each stage depends on (in script_dir), i.e. the modules its
+# scripts import
+codes = {'extract': ['extract_slices.py', 'exodus.py', 'slice_io.py',
+                     'catalog.py'],
+         'average': ['averaging.py', 'slice_io.py', 'catalog.py',
+                     'instrument.py'],
+         'plot': ['rendering.py', 'interpolation.py', 'vortex.py',
+                  'wing.py', 'compare.py', 'slice_io.py', 'catalog.py',
+                  'instrument.py']}
+
+# Slice data read by the averaging scripts
+data_patterns = ['output*.csv', 'output*.npz', 'pp_manifest.json',
+                 'store/*', 'slices.arc']
+
+# Outputs of the plot scripts (in the root directory and in each slice
+# directory)
+plot_outputs = {'vortex': ['ux.png', 'uz.png', 'magvel.png',
+                           'vt_profile.png', 'vx_profile.png'],
+                'wing': ['sectional_loads.csv']}
+plot_sdir_outputs = {'vortex': ['vortex_profiles.csv',
+                                'vortex_core_properties.csv'],
+                     'wing': []}
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def file_hash(fname, blocksize=1 << 20):
+    """SHA-1 of the content of a file"""
+    sha = hashlib.sha1()
+    with open(fname, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def file_signature(fname, old=None):
+    """Signature [mtime, size, hash] of a file
+
+    The content is only hashed if the mtime changed but not the size
+    (e.g. a file was touched or rewritten), so unchanged and growing
+    files are never read.
+    """
+    st = os.stat(fname)
+    if old is not None:
+        if old[:2] == [st.st_mtime, st.st_size]:
+            return old
+        if old[1] == st.st_size:
+            return [st.st_mtime, st.st_size, file_hash(fname)]
+    return [st.st_mtime, st.st_size, None]
+
+
+def same_signature(new, old):
+    """True if two signatures are of the same content"""
+    if old is None or new[1] != old[1]:
+        return False
+    if new[0] == old[0]:
+        return True
+    return new[2] is not None and new[2] == old[2]
+
+
+def params_hash(params):
+    """Hash of the parameters of a stage"""
+    return hashlib.sha1(
+        json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def load_state(fname):
+    """Load the state of the pipeline"""
+    if os.path.exists(fname):
+        with open(fname, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(fname, state):
+    """Save the state of the pipeline (atomically)"""
+    with open(fname + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(fname + '.tmp', fname)
+
+
+def build_stages(config, nprocs=1):
+    """Stages of the pipeline of a case configuration"""
+    root = os.path.abspath(config.get('root', '.'))
+    navg = config.get('navg', 20)
+    pattern = config.get('pattern', 'mcalisterWing.e.*')
+    python = sys.executable
+
+    stages = []
+    for name, case in config['cases'].items():
+        for kind in ['vortex', 'wing']:
+            if kind not in case:
+                continue
+            sdir = os.path.join(root, case[kind])
+
+            deps = []
+            if 'output' in case:
+                edir = os.path.join(root, case['output'])
+                stages.append(Stage(
+                    'extract_{0:s}_{1:s}'.format(kind, name),
+                    [python, os.path.join(script_dir, 'extract_slices.py'),
+                     '-k', kind, '--pattern', pattern,
+                     '-p', str(nprocs), edir, sdir],
+                    root,
+                    [os.path.join(edir, pattern)]
+                    + [os.path.join(script_dir, c) for c in codes['extract']],
+                    [os.path.join(sdir, 'store', 'manifest.json')],
+                    params={'kind': kind, 'pattern': pattern}))
+                deps = [stages[-1].name]
+
+            script = 'avg_{0:s}_slices.py'.format(kind)
+            stages.append(Stage(
+                'average_{0:s}_{1:s}'.format(kind, name),
+                [python, os.path.join(script_dir, script),
+                 '-n', str(navg), '--stream', '-p', str(nprocs)],
+                sdir,
+                [os.path.join(sdir, p) for p in data_patterns]
+                + [os.path.join(script_dir, c)
+                   for c in [script] + codes['average']],
+                [os.path.join(sdir, 'avg_slice.csv')],
+                deps=deps,
+                params={'navg': navg}))
+
+    for kind, plot in config.get('plots', {}).items():
+        cases = [config['cases'][name] for name in plot['cases']]
+        script = 'plot_{0:s}.py'.format(kind)
+        cmd = [python, os.path.join(script_dir, script),
+               '--fdir', root, '--deck', plot['deck'],
+               '--sdirs'] + [case[kind] for case in cases] + \
+            ['--labels'] + [case['label'] for case in cases] + \
+            ['-p', str(nprocs)]
+        if config.get('fast', False):
+            cmd.append('--fast')
+        inputs = [os.path.join(root, case[kind], 'avg_slice.csv')
+                  for case in cases] + \
+            [os.path.join(root, plot['deck'])] + \
+            [os.path.join(script_dir, c) for c in [script] + codes['plot']]
+        if kind == 'vortex':
+            edir = os.path.join(script_dir, 'exp_data')
+            cmd += ['--edir', edir]
+            inputs.append(os.path.join(edir, '*.txt'))
+        outputs = [os.path.join(root, o) for o in plot_outputs[kind]] + \
+            [os.path.join(root, case[kind], o) for case in cases
+             for o in plot_sdir_outputs[kind]]
+        stages.append(Stage(
+            'plot_{0:s}'.format(kind),
+            cmd,
+            root,
+            inputs,
+            outputs,
+            deps=['average_{0:s}_{1:s}'.format(kind, name)
+                  for name in plot['cases']],
+            params={'cases': plot['cases'],
+                    'fast': config.get('fast', False)}))
+
+    return stages
+
+
+def run(stages, state, sname, njobs=1, force=False, dry_run=False):
+    """Run the stale stages, as soon as their dependencies are done
+
+    The state is saved after each stage so an interrupted pipeline
+    resumes where it stopped. The stages depending on a failed stage
+    are not run. With `dry_run`, the stages depending on a stage that
+    would run are reported as stale. Returns the names of the stages
+    that failed.
+    """
+    lock = threading.Lock()
+    pending = {stage.name: stage for stage in stages}
+    done = set()
+    failed = set()
+    would_run = set()
+
+    def report(msg, name):
+        with lock:
+            print('{0:s}: {1:s}'.format(msg, name), flush=True)
+
+    def execute(stage):
+        record = state.get(stage.name)
+        stale, new = stage.check(record)
+        if dry_run:
+            stale = stale or any(dep in would_run for dep in stage.deps)
+        if not (stale or force):
+            report('Up to date', stage.name)
+            return True
+        report('Running', stage.name)
+        if dry_run:
+            with lock:
+                would_run.add(stage.name)
+            return True
+        ok = stage.run()
+        if ok:
+            with lock:
+                state[stage.name] = new
+                save_state(sname, state)
+        return ok
+
+    with ThreadPoolExecutor(max_workers=njobs) as executor:
+        running = {}
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(dep in failed for dep in stage.deps):
+                    report('Skipped (failed dependency)', name)
+                    failed.add(name)
+                    del pending[name]
+                elif all(dep in done for dep in stage.deps):
+                    running[executor.submit(execute, stage)] = name
+                    del pending[name]
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                if future.result():
+                    done.add(name)
+                else:
+                    report('Failed', name)
+                    failed.add(name)
+
+    return sorted(failed)
+
+
+# ========================================================================
+#
+# Class definitions
+#
+# ========================================================================
+class Stage:
+    """A stage of the pipeline: a command with its inputs and outputs
+
+    `inputs` are file names or glob patterns, `deps` the names of the
+    stages producing (some of) the inputs and `params` the parameters
+    which are not in the inputs.
+    """
+
+    def __init__(self, name, cmd, cwd, inputs, outputs, deps=(),
+                 params=None):
+        self.name = name
+        self.cmd = cmd
+        self.cwd = cwd
+        self.inputs = inputs
+        self.outputs = outputs
+        self.deps = list(deps)
+        self.params = params or {}
+
+    def input_files(self):
+        """Input files (with the glob patterns expanded)"""
+        return sorted(set(f for pattern in self.inputs
+                          for f in glob.glob(pattern)))
+
+    def check(self, record=None):
+        """Is the stage stale wrt its last run and its new record"""
+        old = record['inputs'] if record else {}
+        inputs = {f: file_signature(f, old.get(f))
+                  for f in self.input_files()}
+        new = {'params': params_hash(self.params), 'inputs': inputs}
+
+        stale = (record is None
+                 or record['params'] != new['params']
+                 or sorted(old) != sorted(inputs)
+                 or not all(same_signature(sig, old[f])
+                            for f, sig in inputs.items())
+                 or not all(os.path.exists(f) for f in self.outputs))
+        return stale, new
+
+    def run(self):
+        """Run the command of the stage"""
+        os.makedirs(self.cwd, exist_ok=True)
+        return subprocess.run(self.cmd, cwd=self.cwd).returncode == 0
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Run the stale stages of the post-processing pipeline')
+    parser.add_argument('config', help='Case configuration file')
+    parser.add_argument(
+        '-j', '--njobs', help='Number of stages run concurrently', type=int,
+        default=1)
+    parser.add_argument(
+        '-p', '--nprocs', help='Number of processes of each stage',
+        type=int, default=1)
+    parser.add_argument(
+        '--force', help='Run all the stages', action='store_true')
+    parser.add_argument(
+        '--dry-run', help='Only print the stages that would run',
+        action='store_true')
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Setup
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    config['root'] = os.path.join(
+        os.path.dirname(os.path.abspath(args.config)),
+        config.get('root', '.'))
+    stages = build_stages(config, args.nprocs)
+    sname = os.path.join(config['root'], state_name)
+    state = load_state(sname)
+
+    # ========================================================================
+    # Run
+    failed = run(stages, state, sname, args.njobs, args.force, args.dry_run)
+    if failed:
+        sys.exit('Failed stages: {0:s}'.format(', '.join(failed)))
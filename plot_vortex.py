@@ -14,16 +14,22 @@ import matplotlib as mpl
 mpl.use('Agg')
 import matplotlib.pyplot as plt
 import pandas as pd
-import scipy.interpolate as spi
 import yaml
+from interpolation import SliceInterpolator
+from vortex import (track_cores, SliceTree, azimuthal_profiles,
+                    core_properties)
+from compare import load_exp
+from rendering import set_style, render
+from slice_io import read_average
+import instrument
+from instrument import stage
 
 # ========================================================================
 #
 # Some defaults variables
 #
 # ========================================================================
-plt.rc('text', usetex=True)
-plt.rc('font', family='serif', serif='Times')
+set_style()
 cmap_med = ['#F15A60', '#7AC36A', '#5A9BD4', '#FAA75B',
             '#9E67AB', '#CE7058', '#D77FB4', '#737373']
 cmap = ['#EE2E2F', '#008C48', '#185AA9', '#F47D23',
@@ -56,6 +62,65 @@ def parse_ic(fname):
             print(exc)
 
 
+def plot_lineout(oname, lines, exp, ylabel, legend=False):
+    """Plot velocity lineouts across the vortex core"""
+    plt.figure()
+    ax = plt.gca()
+    for line in lines:
+        p = plt.plot(line['y'], line['u'], ls='-', lw=2,
+                     color=line['color'], label=line['label'])
+        p[0].set_dashes(line['dashes'])
+    plt.plot(exp['y'], exp['u'], ls='-', lw=1, color=cmap[-1],
+             marker=markertype[0], mec=cmap[-1], mfc=cmap[-1], ms=6,
+             label=exp['label'])
+    plt.xlabel(r"$y/c$", fontsize=22, fontweight='bold')
+    plt.ylabel(ylabel, fontsize=22, fontweight='bold')
+    plt.setp(ax.get_xmajorticklabels(), fontsize=16, fontweight='bold')
+    plt.setp(ax.get_ymajorticklabels(), fontsize=16, fontweight='bold')
+    plt.tight_layout()
+    ax.set_xlim([-1, 1])
+    if legend:
+        legend = ax.legend(loc='best')
+    plt.savefig(oname, format='png')
+
+
+def plot_profile(oname, lines, ylabel, legend=False):
+    """Plot azimuthally averaged profiles around the vortex core"""
+    plt.figure()
+    ax = plt.gca()
+    for line in lines:
+        p = plt.plot(line['r'], line['u'], ls='-', lw=2,
+                     color=line['color'], label=line['label'])
+        p[0].set_dashes(line['dashes'])
+    plt.xlabel(r"$r/c$", fontsize=22, fontweight='bold')
+    plt.ylabel(ylabel, fontsize=22, fontweight='bold')
+    plt.setp(ax.get_xmajorticklabels(), fontsize=16, fontweight='bold')
+    plt.setp(ax.get_ymajorticklabels(), fontsize=16, fontweight='bold')
+    plt.tight_layout()
+    ax.set_xlim(left=0)
+    if legend:
+        legend = ax.legend(loc='best')
+    plt.savefig(oname, format='png')
+
+
+def plot_contour(oname, yi, zi, vi, ymin, ymax, zmin, zmax):
+    """Plot contours of a field in a slice"""
+    plt.figure()
+    CS = plt.contourf(yi, zi, vi, 15)
+    plt.colorbar()
+    plt.xlim(ymin, ymax)
+    plt.ylim(zmin, zmax)
+    ax = plt.gca()
+    plt.xlabel(r"$y/c$", fontsize=22, fontweight='bold')
+    plt.ylabel(r"$z/c$", fontsize=22, fontweight='bold')
+    plt.setp(ax.get_xmajorticklabels(), fontsize=16, fontweight='bold')
+    plt.setp(ax.get_ymajorticklabels(), fontsize=16, fontweight='bold')
+    plt.tight_layout()
+    ax.set_xlim([-1, 1])
+    ax.set_ylim([-1, 1])
+    plt.savefig(oname, format='png')
+
+
 # ========================================================================
 #
 # Main
@@ -68,34 +133,54 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='A simple plot tool')
     parser.add_argument(
         '-s', '--show', help='Show the plots', action='store_true')
+    parser.add_argument(
+        '-p', '--nprocs', help='Number of processes rendering the figures',
+        type=int, default=1)
+    parser.add_argument(
+        '-f', '--fast', help='Use mathtext instead of LaTeX',
+        action='store_true')
+    parser.add_argument(
+        '--force', help='Render figures even if they are up to date',
+        action='store_true')
+    parser.add_argument(
+        '--fdir', help='Directory of the simulations', default='DES')
+    parser.add_argument(
+        '--deck', help='Nalu input file (in fdir)',
+        default='mcalisterWing64M.i')
+    parser.add_argument(
+        '--sdirs', help='Slice directories (in fdir)', nargs='+',
+        default=['vortex_slices64M', 'vortex_slicesRC64M'])
+    parser.add_argument(
+        '--labels', help='Labels of the slice directories', nargs='+',
+        default=['DES 64M', 'DES RC 64M'])
+    parser.add_argument(
+        '--edir', help='Directory of the experimental data',
+        default='exp_data')
+    parser.add_argument(
+        '-x', '--xslice', help='x location of the lineouts and profiles',
+        type=float, default=5.0)
+    parser.add_argument(
+        '--rmax', help='Radius of the azimuthally averaged profiles',
+        type=float, default=0.3)
+    parser.add_argument(
+        '--nbins', help='Radial bins of the azimuthally averaged profiles',
+        type=int, default=30)
+    instrument.add_arguments(parser)
     args = parser.parse_args()
+    instrument.setup(args)
 
     # ========================================================================
     # Setup
     ninterp = 200
-    mm2ft = 0.003281
 
-    fdir = os.path.abspath('DES')
-    yname = os.path.join(fdir, 'mcalisterWing64M.i')
+    fdir = os.path.abspath(args.fdir)
+    cache_dir = os.path.join(fdir, 'cache')
+    yname = os.path.join(fdir, args.deck)
     fname = 'avg_slice.csv'
-    # sdirs = ['vortex_slices64M',
-    #          'vortex_slices64M_shifted',
-    #          'vortex_slices64M_nso']
-    # labels = ['DES 64M',
-    #           'DES shifted 64M',
-    #           'LES-NSO 64M']
-    # sdirs = ['vortex_slices64M_shifted',
-    #          'vortex_slices300M_shifted']
-    # labels = ['DES shifted 64M',
-    #           'DES shifted 300M']
-    sdirs = ['vortex_slices64M',
-             'vortex_slicesRC64M']
-    labels = ['DES 64M',
-              'DES RC 64M']
-
-    edir = os.path.abspath('exp_data')
-    fux_exp = os.path.join(edir, 'ux_x4.txt')
-    fuz_exp = os.path.join(edir, 'uz_x4.txt')
+    sdirs = args.sdirs
+    labels = args.labels
+
+    edir = os.path.abspath(args.edir)
 
     # simulation setup parameters
     u0, rho0, mu = parse_ic(yname)
@@ -103,11 +188,18 @@ if __name__ == '__main__':
 
     # ========================================================================
     # Loop on data directories
+    ux_lines = []
+    uz_lines = []
+    vt_lines = []
+    vx_lines = []
     for i, sdir in enumerate([os.path.join(fdir, sdir) for sdir in sdirs]):
 
         # ========================================================================
         # Read in data
-        df = pd.read_csv(os.path.join(sdir, fname), delimiter=',')
+        with stage('read') as s:
+            df = read_average(sdir, fname)
+            s['rows'] = len(df)
+            s['bytes'] = df.memory_usage().sum()
         renames = {'Points:0': 'x',
                    'Points:1': 'y',
                    'Points:2': 'z',
@@ -118,110 +210,115 @@ if __name__ == '__main__':
                    'time': 'avg_time'}
         df.columns = [renames[col] for col in df.columns]
 
+        # ========================================================================
+        # Azimuthally averaged profiles around the core of all the slices
+        with stage('index', rows=len(df)):
+            tree = SliceTree(df[['x', 'y', 'z']].values)
+        with stage('track', rows=len(df)):
+            cores = track_cores(df[['x', 'y', 'z']].values, df['p'].values,
+                                df['uy'].values, df['uz'].values)
+        with stage('profiles', rows=len(df)):
+            profiles = azimuthal_profiles(
+                tree, cores['yc'].values, cores['zc'].values,
+                df['ux'].values, df['uy'].values, df['uz'].values,
+                rmax=args.rmax, nbins=args.nbins)
+            props = core_properties(profiles)
+        profiles.to_csv(os.path.join(sdir, 'vortex_profiles.csv'),
+                        index=False)
+        cores.merge(props, on='x').to_csv(
+            os.path.join(sdir, 'vortex_core_properties.csv'), index=False)
+
+        prof = profiles[np.isclose(profiles['x'], args.xslice)]
+        vt_lines.append({'r': prof['r'].values / chord,
+                         'u': prof['vt'].values / u0,
+                         'color': cmap[i],
+                         'dashes': dashseq[i],
+                         'label': labels[i]})
+        vx_lines.append({'r': prof['r'].values / chord,
+                         'u': prof['vx'].values / u0,
+                         'color': cmap[i],
+                         'dashes': dashseq[i],
+                         'label': None})
+
         # ========================================================================
         # Lineout through vortex core in each slice
-        xslices = np.unique(df['x'])
-        xslices = [5]
+        xslices = [args.xslice]
 
         for k, xslice in enumerate(xslices):
-            subdf = df[df['x'] == xslice].copy()
-            idx = subdf['p'].idxmin()
+            subdf = df[np.isclose(df['x'], xslice)].copy()
             ymin, ymax = np.min(subdf['y']), np.max(subdf['y'])
             zmin, zmax = np.min(subdf['z']), np.max(subdf['z'])
 
-            # vortex center location
-            yc = np.array([subdf['y'].loc[idx]])
-            zc = np.array([subdf['z'].loc[idx]])
+            # vortex center location (tracked above in all the slices)
+            core = cores[np.isclose(cores['x'], xslice)]
+            yc = core['yc'].values
+            zc = core['zc'].values
+
+            # interpolant of all the fields on the (cached) triangulation
+            vcols = ['ux', 'uy', 'uz']
+            subdf['magvel'] = np.sqrt(np.square(subdf[vcols]).sum(axis=1))
+            with stage('triangulate', rows=len(subdf)):
+                interpolator = SliceInterpolator(subdf['y'], subdf['z'],
+                                                 cache_dir=cache_dir)
+                interp = interpolator.fit(
+                    subdf[['ux', 'uz', 'magvel']].values)
 
             # interpolate across the vortex core
             yline = np.linspace(ymin, ymax, ninterp)
             zline = np.linspace(zmin, zmax, ninterp)
-            ux_zc = spi.griddata((subdf['y'], subdf['z']), subdf['ux'],
-                                 (yline[None, :], zc[:, None]), method='cubic')
-            uz_zc = spi.griddata((subdf['y'], subdf['z']), subdf['uz'],
-                                 (yline[None, :], zc[:, None]), method='cubic')
-
-            plt.figure(0)
-            p = plt.plot(yline / chord, ux_zc[0, :] /
-                         u0, ls='-', lw=2, color=cmap[i], label=labels[i])
-            p[0].set_dashes(dashseq[i])
-
-            plt.figure(1)
-            p = plt.plot(yline / chord, uz_zc[0, :] /
-                         u0, ls='-', lw=2, color=cmap[i])
-            p[0].set_dashes(dashseq[i])
-
-            # Plot contours
+            with stage('interpolate', rows=ninterp * len(zc)):
+                vi = interp(yline[None, :], zc[:, None])
+            ux_zc, uz_zc = vi[..., 0], vi[..., 1]
+
+            ux_lines.append({'y': yline / chord,
+                             'u': ux_zc[0, :] / u0,
+                             'color': cmap[i],
+                             'dashes': dashseq[i],
+                             'label': labels[i]})
+            uz_lines.append({'y': yline / chord,
+                             'u': uz_zc[0, :] / u0,
+                             'color': cmap[i],
+                             'dashes': dashseq[i],
+                             'label': None})
+
+            # Contours
             if i == 0:
                 yi = np.linspace(ymin, ymax, ninterp)
                 zi = np.linspace(zmin, zmax, ninterp)
-
-                vcols = ['ux', 'uy', 'uz']
-                subdf['magvel'] = np.sqrt(np.square(subdf[vcols]).sum(axis=1))
-
-                vi = spi.griddata((subdf['y'], subdf['z']), subdf['magvel'],
-                                  (yi[None, :], zi[:, None]), method='cubic')
-
-                plt.figure(2)
-                CS = plt.contourf(yi, zi, vi, 15)
-                plt.colorbar()
-                plt.xlim(ymin, ymax)
-                plt.ylim(zmin, zmax)
+                with stage('interpolate', rows=ninterp**2):
+                    vi = interp(yi[None, :], zi[:, None])[..., 2]
+                contour = {'yi': yi, 'zi': zi, 'vi': vi,
+                           'ymin': ymin, 'ymax': ymax,
+                           'zmin': zmin, 'zmax': zmax}
 
     # ========================================================================
     # Experimental data
-    exp_ux_df = pd.read_csv(fux_exp, delimiter=',',
-                            header=0, names=['y', 'ux'])
-    exp_uz_df = pd.read_csv(fuz_exp, delimiter=',',
-                            header=0, names=['y', 'uz'])
-
-    # Shift in ft to align coordinates with mesh.
-    yshift = 0.0749174
-
-    exp_ux_df['y'] = (exp_ux_df['y'] * mm2ft - yshift) / chord
-    exp_uz_df['y'] = (exp_uz_df['y'] * mm2ft - yshift) / chord
-
-    plt.figure(0)
-    plt.plot(exp_ux_df['y'], exp_ux_df['ux'], ls='-', lw=1, color=cmap[-1],
-             marker=markertype[0], mec=cmap[-1], mfc=cmap[-1], ms=6, label='Exp.')
-
-    plt.figure(1)
-    plt.plot(exp_uz_df['y'], exp_uz_df['uz'], ls='-', lw=1, color=cmap[-1],
-             marker=markertype[0], mec=cmap[-1], mfc=cmap[-1], ms=6)
+    exp = load_exp(edir, chord=chord)
 
     # ========================================================================
     # Save plots
-    plt.figure(0)
-    ax = plt.gca()
-    plt.xlabel(r"$y/c$", fontsize=22, fontweight='bold')
-    plt.ylabel(r"$u_x/u_\infty$", fontsize=22, fontweight='bold')
-    plt.setp(ax.get_xmajorticklabels(), fontsize=16, fontweight='bold')
-    plt.setp(ax.get_ymajorticklabels(), fontsize=16, fontweight='bold')
-    plt.tight_layout()
-    ax.set_xlim([-1, 1])
-    legend = ax.legend(loc='best')
-    plt.savefig('ux.png', format='png')
-
-    plt.figure(1)
-    ax = plt.gca()
-    plt.xlabel(r"$y/c$", fontsize=22, fontweight='bold')
-    plt.ylabel(r"$u_z/u_\infty$", fontsize=22, fontweight='bold')
-    plt.setp(ax.get_xmajorticklabels(), fontsize=16, fontweight='bold')
-    plt.setp(ax.get_ymajorticklabels(), fontsize=16, fontweight='bold')
-    plt.tight_layout()
-    ax.set_xlim([-1, 1])
-    plt.savefig('uz.png', format='png')
-
-    plt.figure(2)
-    ax = plt.gca()
-    plt.xlabel(r"$y/c$", fontsize=22, fontweight='bold')
-    plt.ylabel(r"$z/c$", fontsize=22, fontweight='bold')
-    plt.setp(ax.get_xmajorticklabels(), fontsize=16, fontweight='bold')
-    plt.setp(ax.get_ymajorticklabels(), fontsize=16, fontweight='bold')
-    plt.tight_layout()
-    ax.set_xlim([-1, 1])
-    ax.set_ylim([-1, 1])
-    plt.savefig('magvel.png', format='png')
-
-    if args.show:
-        plt.show()
+    figures = [(plot_lineout, 'ux.png',
+                {'lines': ux_lines,
+                 'exp': {'y': exp['ux'][0],
+                         'u': exp['ux'][1],
+                         'label': 'Exp.'},
+                 'ylabel': r"$u_x/u_\infty$",
+                 'legend': True}),
+               (plot_lineout, 'uz.png',
+                {'lines': uz_lines,
+                 'exp': {'y': exp['uz'][0],
+                         'u': exp['uz'][1],
+                         'label': None},
+                 'ylabel': r"$u_z/u_\infty$"}),
+               (plot_profile, 'vt_profile.png',
+                {'lines': vt_lines,
+                 'ylabel': r"$u_\theta/u_\infty$",
+                 'legend': True}),
+               (plot_profile, 'vx_profile.png',
+                {'lines': vx_lines,
+                 'ylabel': r"$u_x/u_\infty$"}),
+               (plot_contour, 'magvel.png', contour)]
+    with stage('render', rows=len(figures)):
+        render(figures, nprocs=args.nprocs, fast=args.fast,
+               cache='.render_cache_vortex.json', force=args.force,
+               show=args.show)
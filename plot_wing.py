@@ -18,14 +18,18 @@ from matplotlib.collections import PatchCollection
 import pandas as pd
 import scipy.interpolate as spi
 import yaml
+from wing import sort_sections, sectional_coefficients
+from rendering import set_style, render
+from slice_io import read_average
+import instrument
+from instrument import stage
 
 # ========================================================================
 #
 # Some defaults variables
 #
 # ========================================================================
-plt.rc('text', usetex=True)
-plt.rc('font', family='serif', serif='Times')
+set_style()
 cmap_med = ['#F15A60', '#7AC36A', '#5A9BD4', '#FAA75B',
             '#9E67AB', '#CE7058', '#D77FB4', '#737373']
 cmap = ['#EE2E2F', '#008C48', '#185AA9', '#F47D23',
@@ -40,17 +44,6 @@ markertype = ['s', 'd', 'o', 'p', 'h']
 # Function definitions
 #
 # ========================================================================
-def get_merged_csv(fnames, **kwargs):
-    lst = []
-    for fname in fnames:
-        try:
-            df = pd.read_csv(fname, **kwargs)
-            lst.append(df)
-        except pd.errors.EmptyDataError:
-            pass
-    return pd.concat(lst, ignore_index=True)
-
-
 def parse_ic(fname):
     """Parse the Nalu yaml input file for the initial conditions"""
     with open(fname, 'r') as stream:
@@ -69,23 +62,24 @@ def parse_ic(fname):
             print(exc)
 
 
-def sort_by_angle(x, y, var):
-    """Radial sort of variable on x and y for plotting
-
-    Inspired from:
-    http://stackoverflow.com/questions/35606712/numpy-way-to-sort-out-a-messy-array-for-plotting
-
-    """
-
-    # Get the angle wrt the mean of the cloud of points
-    x0, y0 = x.mean(), y.mean()
-    angle = np.arctan2(y - y0, x - x0)
-
-    # Sort based on this angle
-    idx = angle.argsort()
-    idx = np.append(idx, idx[0])
-
-    return x[idx], y[idx], var[idx]
+def plot_cp(oname, lines, chord=1, legend=False):
+    """Plot -cp around a wing section for several runs"""
+    plt.figure()
+    ax = plt.gca()
+    for line in lines:
+        p = plt.plot(line['x'] / chord, line['cp'], ls='-', lw=2,
+                     color=line['color'], label=line['label'])
+        p[0].set_dashes(line['dashes'])
+    plt.xlabel(r"$x/c$", fontsize=22, fontweight='bold')
+    plt.ylabel(r"$-c_p$", fontsize=22, fontweight='bold')
+    plt.setp(ax.get_xmajorticklabels(), fontsize=16, fontweight='bold')
+    plt.setp(ax.get_ymajorticklabels(), fontsize=16, fontweight='bold')
+    plt.xlim([0, chord])
+    plt.ylim([-1.5, 4.5])
+    plt.tight_layout()
+    if legend:
+        legend = ax.legend(loc='best')
+    plt.savefig(oname, format='png')
 
 
 # ========================================================================
@@ -100,30 +94,40 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='A simple plot tool')
     parser.add_argument(
         '-s', '--show', help='Show the plots', action='store_true')
+    parser.add_argument(
+        '-p', '--nprocs', help='Number of processes rendering the figures',
+        type=int, default=1)
+    parser.add_argument(
+        '-f', '--fast', help='Use mathtext instead of LaTeX',
+        action='store_true')
+    parser.add_argument(
+        '--force', help='Render figures even if they are up to date',
+        action='store_true')
+    parser.add_argument(
+        '--fdir', help='Directory of the simulations', default='DES')
+    parser.add_argument(
+        '--deck', help='Nalu input file (in fdir)',
+        default='mcalisterWing64M.i')
+    parser.add_argument(
+        '--sdirs', help='Slice directories (in fdir)', nargs='+',
+        default=['wing_slices64M', 'wing_slicesRC64M'])
+    parser.add_argument(
+        '--labels', help='Labels of the slice directories', nargs='+',
+        default=['DES 64M', 'DES RC 64M'])
+    instrument.add_arguments(parser)
     args = parser.parse_args()
+    instrument.setup(args)
 
     # ========================================================================
     # Setup
     ninterp = 100
     mm2ft = 0.003281
 
-    fdir = os.path.abspath('DES')
-    yname = os.path.join(fdir, 'mcalisterWing64M.i')
+    fdir = os.path.abspath(args.fdir)
+    yname = os.path.join(fdir, args.deck)
     fname = 'avg_slice.csv'
-    # sdirs = ['wing_slices64M',
-    #          'wing_slices64M_shifted',
-    #          'wing_slices300M_shifted',
-    #          'wing_slices64M_nso',
-    #          'wing_slices300M_nso']
-    # labels = ['DES 64M',
-    #           'DES shifted 64M',
-    #           'DES shifted 300M',
-    #           'LES-NSO 64M',
-    #           'LES-NSO 300M']
-    sdirs = ['wing_slices64M',
-             'wing_slicesRC64M']
-    labels = ['DES 64M',
-              'DES RC 64M']
+    sdirs = args.sdirs
+    labels = args.labels
 
     # simulation setup parameters
     u0, rho0, mu = parse_ic(yname)
@@ -131,11 +135,16 @@ if __name__ == '__main__':
 
     # ========================================================================
     # Loop on data directories
+    lst = []
+    lines = {}
     for i, sdir in enumerate([os.path.join(fdir, sdir) for sdir in sdirs]):
 
         # ========================================================================
         # Read in data
-        df = pd.read_csv(os.path.join(sdir, fname), delimiter=',')
+        with stage('read') as s:
+            df = read_average(sdir, fname)
+            s['rows'] = len(df)
+            s['bytes'] = df.memory_usage().sum()
         renames = {'Points:0': 'x',
                    'Points:1': 'y',
                    'Points:2': 'z',
@@ -153,40 +162,45 @@ if __name__ == '__main__':
         # Calculate the negative of the surface pressure coefficient
         df['cp'] = - df['p'] / (0.5 * rho0 * u0**2)
 
+        # ========================================================================
+        # Sort all the slices at once and integrate the sectional loads
+        # (with the pressure coefficient, not its negative)
+        with stage('sections', rows=len(df)):
+            df, starts = sort_sections(df)
+            loads = sectional_coefficients(df.assign(cp=-df['cp']), starts)
+        loads['label'] = labels[i]
+        lst.append(loads)
+
         # ========================================================================
         # Plot cp in each slice
-        yslices = np.unique(df['y'])
+        yslices = df['y'].values[starts]
+        xs = np.split(df['x'].values, starts[1:])
+        cps = np.split(df['cp'].values, starts[1:])
 
-        for k, yslice in enumerate(yslices):
-            subdf = df[df['y'] == yslice]
+        for k, (x, cp) in enumerate(zip(xs, cps)):
 
-            # Sort for a pretty plot
-            x, z, cp = sort_by_angle(np.array(subdf['x']),
-                                     np.array(subdf['z']),
-                                     np.array(subdf['cp']))
+            # Close the section for a pretty plot
+            x = np.append(x, x[0])
+            cp = np.append(cp, cp[0])
 
-            # plot
-            plt.figure(k)
-            ax = plt.gca()
-            p = plt.plot(x / chord, cp, ls='-', lw=2,
-                         color=cmap[i], label=labels[i])
-            p[0].set_dashes(dashseq[i])
+            lines.setdefault(k, []).append({'x': x,
+                                            'cp': cp,
+                                            'color': cmap[i],
+                                            'dashes': dashseq[i],
+                                            'label': labels[i]})
+
+    # ========================================================================
+    # Sectional loads of all the runs at all the stations
+    pd.concat(lst, ignore_index=True).to_csv('sectional_loads.csv',
+                                             index=False)
 
     # ========================================================================
     # Save plots
-    for k, yslice in enumerate(yslices):
-        plt.figure(k)
-        ax = plt.gca()
-        plt.xlabel(r"$x/c$", fontsize=22, fontweight='bold')
-        plt.ylabel(r"$-c_p$", fontsize=22, fontweight='bold')
-        plt.setp(ax.get_xmajorticklabels(), fontsize=16, fontweight='bold')
-        plt.setp(ax.get_ymajorticklabels(), fontsize=16, fontweight='bold')
-        plt.xlim([0, chord])
-        plt.ylim([-1.5, 4.5])
-        plt.tight_layout()
-        if (k == 1):
-            legend = ax.legend(loc='best')
-        plt.savefig('cp_{0:f}.png'.format(yslice), format='png')
-
-    if args.show:
-        plt.show()
+    figures = [(plot_cp,
+                'cp_{0:f}.png'.format(yslice),
+                {'lines': lines[k], 'chord': chord, 'legend': k == 1})
+               for k, yslice in enumerate(yslices)]
+    with stage('render', rows=len(figures)):
+        render(figures, nprocs=args.nprocs, fast=args.fast,
+               cache='.render_cache_wing.json', force=args.force,
+               show=args.show)
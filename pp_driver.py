@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+#
+# This extracts the vortex or wing slices of all the time steps of the
+# Exodus output in independent shards of time steps. Each time step is
+# written to odir/output.<step>.npz once complete, so that steps
+# already done are skipped when a shard is restarted (e.g. after
+# hitting the walltime). The complete time steps are listed in
+# odir/pp_manifest.json (updated after each chunk of time steps),
+# which the averaging scripts read instead of listing the directory.
+# If steps were written some other way, --manifest rewrites it.
+#
+# Run the shards in a local pool of processes:
+#    > /path/to/script/pp_driver.py -k vortex -n 16 /path/to/output /path/to/vortex_slices64M
+#
+# or write (and submit) one batch job per shard:
+#    > /path/to/script/pp_driver.py -k vortex -n 16 --jobs --submit /path/to/output /path/to/vortex_slices64M
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+import sys
+import glob
+import shlex
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from exodus import open_exodus, get_times, extract_chunks
+from extract_slices import configs
+from slice_io import write_npz, write_manifest
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+job_template = """#!/bin/bash -l
+
+#SBATCH --nodes=1
+#SBATCH --time={walltime:s}
+#SBATCH --job-name=pp_{kind:s}_{shard:d}
+{options:s}#SBATCH --cpus-per-task={nprocs:d}
+
+{python:s} {script:s} -k {kind:s} -n {nshards:d} --shard {shard:d} --chunk {chunk:d} -p {nprocs:d} --pattern {pattern:s} {fdir:s} {odir:s}
+"""
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def step_name(odir, step):
+    """File name of a time step"""
+    return os.path.join(odir, 'output.{0:d}.npz'.format(step))
+
+
+def sbatch_options(partition, license, constraint):
+    """#SBATCH lines of the site options that are set"""
+    return ''.join('#SBATCH --{0:s}={1:s}\n'.format(key, value)
+                   for key, value in [('partition', partition),
+                                      ('license', license),
+                                      ('constraint', constraint)]
+                   if value)
+
+
+def get_shard(steps, shard, nshards):
+    """Time steps of a shard (round robin so that shards are balanced)"""
+    return steps[shard::nshards]
+
+
+def process_shard(fnames, config, odir, steps, chunk=10, nprocs=1):
+    """Extract the slices of the time steps that are not done yet
+
+    The geometry of each file is cut once, then the decomposed files
+    are read `chunk` time steps at a time (by a pool of `nprocs`
+    processes), so an interrupted shard loses at most one chunk of
+    work. The manifest is updated after each chunk.
+    """
+    todo = [step for step in steps
+            if not os.path.exists(step_name(odir, step))]
+    if not todo:
+        return 0
+    executor = ProcessPoolExecutor(max_workers=nprocs) if nprocs > 1 \
+        else None
+    try:
+        for frames in extract_chunks(fnames, config, todo, chunk, executor):
+            for step, df in frames.items():
+                write_npz(step_name(odir, step), df)
+            write_manifest(odir)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return len(todo)
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Sharded, restartable slice extraction')
+    parser.add_argument('fdir', help='Directory of the Exodus files')
+    parser.add_argument('odir', help='Slice directory')
+    parser.add_argument(
+        '-k', '--kind', help='Kind of slices', choices=sorted(configs),
+        default='vortex')
+    parser.add_argument(
+        '--pattern', help='Exodus file names', default='mcalisterWing.e.*')
+    parser.add_argument(
+        '-n', '--nshards', help='Number of shards', type=int, default=1)
+    parser.add_argument(
+        '--shard', help='Only process this shard', type=int, default=None)
+    parser.add_argument(
+        '--chunk', help='Number of time steps read at once', type=int,
+        default=10)
+    parser.add_argument(
+        '-p', '--nprocs',
+        help='Number of processes reading the files of a single shard',
+        type=int, default=1)
+    parser.add_argument(
+        '--jobs', help='Write a batch job script for each shard',
+        action='store_true')
+    parser.add_argument(
+        '--submit', help='Submit the batch jobs (with sbatch)',
+        action='store_true')
+    parser.add_argument(
+        '--walltime', help='Walltime of the batch jobs', default='02:00:00')
+    parser.add_argument(
+        '--partition', help='Partition of the batch jobs (empty for none)',
+        default='regular')
+    parser.add_argument(
+        '--license', help='Licenses of the batch jobs (empty for none)',
+        default='SCRATCH')
+    parser.add_argument(
+        '--constraint', help='Node constraint of the batch jobs '
+        '(empty for none)', default='haswell')
+    parser.add_argument(
+        '--manifest', help='Only rewrite the manifest of the slice directory',
+        action='store_true')
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Setup
+    fdir = os.path.abspath(args.fdir)
+    odir = os.path.abspath(args.odir)
+    os.makedirs(odir, exist_ok=True)
+    if args.manifest:
+        write_manifest(odir)
+        sys.exit()
+    fnames = sorted(glob.glob(os.path.join(fdir, args.pattern)))
+    if not fnames:
+        sys.exit('No Exodus files matching {0:s} in {1:s}'.format(
+            args.pattern, fdir))
+    config = configs[args.kind]
+
+    ds = open_exodus(fnames[0])
+    steps = list(range(len(get_times(ds))))
+    ds.close()
+
+    # ========================================================================
+    # Batch jobs, one per shard
+    if args.jobs:
+        for shard in range(args.nshards):
+            jname = os.path.join(odir, 'pp_shard{0:d}.job'.format(shard))
+            with open(jname, 'w') as f:
+                f.write(job_template.format(
+                    walltime=args.walltime,
+                    options=sbatch_options(args.partition, args.license,
+                                           args.constraint),
+                    kind=args.kind,
+                    shard=shard,
+                    nshards=args.nshards,
+                    chunk=args.chunk,
+                    nprocs=args.nprocs,
+                    python=shlex.quote(sys.executable),
+                    script=shlex.quote(os.path.abspath(__file__)),
+                    pattern=shlex.quote(args.pattern),
+                    fdir=shlex.quote(fdir),
+                    odir=shlex.quote(odir)))
+            if args.submit:
+                subprocess.run(['sbatch', jname], check=True)
+            else:
+                print('Wrote', jname)
+        sys.exit()
+
+    # ========================================================================
+    # Process one shard (reading the files in parallel) or all of them in
+    # a pool of processes
+    if args.shard is not None:
+        ndone = process_shard(fnames, config, odir,
+                              get_shard(steps, args.shard, args.nshards),
+                              args.chunk, args.nprocs)
+    else:
+        with ProcessPoolExecutor(max_workers=args.nshards) as executor:
+            ndone = sum(executor.map(
+                process_shard,
+                [fnames] * args.nshards,
+                [config] * args.nshards,
+                [odir] * args.nshards,
+                [get_shard(steps, shard, args.nshards)
+                 for shard in range(args.nshards)],
+                [args.chunk] * args.nshards,
+                [args.nprocs] * args.nshards))
+
+    print('Extracted {0:d} new time steps'.format(ndone))
@@ -2,6 +2,9 @@
 # Run this script on NERSC Edison with something like:
 #    start_pvbatch.sh 4 4 00:10:00 default debug `pwd`/pp_vortex.py
 #
+# The slice locations, the box and the variables can be changed with
+# the command line arguments (see pvbatch pp_vortex.py --help).
+#
 
 
 # ----------------------------------------------------------------
@@ -12,38 +15,65 @@ from paraview.simple import *
 # disable automatic camera reset on 'Show'
 paraview.simple._DisableFirstRenderCameraReset()
 
+import argparse
 import os
 import glob
 import shutil
+from pv_binary import save_binary
 
 # ----------------------------------------------------------------
 # setup
 # ----------------------------------------------------------------
+parser = argparse.ArgumentParser(description='Extract vortex slices')
+parser.add_argument(
+    '--fdir', help='Directory of the Exodus files',
+    default='/global/cscratch1/sd/spdomin/mcalister_nso_les_des/mc_des_300M/output')
+parser.add_argument(
+    '--pattern', help='Exodus file names',
+    default='mcalisterWingLIM_DES_shifted.e.*')
+parser.add_argument(
+    '--odir', help='Output directory',
+    default='/global/cscratch1/sd/marchdf/McalisterWing/DES/vortex_slices300M')
+parser.add_argument(
+    '--xorigin', help='x location of the first slice', type=float,
+    default=1.0)
+parser.add_argument(
+    '--offsets', help='Slice offsets from xorigin', type=float, nargs='+',
+    default=[0.0, 0.1, 0.2, 0.5, 1.0, 2.0, 4.0, 6.0])
+parser.add_argument(
+    '--box', help='Extents of the slices (ymin ymax zmin zmax)', type=float,
+    nargs=4, default=[-1.0, 1.0, -1.0, 1.0])
+parser.add_argument(
+    '--variables', help='Point variables', nargs='+',
+    default=['pressure', 'velocity_'])
+parser.add_argument(
+    '--binary', help='Write full precision binary (npz) files',
+    action='store_true')
+args, unknown = parser.parse_known_args()
 
 # Get file names
-fdir = os.path.abspath(
-    #'/global/cscratch1/sd/marchdf/McalisterWing/DES/output68M')
-    #'/global/cscratch1/sd/spdomin/mcalister_nso_les_des/mc_des_68M/output')
-    #'/global/cscratch1/sd/spdomin/mcalister_nso_les_des/mc_nso_68M/output')
-    '/global/cscratch1/sd/spdomin/mcalister_nso_les_des/mc_des_300M/output')
-    #'/global/cscratch1/sd/spdomin/mcalister_nso_les_des/mc_nso_300M/output')
-pattern = 'mcalisterWingLIM_DES_shifted.e.*'
-#pattern = 'mcalisterWing.e.*'
-fnames = sorted(glob.glob(os.path.join(fdir, pattern)))
-
-odir = os.path.abspath(
-    '/global/cscratch1/sd/marchdf/McalisterWing/DES/vortex_slices300M')
+fdir = os.path.abspath(args.fdir)
+fnames = sorted(glob.glob(os.path.join(fdir, args.pattern)))
+
+odir = os.path.abspath(args.odir)
 shutil.rmtree(odir, ignore_errors=True)
 os.makedirs(odir)
 oname = os.path.join(odir, 'output.csv')
 
+# Box containing all the slices (with a small margin in x so that the
+# cells on each side of the first and last slices are kept)
+margin = 1e-3
+xmin = args.xorigin + min(args.offsets) - margin
+xmax = args.xorigin + max(args.offsets) + margin
+ymin, ymax, zmin, zmax = args.box
+
 # ----------------------------------------------------------------
 # setup the data processing pipelines
 # ----------------------------------------------------------------
 
 # create a new 'ExodusIIReader'
 exoreader = ExodusIIReader(FileName=fnames)
-exoreader.PointVariables = ['pressure', 'velocity_']
+exoreader.PointVariables = args.variables
 exoreader.SideSetArrayStatus = []
 exoreader.ElementBlocks = ['upstream-hex',
                            'tipvortex-hex',
@@ -57,57 +87,44 @@ exoreader.ElementBlocks = ['upstream-hex',
 # get active view
 renderView1 = GetActiveViewOrCreate('RenderView')
 
+# create a new 'Extract Cells By Region'
+# pre-cull the cells outside of the box so that the slice and clip
+# only traverse the cells around the vortex
+extract1 = ExtractCellsByRegion(Input=exoreader)
+extract1.IntersectWith = 'Box'
+extract1.IntersectWith.Position = [xmin, ymin, zmin]
+extract1.IntersectWith.Length = [xmax - xmin, ymax - ymin, zmax - zmin]
+extract1.Extractintersected = 1
+
 # create a new 'Slice'
-slice1 = Slice(Input=exoreader)
+slice1 = Slice(Input=extract1)
 slice1.SliceType = 'Plane'
-slice1.SliceOffsetValues = [0.0, 0.1, 0.2, 0.5, 1.0, 2.0, 4.0, 6.0]
+slice1.SliceOffsetValues = args.offsets
 
 # init the 'Plane' selected for 'SliceType'
-slice1.SliceType.Origin = [1.0, 0.0, 0.0]
+slice1.SliceType.Origin = [args.xorigin, 0.0, 0.0]
 
 # create a new 'Clip'
+# clip the slices to the box in one pass
 clip1 = Clip(Input=slice1)
-clip1.ClipType = 'Plane'
+clip1.ClipType = 'Box'
 clip1.Scalars = ['POINTS', 'pressure']
+clip1.Invert = 1
 
-# init the 'Plane' selected for 'ClipType'
-clip1.ClipType.Origin = [0.0, 1.0, 0.0]
-clip1.ClipType.Normal = [0.0, -1.0, 0.0]
-
-# create a new 'Clip'
-clip2 = Clip(Input=clip1)
-clip2.ClipType = 'Plane'
-clip2.Scalars = ['POINTS', 'pressure']
-
-# init the 'Plane' selected for 'ClipType'
-clip2.ClipType.Origin = [0.0, -1.0, 0.0]
-clip2.ClipType.Normal = [0.0, 1.0, 0.0]
-
-# create a new 'Clip'
-clip3 = Clip(Input=clip2)
-clip3.ClipType = 'Plane'
-clip3.Scalars = ['POINTS', 'pressure']
-
-# init the 'Plane' selected for 'ClipType'
-clip3.ClipType.Origin = [0.0, 0.0, 1.0]
-clip3.ClipType.Normal = [0.0, 0.0, -1.0]
-
-# create a new 'Clip'
-clip4 = Clip(Input=clip3)
-clip4.ClipType = 'Plane'
-clip4.Scalars = ['POINTS', 'pressure']
-
-# init the 'Plane' selected for 'ClipType'
-clip4.ClipType.Origin = [0.0, 0.0, -1.0]
-clip4.ClipType.Normal = [0.0, 0.0, 1.0]
+# init the 'Box' selected for 'ClipType'
+clip1.ClipType.Position = [xmin, ymin, zmin]
+clip1.ClipType.Length = [xmax - xmin, ymax - ymin, zmax - zmin]
 
 
 # ----------------------------------------------------------------
 # save data
 # ----------------------------------------------------------------
-SaveData(oname,
-         proxy=clip4,
-         Precision=5,
-         UseScientificNotation=0,
-         WriteAllTimeSteps=1,
-         FieldAssociation='Points')
+if args.binary:
+    save_binary(clip1, odir, exoreader.TimestepValues)
+else:
+    SaveData(oname,
+             proxy=clip1,
+             Precision=5,
+             UseScientificNotation=0,
+             WriteAllTimeSteps=1,
+             FieldAssociation='Points')
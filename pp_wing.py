@@ -2,6 +2,8 @@
 # Run this script on NERSC Edison with something like:
 #    start_pvbatch.sh 4 4 00:10:00 default debug `pwd`/pp_wing.py
 #
+# Use pvbatch pp_wing.py --binary for full precision binary output.
+#
 
 
 # ----------------------------------------------------------------
@@ -12,13 +14,20 @@ from paraview.simple import *
 # disable automatic camera reset on 'Show'
 paraview.simple._DisableFirstRenderCameraReset()
 
+import argparse
 import os
 import glob
 import shutil
+from pv_binary import save_binary
 
 # ----------------------------------------------------------------
 # setup
 # ----------------------------------------------------------------
+parser = argparse.ArgumentParser(description='Extract wing slices')
+parser.add_argument(
+    '--binary', help='Write full precision binary (npz) files',
+    action='store_true')
+args, unknown = parser.parse_known_args()
 
 # Get file names
 fdir = os.path.abspath(
@@ -72,9 +81,12 @@ slice1.SliceType.Normal = [0.0, 1.0, 0.0]
 # ----------------------------------------------------------------
 # save data
 # ----------------------------------------------------------------
-SaveData(oname,
-         proxy=slice1,
-         Precision=5,
-         UseScientificNotation=0,
-         WriteAllTimeSteps=1,
-         FieldAssociation='Points')
+if args.binary:
+    save_binary(slice1, odir, exoreader.TimestepValues)
+else:
+    SaveData(oname,
+             proxy=slice1,
+             Precision=5,
+             UseScientificNotation=0,
+             WriteAllTimeSteps=1,
+             FieldAssociation='Points')
@@ -0,0 +1,283 @@
+#
+# In-situ sampling of the slices with Nalu data probes
+#
+# Instead of writing the full fields to Exodus and slicing them
+# afterwards (pp_vortex.py, pp_wing.py), Nalu samples them on the fly
+# along lines of sight (data_probes block of a realm). The planes of
+# pp_vortex.py are sampled by one line along y per z location, the
+# wing sections of pp_wing.py by short segments along the airfoil
+# contour and the experimental lineout at x/c=4 by a fine band of
+# lines across the vortex core.
+#
+# Nalu writes one file per line (<line name>.dat) with a header line
+# and, at each sampled time step, one row per point: time, coordinates
+# and the components of the sampled fields. The reader returns them
+# with the ParaView column names so that the slice scripts work on
+# them unchanged. The files can be read while Nalu writes them: only
+# the samples with all the points of every line are kept.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import os
+import io
+import re
+import numpy as np
+import pandas as pd
+import yaml
+from slice_io import point_columns
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+# Slices of pp_vortex.py and pp_wing.py
+vortex_origin = 1.0
+vortex_offsets = [0.0, 0.1, 0.2, 0.5, 1.0, 2.0, 4.0, 6.0]
+vortex_box = [-1.0, 1.0, -1.0, 1.0]
+wing_offsets = [0.0, 0.0198, 0.0528, 0.0858, 0.1353, 0.1848, 0.3333,
+                0.5181, 0.7491, 1.0164, 1.3299, 1.6797, 2.079, 2.5146,
+                2.9898]
+
+# Sampled fields (name, number of components)
+volume_fields = [('velocity', 3), ('pressure', 1)]
+wing_fields = [('pressure', 1), ('pressure_force', 3), ('tau_wall', 1)]
+
+probe_suffix = '.dat'
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def output_variables(fields):
+    """output_variables entry of a probe specification"""
+    return [{'field_name': name, 'field_size': size}
+            for name, size in fields]
+
+
+def column_names(fields):
+    """ParaView names of the components of the fields"""
+    names = []
+    for name, size in fields:
+        if size == 1:
+            names.append(name)
+        else:
+            names += ['{0:s}_:{1:d}'.format(name, k) for k in range(size)]
+    return names
+
+
+def line(name, tail, tip, npoints):
+    """Line of sight from tail to tip"""
+    return {'name': name,
+            'number_of_points': int(npoints),
+            'tip_coordinates': [round(float(c), 6) for c in tip],
+            'tail_coordinates': [round(float(c), 6) for c in tail]}
+
+
+def plane_lines(name, x, ymin, ymax, zmin, zmax, ny, nz):
+    """Lines along y at each z of a constant x plane"""
+    return [line('{0:s}_z{1:03d}'.format(name, k), [x, ymin, z],
+                 [x, ymax, z], ny)
+            for k, z in enumerate(np.linspace(zmin, zmax, nz))]
+
+
+def naca_contour(npoints, thickness=0.15, chord=1.0, aoa=0.0, pivot=0.25):
+    """Closed contour of a symmetric NACA section (x, z)
+
+    The section is pitched nose up by `aoa` degrees about the `pivot`
+    point (fraction of the chord). Points are clustered at the leading
+    and trailing edges.
+    """
+    theta = np.linspace(0, 2 * np.pi, npoints, endpoint=False)
+    xc = 0.5 * (1 - np.cos(theta))
+    zc = 5 * thickness * (0.2969 * np.sqrt(xc) - 0.1260 * xc
+                          - 0.3516 * xc**2 + 0.2843 * xc**3
+                          - 0.1036 * xc**4)
+    zc[theta > np.pi] *= -1
+    a = np.radians(aoa)
+    xp = pivot * chord
+    x = xc * chord - xp
+    z = zc * chord
+    return np.column_stack((xp + x * np.cos(a) + z * np.sin(a),
+                            -x * np.sin(a) + z * np.cos(a)))
+
+
+def section_lines(name, y, contour, npoints=2):
+    """Segments along the contour of a wing section at span station y"""
+    nxt = np.roll(contour, -1, axis=0)
+    return [line('{0:s}_s{1:04d}'.format(name, k), [p[0], y, p[1]],
+                 [q[0], y, q[1]], npoints)
+            for k, (p, q) in enumerate(zip(contour, nxt))]
+
+
+def vortex_specification(parts, offsets=vortex_offsets,
+                         origin=vortex_origin, box=vortex_box, ny=200,
+                         nz=200, fields=volume_fields):
+    """Probe specifications of the vortex planes"""
+    ymin, ymax, zmin, zmax = box
+    return [{'name': 'vortex_x{0:d}'.format(k),
+             'from_target_part': list(parts),
+             'line_of_site_specifications': plane_lines(
+                 'vortex_x{0:d}'.format(k), origin + offset, ymin, ymax,
+                 zmin, zmax, ny, nz),
+             'output_variables': output_variables(fields)}
+            for k, offset in enumerate(offsets)]
+
+
+def wing_specification(offsets=wing_offsets, npoints=200, aoa=12.0,
+                       chord=1.0, part='Wing', fields=wing_fields):
+    """Probe specifications of the wing sections"""
+    contour = naca_contour(npoints, chord=chord, aoa=aoa)
+    return [{'name': 'wing_y{0:d}'.format(k),
+             'from_target_part': part,
+             'line_of_site_specifications': section_lines(
+                 'wing_y{0:d}'.format(k), y, contour),
+             'output_variables': output_variables(fields)}
+            for k, y in enumerate(sorted(set(offsets)))]
+
+
+def lineout_specification(parts, x=5.0, yrange=(-0.7, 1.2),
+                          zrange=(-0.2, 0.2), ny=400, nz=41,
+                          fields=volume_fields):
+    """Probe specification of the experimental lineout at x/c=4
+
+    The vortex core is not known beforehand, so a band of lines along
+    y covers its possible z locations (see compare.core_lineouts).
+    """
+    return [{'name': 'lineout',
+             'from_target_part': list(parts),
+             'line_of_site_specifications': plane_lines(
+                 'lineout', x, yrange[0], yrange[1], zrange[0], zrange[1],
+                 ny, nz),
+             'output_variables': output_variables(fields)}]
+
+
+def probe_block(specifications, frequency=10):
+    """data_probes block of a realm"""
+    return {'data_probes': {'output_frequency': int(frequency),
+                            'search_method': 'stk_kdtree',
+                            'search_tolerance': 1.0e-3,
+                            'search_expansion_factor': 2.0,
+                            'specifications': specifications}}
+
+
+def volume_parts(deck_text):
+    """Volume blocks of a deck (target of the material properties)"""
+    realm = yaml.safe_load(deck_text)['realms'][0]
+    parts = realm['material_properties']['target_name']
+    return parts if isinstance(parts, list) else [parts]
+
+
+def insert_probes(deck_text, block, exodus_frequency=None):
+    """Deck with a data_probes block in its (first) realm
+
+    The block is inserted before the output block. With
+    `exodus_frequency`, the output frequency of the Exodus files is
+    changed (e.g. to only keep occasional full fields).
+    """
+    text = yaml.safe_dump(block, default_flow_style=None, sort_keys=False,
+                          width=1000)
+    text = ''.join('    ' + row if row.strip() else row
+                   for row in text.splitlines(True))
+    m = re.search(r'^    output:\s*$', deck_text, flags=re.M)
+    if m is None:
+        raise ValueError('No realm output block in the deck')
+    deck_text = deck_text[:m.start()] + text + '\n' + deck_text[m.start():]
+    if exodus_frequency is not None:
+        deck_text = re.sub(
+            r'(^    output:\s*\n(?:      .*\n)*?      output_frequency:\s*)'
+            r'\d+', r'\g<1>{0:d}'.format(exodus_frequency), deck_text,
+            count=1, flags=re.M)
+    return deck_text
+
+
+def get_probe_fields(deck_text):
+    """Sampled fields of each probe specification of a deck"""
+    realm = yaml.safe_load(deck_text)['realms'][0]
+    block = realm.get('data_probes', {})
+    return {spec['name']: [(v['field_name'], int(v['field_size']))
+                           for v in spec['output_variables']]
+            for spec in block.get('specifications', [])}, \
+        int(block.get('output_frequency', 1))
+
+
+def get_probe_lines(deck_text):
+    """Number of points of each line of each probe specification"""
+    realm = yaml.safe_load(deck_text)['realms'][0]
+    block = realm.get('data_probes', {})
+    return {spec['name']: {los['name']: int(los['number_of_points'])
+                           for los in spec['line_of_site_specifications']}
+            for spec in block.get('specifications', [])}
+
+
+def read_probe(fname, fields):
+    """Dataframe of a probe file (all the sampled time steps)
+
+    Header lines (written again by Nalu on restart) and a partially
+    written last line are skipped.
+    """
+    names = ['time'] + point_columns + column_names(fields)
+    with open(fname, 'r') as f:
+        text = f.read()
+    text = text[:text.rfind('\n') + 1]
+    rows = ''.join(line for line in text.splitlines(True)
+                   if line.strip() and not line[:1].isalpha())
+    if not rows:
+        return pd.DataFrame({name: np.empty(0) for name in names})
+    df = pd.read_csv(io.StringIO(rows), sep=r'\s+', header=None,
+                     names=names, dtype=np.float64, engine='c')
+    return df.dropna().reset_index(drop=True)
+
+
+def read_probes(fdir, lines, fields):
+    """Dataframe of the complete samples of the lines of a specification
+
+    `lines` maps the name of each line to its number of points (see
+    `get_probe_lines`). A sample (time) is kept only if every line
+    file has all its points at that time, so a sample that Nalu is
+    still writing is left out. Returns the dataframe and all the
+    sampled times (complete or not).
+    """
+    lst = []
+    complete = None
+    sampled = set()
+    for name, npoints in sorted(lines.items()):
+        fname = os.path.join(fdir, name + probe_suffix)
+        if not os.path.exists(fname):
+            raise FileNotFoundError('No probe file ' + fname)
+        df = read_probe(fname, fields).drop_duplicates(
+            subset=['time'] + point_columns)
+        count = df.groupby('time').size()
+        times = set(count.index[count == npoints])
+        complete = times if complete is None else complete & times
+        sampled |= set(count.index)
+        lst.append(df)
+    df = pd.concat(lst, ignore_index=True)
+    df = df[df['time'].isin(complete or set())]
+    return df.drop_duplicates(subset=['time'] + point_columns), \
+        np.array(sorted(sampled))
+
+
+def split_steps(df, frequency=1, times=None):
+    """Dataframes of each sampled time step
+
+    The probes do not record the step, so the k-th sample (of `times`,
+    all the sampled times, or of the times in `df`) is given the step
+    k * frequency.
+    """
+    if times is None:
+        times = np.unique(df['time'].values)
+    times = np.asarray(times)
+    ids = np.searchsorted(times, df['time'].values)
+    order = np.argsort(ids, kind='stable')
+    starts = np.searchsorted(ids[order], np.arange(len(times) + 1))
+    df = df.iloc[order].drop(columns='time')
+    return {k * frequency: df.iloc[starts[k]:starts[k + 1]].reset_index(
+        drop=True) for k in range(len(times)) if starts[k + 1] > starts[k]}
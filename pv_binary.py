@@ -0,0 +1,63 @@
+#
+# Binary, full precision output of a ParaView pipeline (for pvbatch)
+#
+# Each rank writes the points and point data of each time step to
+# odir/output<rank>.<step>.npz, which the averaging scripts read like
+# the CSV files (see slice_io.py). The files are written under a
+# temporary name and renamed, so a file with the final name is always
+# complete.
+#
+
+# ----------------------------------------------------------------
+# imports
+# ----------------------------------------------------------------
+from paraview.simple import *
+
+
+# ----------------------------------------------------------------
+# setup
+# ----------------------------------------------------------------
+
+# Script of the ProgrammableFilter executed on each rank
+script = """
+import os
+import numpy as np
+try:
+    from vtkmodules.vtkParallelCore import vtkMultiProcessController
+except ImportError:
+    from vtk import vtkMultiProcessController
+
+controller = vtkMultiProcessController.GetGlobalController()
+rank = controller.GetLocalProcessId() if controller else 0
+
+data = inputs[0]
+arrays = {{}}
+if data.GetNumberOfPoints() > 0:
+    for k in range(3):
+        arrays['Points:{{0:d}}'.format(k)] = np.asarray(data.Points[:, k])
+    for name in data.PointData.keys():
+        values = np.asarray(data.PointData[name])
+        if values.ndim == 1:
+            arrays[name] = values
+        else:
+            for k in range(values.shape[1]):
+                arrays['{{0:s}}:{{1:d}}'.format(name, k)] = values[:, k]
+
+fname = os.path.join({odir!r}, 'output{{0:d}}.{step:d}.npz'.format(rank))
+with open(fname + '.tmp', 'wb') as f:
+    np.savez(f, **arrays)
+os.replace(fname + '.tmp', fname)
+output.ShallowCopy(inputs[0].VTKObject)
+"""
+
+
+# ----------------------------------------------------------------
+# function definitions
+# ----------------------------------------------------------------
+def save_binary(proxy, odir, times):
+    """Write the point data of all time steps to npz files"""
+    merge = MergeBlocks(Input=proxy)
+    writer = ProgrammableFilter(Input=merge)
+    for step, time in enumerate(times):
+        writer.Script = script.format(odir=odir, step=step)
+        writer.UpdatePipeline(time)
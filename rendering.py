@@ -0,0 +1,109 @@
+#
+# Rendering of the figures of the plot scripts
+#
+# Each figure is described by a function, an output file name and the
+# data it plots. Independent figures are rendered in a pool of
+# processes and a figure is skipped if its data, its plotting function
+# and the style are unchanged since it was last rendered.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import os
+import json
+import pickle
+import hashlib
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib as mpl
+mpl.use('Agg')
+import matplotlib.pyplot as plt
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def set_style(fast=False):
+    """Set the plot style, mathtext instead of LaTeX if `fast`"""
+    plt.rc('text', usetex=not fast)
+    plt.rc('font', family='serif', serif='Times')
+
+
+def module_source(obj):
+    """Source of the module defining obj, empty if it is not available"""
+    try:
+        return inspect.getsource(inspect.getmodule(obj))
+    except (TypeError, OSError):
+        return ''
+
+
+def figure_hash(func, data, fast):
+    """Hash of everything a figure depends on
+
+    The sources of the module of the plotting function (its module
+    level settings, e.g. colors and dashes) and of this module (the
+    style) are included, as well as the matplotlib version.
+    """
+    sha = hashlib.sha1()
+    sha.update(inspect.getsource(func).encode())
+    sha.update(module_source(func).encode())
+    sha.update(module_source(set_style).encode())
+    sha.update(mpl.__version__.encode())
+    sha.update(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+    sha.update(str(fast).encode())
+    return sha.hexdigest()
+
+
+def render_figure(func, oname, data, fast=False, close=True):
+    """Render one figure"""
+    set_style(fast)
+    func(oname, **data)
+    if close:
+        plt.close('all')
+
+
+def _render_figure_star(args):
+    """Unpack the arguments for render_figure in a worker process"""
+    return render_figure(*args)
+
+
+def render(figures, nprocs=1, fast=False, cache='.render_cache.json',
+           force=False, show=False):
+    """Render a list of (function, output name, data) figures
+
+    Figures whose file exists and whose hash is the one recorded in
+    `cache` are skipped unless `force`. With `show`, the figures are
+    rendered in this process and shown.
+    """
+    hashes = {}
+    if os.path.exists(cache) and not force:
+        with open(cache, 'r') as f:
+            hashes = json.load(f)
+
+    todo = []
+    for func, oname, data in figures:
+        digest = figure_hash(func, data, fast)
+        if show or hashes.get(oname) != digest or not os.path.exists(oname):
+            todo.append((func, oname, data, fast))
+        hashes[oname] = digest
+
+    if show:
+        for args in todo:
+            render_figure(*args, close=False)
+        plt.show()
+    elif nprocs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=nprocs) as executor:
+            list(executor.map(_render_figure_star, todo))
+    else:
+        for args in todo:
+            render_figure(*args)
+
+    with open(cache, 'w') as f:
+        json.dump(hashes, f, indent=2)
+
+    return [args[1] for args in todo]
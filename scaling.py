@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+#
+# This generates strong scaling sweeps of a case (node counts, ranks
+# per node and decomposition types) from its input deck and job script,
+# or weak scaling sweeps of several meshes (node counts proportional to
+# the mesh size, fixed cells per rank), and collects the logs of the
+# runs into speedup and efficiency tables and plots, with the cheapest
+# layout of each mesh.
+#
+# Generate a sweep, e.g. from /scratch/mhenryde/McalisterWing:
+#    > /path/to/script/scaling.py generate -i DES/mcalisterWing64M.i -j DES/mcalisterWing64M.job --nodes 16 32 64 128 --decompositions rcb rib -o scaling
+#    > /path/to/script/scaling.py generate --weak -i DES/mcalisterWing64M.i DES/mcalisterWing300M.i -j DES/mcalisterWing64M.job DES/mcalisterWing300M.job --nodes 16 -o weak_scaling
+#
+# and collect it once the runs are done:
+#    > /path/to/script/scaling.py collect scaling
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+import re
+import json
+import glob
+import shutil
+import numpy as np
+import pandas as pd
+import matplotlib as mpl
+mpl.use('Agg')
+import matplotlib.pyplot as plt
+from nalu_log import LogReader, LogParser, wall_per_step, throughput
+from rendering import render
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+case_name = 'case.json'
+
+cmap_med = ['#F15A60', '#7AC36A', '#5A9BD4', '#FAA75B',
+            '#9E67AB', '#CE7058', '#D77FB4', '#737373']
+markertype = ['s', 'd', 'o', 'p', 'h']
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def set_key(text, key, value):
+    """Set the value of a `key: value` line of a deck"""
+    return re.sub(r'^(\s*{0:s}:\s*)\S+'.format(re.escape(key)),
+                  r'\g<1>{0:s}'.format(str(value)), text, flags=re.M)
+
+
+def make_deck(text, tdir, decomposition, nsteps):
+    """Input deck of a scaling run from the deck of a case
+
+    The mesh path is made absolute (the runs are in subdirectories),
+    the decomposition type and number of steps are set.
+    """
+    mesh = re.search(r'^\s*mesh:\s*(\S+)', text, flags=re.M).group(1)
+    text = set_key(text, 'mesh', os.path.normpath(os.path.join(tdir, mesh)))
+    text = set_key(text, 'automatic_decomposition_type', decomposition)
+    return set_key(text, 'termination_step_count', nsteps)
+
+
+def make_job(text, tdir, name, nodes, ppn, walltime):
+    """Batch job script (SLURM or PBS) of a scaling run"""
+    ranks = nodes * ppn
+    subs = [(r'(#SBATCH --nodes=)\d+', nodes),
+            (r'(#SBATCH --ntasks=)\d+', ranks),
+            (r'(#SBATCH --time=)\S+', walltime),
+            (r'(#SBATCH --job-name=)\S+', name),
+            (r'(export nodes=)\d+', nodes),
+            (r'(export cores=)\d+', ppn),
+            (r'(export totalCores=)\d+', ranks),
+            (r'(#PBS -l walltime=)\S+', walltime),
+            (r'(#PBS -l nodes=)\d+:ppn=\d+',
+             '{0:d}:ppn={1:d}'.format(nodes, ppn)),
+            (r'(#PBS -N )\S+', name),
+            (r'(-np )\d+', ranks)]
+    for regex, value in subs:
+        text = re.sub(regex, r'\g<1>{0:s}'.format(str(value)), text)
+
+    # Relative executables are relative to the case directory
+    def absolute(m):
+        path = m.group(2)
+        if not os.path.isabs(path) and not path.startswith('$'):
+            path = os.path.normpath(os.path.join(tdir, path))
+        return m.group(1) + path
+    return re.sub(r'(export executable=)(\S+)', absolute, text)
+
+
+def get_ncells(deck):
+    """Mesh size from the deck name, e.g. 64e6 for mcalisterWing64M.i"""
+    m = re.search(r'(\d+)M', os.path.basename(deck))
+    return float(m.group(1)) * 1e6 if m else np.nan
+
+
+def weak_nodes(nodes, ncells, ncells_ref):
+    """Node counts of a mesh with the cells per node of the reference"""
+    return [max(1, int(round(n * ncells / ncells_ref))) for n in nodes]
+
+
+def generate(decks, jobs, odir, nodes, ppns, decompositions, nsteps=50,
+             walltime='00:30:00', weak=False):
+    """Write the run directories of a scaling sweep
+
+    `decks` and `jobs` are the input decks and their job scripts (one
+    for all the decks, or one per deck). With `weak`, the node counts
+    are those of the first deck and are scaled by the mesh size for
+    the others, so that all the meshes have the same cells per rank.
+
+    Returns the list of directories.
+    """
+    if len(jobs) == 1:
+        jobs = list(jobs) * len(decks)
+    if len(jobs) != len(decks):
+        raise ValueError('Give one job script, or one per deck')
+    ncells_ref = get_ncells(decks[0])
+    if weak and np.isnan([get_ncells(deck) for deck in decks]).any():
+        raise ValueError('The mesh sizes are needed in the deck names '
+                         '(e.g. mcalisterWing64M.i) for a weak sweep')
+
+    cdirs = []
+    for deck, job in zip(decks, jobs):
+        cdirs += generate_case(
+            deck, job, odir,
+            weak_nodes(nodes, get_ncells(deck), ncells_ref) if weak
+            else nodes, ppns, decompositions, nsteps, walltime,
+            'weak' if weak else 'strong')
+    return cdirs
+
+
+def generate_case(deck, job, odir, nodes, ppns, decompositions, nsteps=50,
+                  walltime='00:30:00', scaling='strong'):
+    """Write the run directories of a case
+
+    Returns the list of directories.
+    """
+    tdir = os.path.dirname(os.path.abspath(deck))
+    with open(deck, 'r') as f:
+        deck_text = f.read()
+    with open(job, 'r') as f:
+        job_text = f.read()
+    base = os.path.splitext(os.path.basename(deck))[0]
+
+    # Other files the runs need (e.g. the MueLu parameters)
+    extras = re.findall(r'^\s*\w+_file_name:\s*(\S+)', deck_text, flags=re.M)
+    outputs = re.findall(r'^\s*\w+_data_base_name:\s*(\S+)', deck_text,
+                         flags=re.M)
+
+    cdirs = []
+    for decomposition in decompositions:
+        for ppn in ppns:
+            for n in nodes:
+                name = '{0:s}_{1:s}_N{2:d}_ppn{3:d}'.format(
+                    base, decomposition, n, ppn)
+                cdir = os.path.join(odir, name)
+                os.makedirs(cdir, exist_ok=True)
+                with open(os.path.join(cdir, base + '.i'), 'w') as f:
+                    f.write(make_deck(deck_text, tdir, decomposition, nsteps))
+                with open(os.path.join(cdir, os.path.basename(job)),
+                          'w') as f:
+                    f.write(make_job(job_text, tdir, name, n, ppn, walltime))
+                for extra in extras:
+                    if os.path.exists(os.path.join(tdir, extra)):
+                        shutil.copy(os.path.join(tdir, extra), cdir)
+                for output in outputs:
+                    os.makedirs(os.path.join(cdir, os.path.dirname(output)),
+                                exist_ok=True)
+                with open(os.path.join(cdir, case_name), 'w') as f:
+                    json.dump({'case': base,
+                               'ncells': get_ncells(deck),
+                               'decomposition': decomposition,
+                               'nodes': n,
+                               'ppn': ppn,
+                               'ranks': n * ppn,
+                               'scaling': scaling,
+                               'log': base + '.o'}, f, indent=2)
+                cdirs.append(cdir)
+    return cdirs
+
+
+def collect(odir, skip=5):
+    """Table of the scaling runs of a sweep
+
+    The wall time per step is the median over the steps after the
+    first `skip` ones (setup), or the total of the timers over the
+    steps if the log has no per-step wall times. The speedup and
+    efficiency of a run are relative to the run of the same case and
+    decomposition with the fewest ranks. The weak scaling efficiency
+    of the runs of a weak sweep is relative to the run of the same
+    decomposition and ranks per node with the fewest ranks (over all
+    the meshes), see `weak_efficiency`.
+    """
+    lst = []
+    for cname in sorted(glob.glob(os.path.join(odir, '*', case_name))):
+        with open(cname, 'r') as f:
+            case = json.load(f)
+        case.setdefault('scaling', 'strong')
+        lname = os.path.join(os.path.dirname(cname), case['log'])
+        if not os.path.exists(lname):
+            continue
+        log = LogParser()
+        for line in LogReader(lname).read():
+            log.feed(line)
+        steps = log.step_table()
+        if len(steps) == 0:
+            continue
+
+        wall = wall_per_step(steps)[skip:]
+        if np.all(np.isnan(wall)):
+            wall = throughput(steps, timers=log.timer_table())['wall_per_step']
+        else:
+            wall = np.nanmedian(wall)
+        case['nsteps'] = len(steps)
+        case['wall_per_step'] = wall
+        lst.append(case)
+
+    df = pd.DataFrame(lst)
+    if len(df) == 0:
+        return df
+    df.sort_values(by=['case', 'decomposition', 'ranks'], inplace=True)
+    grp = df.groupby(['case', 'decomposition'])
+    ref = grp['wall_per_step'].transform('first')
+    ref_ranks = grp['ranks'].transform('first')
+    df['speedup'] = ref / df['wall_per_step']
+    df['efficiency'] = df['speedup'] * ref_ranks / df['ranks']
+    df['node_hours_per_step'] = df['nodes'] * df['wall_per_step'] / 3600.0
+    df['cells_per_rank'] = df['ncells'] / df['ranks']
+    df['core_us_per_cell_step'] = 1e6 * df['ranks'] * df['wall_per_step'] \
+        / df['ncells']
+    df['weak_efficiency'] = weak_efficiency(df)
+    return df.reset_index(drop=True)
+
+
+def weak_efficiency(df):
+    """Weak scaling efficiency of the runs of weak sweeps (NaN otherwise)
+
+    With a fixed work per rank, the efficiency is the wall time per
+    step of the reference run (fewest ranks of the same decomposition
+    and ranks per node) over that of the run. The wall times are
+    normalized by the cells per rank, since rounding the node counts
+    makes the work per rank of the meshes slightly different.
+    """
+    eff = pd.Series(np.nan, index=df.index)
+    weak = df[df['scaling'] == 'weak'].sort_values(by='ranks',
+                                                   kind='stable')
+    if len(weak) == 0:
+        return eff
+    cost = weak['wall_per_step'] / weak['cells_per_rank']
+    ref = cost.groupby([weak['decomposition'], weak['ppn']]).transform(
+        'first')
+    eff.loc[weak.index] = ref / cost
+    return eff
+
+
+def cheapest(df):
+    """Layout with the fewest node-hours per step of each case"""
+    return df.loc[df.groupby('case')['node_hours_per_step'].idxmin()]
+
+
+def plot_scaling(oname, curves, ylabel, ideal):
+    """Plot speedup or efficiency curves vs number of ranks"""
+    plt.figure()
+    ax = plt.gca()
+    for k, curve in enumerate(curves):
+        plt.plot(curve['ranks'], curve['y'], ls='-', lw=2,
+                 color=cmap_med[k % len(cmap_med)],
+                 marker=markertype[k % len(markertype)], ms=8,
+                 label=curve['label'])
+        plt.plot(curve['ranks'], curve[ideal], ls='--', lw=1,
+                 color=cmap_med[k % len(cmap_med)])
+    ax.set_xscale('log', base=2)
+    plt.xlabel(r"ranks", fontsize=22, fontweight='bold')
+    plt.ylabel(ylabel, fontsize=22, fontweight='bold')
+    plt.setp(ax.get_xmajorticklabels(), fontsize=16, fontweight='bold')
+    plt.setp(ax.get_ymajorticklabels(), fontsize=16, fontweight='bold')
+    ax.legend(loc='best')
+    plt.tight_layout()
+    plt.savefig(oname, format='png')
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Generate and collect scaling sweeps')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    gen = subparsers.add_parser('generate', help='Write a scaling sweep')
+    gen.add_argument(
+        '-i', '--decks', help='Input decks', nargs='+', required=True)
+    gen.add_argument(
+        '-j', '--jobs', help='Job script (or one per deck)', nargs='+',
+        required=True)
+    gen.add_argument(
+        '-o', '--odir', help='Directory of the sweep', default='scaling')
+    gen.add_argument(
+        '--nodes', help='Node counts', type=int, nargs='+',
+        default=[16, 32, 64, 128])
+    gen.add_argument(
+        '--ppn', help='Ranks per node', type=int, nargs='+', default=[32])
+    gen.add_argument(
+        '--decompositions', help='Decomposition types', nargs='+',
+        default=['rcb'])
+    gen.add_argument(
+        '-n', '--nsteps', help='Number of time steps', type=int, default=50)
+    gen.add_argument(
+        '--walltime', help='Walltime of the jobs', default='00:30:00')
+    gen.add_argument(
+        '--weak', help='Weak scaling: scale the node counts with the mesh',
+        action='store_true')
+
+    col = subparsers.add_parser('collect', help='Collect a scaling sweep')
+    col.add_argument('odir', help='Directory of the sweep')
+    col.add_argument(
+        '--skip', help='Number of (setup) steps to skip', type=int,
+        default=5)
+    col.add_argument(
+        '-f', '--fast', help='Use mathtext instead of LaTeX',
+        action='store_true')
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Generate
+    if args.command == 'generate':
+        cdirs = generate(args.decks, args.jobs, args.odir, args.nodes,
+                         args.ppn, args.decompositions, args.nsteps,
+                         args.walltime, args.weak)
+        print('Wrote {0:d} runs in {1:s}'.format(len(cdirs), args.odir))
+
+    # ========================================================================
+    # Collect
+    else:
+        df = collect(args.odir, args.skip)
+        if len(df) == 0:
+            raise SystemExit('No runs with a log in ' + args.odir)
+        df.to_csv(os.path.join(args.odir, 'scaling.csv'), index=False)
+        print(df[['case', 'decomposition', 'nodes', 'ranks',
+                  'wall_per_step', 'speedup', 'efficiency',
+                  'node_hours_per_step']].to_string(index=False))
+        weak = df[df['scaling'] == 'weak'].sort_values(by='ranks')
+        if len(weak) > 0:
+            print('\nWeak scaling:')
+            print(weak[['case', 'decomposition', 'nodes', 'ranks',
+                        'cells_per_rank', 'wall_per_step',
+                        'weak_efficiency']].to_string(index=False))
+        print('\nCheapest layouts:')
+        print(cheapest(df)[['case', 'decomposition', 'nodes', 'ppn',
+                            'node_hours_per_step']].to_string(index=False))
+
+        curves = []
+        for (case, decomposition), grp in df.groupby(['case',
+                                                      'decomposition']):
+            curves.append({'label': '{0:s} {1:s}'.format(case,
+                                                         decomposition),
+                           'ranks': grp['ranks'].values,
+                           'speedup': grp['speedup'].values,
+                           'efficiency': grp['efficiency'].values,
+                           'ideal_speedup': grp['ranks'].values
+                           / grp['ranks'].values[0],
+                           'ideal_efficiency': np.ones(len(grp))})
+        figures = [(plot_scaling,
+                    os.path.join(args.odir, '{0:s}.png'.format(quantity)),
+                    {'curves': [dict(c, y=c[quantity]) for c in curves],
+                     'ylabel': quantity,
+                     'ideal': 'ideal_' + quantity})
+                   for quantity in ['speedup', 'efficiency']]
+
+        curves = []
+        for (decomposition, ppn), grp in weak.groupby(['decomposition',
+                                                       'ppn']):
+            curves.append({'label': '{0:s} ppn {1:d}'.format(decomposition,
+                                                            ppn),
+                           'ranks': grp['ranks'].values,
+                           'y': grp['weak_efficiency'].values,
+                           'ideal': np.ones(len(grp))})
+        if curves:
+            figures.append((plot_scaling,
+                            os.path.join(args.odir, 'weak_efficiency.png'),
+                            {'curves': curves,
+                             'ylabel': 'weak efficiency',
+                             'ideal': 'ideal'}))
+        render(figures, fast=args.fast,
+               cache=os.path.join(args.odir, '.render_cache.json'))
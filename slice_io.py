@@ -0,0 +1,704 @@
+#
+# Reading of the slice data written by the post-processing scripts
+#
+# ParaView writes one CSV file per rank per time step. These functions
+# read them in parallel with an explicit schema for the known columns.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import os
+import re
+import glob
+import json
+import zlib
+import fcntl
+import struct
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from catalog import catalog_time_steps
+
+try:
+    import pyarrow
+    engine = 'pyarrow'
+except ImportError:
+    engine = 'c'
+
+try:
+    import zstandard
+    codec = 'zstd'
+except ImportError:
+    codec = 'zlib'
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+# Coordinates are kept in double precision so that points match
+# exactly across ranks and time steps, fields are stored in single
+# precision (ParaView writes them with 5 decimals anyway).
+schema = {'Points:0': np.float64,
+          'Points:1': np.float64,
+          'Points:2': np.float64,
+          'pressure': np.float32,
+          'pressure_force_:0': np.float32,
+          'pressure_force_:1': np.float32,
+          'pressure_force_:2': np.float32,
+          'tau_wall': np.float32,
+          'velocity_:0': np.float32,
+          'velocity_:1': np.float32,
+          'velocity_:2': np.float32}
+point_columns = ['Points:0', 'Points:1', 'Points:2']
+store_name = 'store'
+manifest_name = 'pp_manifest.json'
+archive_name = 'slices.arc'
+archive_magic = b'SLICEARC'
+
+# Pools of processes reading the slice files (by number of processes),
+# shared by all the reads of a run
+pools = {}
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def read_csv(fname, **kwargs):
+    """Read a ParaView CSV file, None if the file is empty"""
+    if os.path.getsize(fname) == 0:
+        return None
+    kwargs.setdefault('engine', engine)
+    kwargs.setdefault('dtype', schema)
+    try:
+        return pd.read_csv(fname, **kwargs)
+    except pd.errors.EmptyDataError:
+        return None
+
+
+def read_npz(fname, **kwargs):
+    """Read a binary slice file written by pp_*.py --binary
+
+    None if the file has no points.
+    """
+    with np.load(fname) as dat:
+        if len(dat.files) == 0 or len(dat[dat.files[0]]) == 0:
+            return None
+        return pd.DataFrame({name: dat[name] for name in dat.files})
+
+
+def read_file(fname, **kwargs):
+    """Read a CSV or binary (npz) slice file"""
+    if fname.endswith('.npz'):
+        return read_npz(fname, **kwargs)
+    return read_csv(fname, **kwargs)
+
+
+def _read_file_star(args):
+    """Unpack the arguments for read_file in a worker process"""
+    fname, kwargs = args
+    return read_file(fname, **kwargs)
+
+
+def get_pool(nprocs):
+    """Pool of `nprocs` processes, created once per run"""
+    if nprocs not in pools:
+        pools[nprocs] = ProcessPoolExecutor(max_workers=nprocs)
+    return pools[nprocs]
+
+
+def get_merged_csv(fnames, nprocs=1, executor=None, **kwargs):
+    """Read and concatenate the slice files (CSV or npz) of all ranks
+
+    The files are read by `executor`, or by the pool of `nprocs`
+    processes of the run (see `get_pool`). Empty files (ranks that do
+    not intersect the slice) are skipped.
+    """
+    if executor is None and min(nprocs, len(fnames)) > 1:
+        executor = get_pool(nprocs)
+    if executor is not None:
+        chunksize = max(1, len(fnames) // (4 * nprocs))
+        lst = list(executor.map(_read_file_star,
+                                [(fname, kwargs) for fname in fnames],
+                                chunksize=chunksize))
+    else:
+        lst = [read_file(fname, **kwargs) for fname in fnames]
+
+    return pd.concat([df for df in lst if df is not None], ignore_index=True)
+
+
+def get_suffix(fdir, prefix='output'):
+    """Extension of the slice files: .npz if there are binary files"""
+    if glob.glob(os.path.join(fdir, prefix + '*.npz')):
+        return '.npz'
+    return '.csv'
+
+
+def scan_time_steps(fdir, prefix='output', suffix=None):
+    """Dictionary of the per-rank file names of each time step
+
+    The time step is the last number in the file name,
+    e.g. output12.400.csv is rank 12 at step 400.
+    """
+    suffix = suffix or get_suffix(fdir, prefix)
+    steps = {}
+    pattern = prefix + '*' + suffix
+    for fname in sorted(glob.glob(os.path.join(fdir, pattern))):
+        step = int(re.findall(r'\d+', os.path.basename(fname))[-1])
+        steps.setdefault(step, []).append(fname)
+    return dict(sorted(steps.items()))
+
+
+def get_time_steps(fdir, prefix='output', suffix=None):
+    """Dictionary of the per-rank file names of each time step
+
+    If the directory was written by pp_driver.py, the time steps are
+    those of its manifest (without listing the directory), then those
+    of the catalog (see catalog.py) if it indexes the directory,
+    otherwise see `scan_time_steps`.
+    """
+    mname = os.path.join(fdir, manifest_name)
+    if os.path.exists(mname):
+        with open(mname, 'r') as f:
+            manifest = json.load(f)
+        return {int(step): [os.path.join(fdir, fname) for fname in fnames]
+                for step, fnames in sorted(manifest['steps'].items(),
+                                           key=lambda item: int(item[0]))}
+    steps = catalog_time_steps(fdir, prefix, suffix)
+    if steps is not None:
+        return steps
+    return scan_time_steps(fdir, prefix, suffix)
+
+
+def write_npz(fname, df):
+    """Write a dataframe to a npz file
+
+    The file is written under a temporary name and renamed, so a file
+    with the final name is always complete.
+    """
+    tmp = fname + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **{col: df[col].values for col in df.columns})
+    os.replace(tmp, fname)
+
+
+def write_manifest(fdir, prefix='output'):
+    """List the time steps of a slice directory in its manifest
+
+    The manifest is also written through a temporary file so that
+    concurrent workers can update it. The listing and the update are
+    done under a lock, so that the last update lists every file
+    complete before it (a worker cannot replace the manifest with an
+    older listing).
+    """
+    with open(os.path.join(fdir, manifest_name + '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        steps = scan_time_steps(fdir, prefix, '.npz')
+        manifest = {'steps': {str(step): [os.path.basename(fname)
+                                          for fname in fnames]
+                              for step, fnames in steps.items()}}
+        tmp = os.path.join(fdir, manifest_name + '.{0:d}.tmp'.format(
+            os.getpid()))
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, os.path.join(fdir, manifest_name))
+
+
+def align_points(df, points):
+    """Reorder the rows of a time step to match the store geometry"""
+    coords = df[point_columns].values
+    if coords.shape == points.shape and np.array_equal(coords, points):
+        return df
+    lookup = pd.Series(np.arange(len(df)),
+                       index=pd.MultiIndex.from_arrays(coords.T))
+    lookup = lookup[~lookup.index.duplicated()]
+    idx = lookup.reindex(pd.MultiIndex.from_arrays(points.T)).values
+    if np.isnan(idx).any():
+        raise ValueError('Time step is missing points of the store geometry')
+    return df.iloc[idx.astype(np.int64)].reset_index(drop=True)
+
+
+def write_store(fdir, odir=None, prefix='output', suffix=None, nprocs=1):
+    """Convert the CSV files of a slice directory to a columnar store
+
+    Time steps already in the store are skipped.
+    """
+    odir = odir or os.path.join(fdir, store_name)
+    writer = StoreWriter(odir)
+    for step, fnames in get_time_steps(fdir, prefix, suffix).items():
+        if step not in writer.steps:
+            writer.append(step, get_merged_csv(fnames, nprocs=nprocs))
+    return odir
+
+
+def compress(arr, level=6):
+    """Byte-shuffled and compressed bytes of an array"""
+    arr = np.ascontiguousarray(arr)
+    data = arr.view(np.uint8).reshape(-1, arr.itemsize).T.tobytes()
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return zlib.compress(data, level)
+
+
+def decompress(data, dtype, method):
+    """Array of bytes written by `compress`"""
+    if method == 'zstd':
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        data = zlib.decompress(data)
+    dtype = np.dtype(dtype)
+    raw = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(raw.T).view(dtype).ravel()
+
+
+def quantize(values, tol):
+    """Integers and offset of values quantized to an absolute tolerance
+
+    The reconstructed values (`offset + 2 tol q`) are within `tol` of
+    the values. The smallest unsigned integer type holding q is used.
+    """
+    vmin = float(np.min(values)) if len(values) else 0.0
+    q = np.rint((values - vmin) / (2 * tol))
+    qmax = float(q.max()) if len(q) else 0.0
+    for dtype in [np.uint8, np.uint16, np.uint32, np.uint64]:
+        if qmax <= np.iinfo(dtype).max:
+            return q.astype(dtype), vmin
+
+
+def find_index(f):
+    """Offset and length of the index of an archive, and the end of its data
+
+    The index is normally the one pointed to by the trailer at the end
+    of the file. After an interrupted append, the file ends with the
+    partial new data, and the index is the one of the last complete
+    trailer before it.
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    nmagic = len(archive_magic)
+    ntrailer = 16 + nmagic
+
+    def check(end):
+        if end - ntrailer < nmagic:
+            return None
+        f.seek(end - ntrailer)
+        offset, length = struct.unpack('<QQ', f.read(16))
+        if offset + length != end - ntrailer or offset < nmagic:
+            return None
+        if end == size:
+            return offset, length, end
+        f.seek(offset)
+        try:
+            json.loads(zlib.decompress(f.read(length)))
+        except (zlib.error, ValueError):
+            return None
+        return offset, length, end
+
+    f.seek(max(size - nmagic, 0))
+    if f.read(nmagic) == archive_magic:
+        found = check(size)
+        if found:
+            return found
+
+    # Scan backward for the last complete trailer
+    block = 1 << 20
+    pos = size
+    tail = b''
+    while pos > 0:
+        start = max(0, pos - block)
+        f.seek(start)
+        buf = f.read(pos - start) + tail
+        k = buf.rfind(archive_magic)
+        while k >= 0:
+            found = check(start + k + nmagic)
+            if found:
+                return found
+            k = buf.rfind(archive_magic, 0, k + nmagic - 1)
+        tail = buf[:nmagic - 1]
+        pos = start
+    raise ValueError('Incomplete or invalid archive: ' + f.name)
+
+
+def write_archive(fdir, oname=None, tolerances=None, chunk_size=65536,
+                  prefix='output', suffix=None, nprocs=1,
+                  frames=('avg_slice.csv', 'rms_slice.csv')):
+    """Pack the time steps of a slice directory into an archive
+
+    Time steps already in the archive are skipped. The `frames` (e.g.
+    the averages) found in the directory are stored too.
+    """
+    oname = oname or os.path.join(fdir, archive_name)
+    with ArchiveWriter(oname, tolerances, chunk_size) as writer:
+        for step, fnames in get_time_steps(fdir, prefix, suffix).items():
+            if step not in writer.steps:
+                writer.append(step, get_merged_csv(fnames, nprocs=nprocs))
+        for name in frames:
+            fname = os.path.join(fdir, name)
+            if os.path.exists(fname) and os.path.getmtime(fname) != \
+                    writer.index['frames'].get(name, {}).get('mtime'):
+                writer.add_frame(name, pd.read_csv(fname),
+                                 os.path.getmtime(fname))
+    return oname
+
+
+def read_average(sdir, fname='avg_slice.csv'):
+    """Read a CSV file of a slice directory, or its copy in the archive"""
+    path = os.path.join(sdir, fname)
+    aname = os.path.join(sdir, archive_name)
+    if not os.path.exists(path) and os.path.exists(aname):
+        return SliceArchive(aname).read_frame(fname)
+    return pd.read_csv(path, delimiter=',')
+
+
+def open_slices(fdir, prefix='output', suffix=None, nprocs=1):
+    """Time steps of a slice directory and a function reading one of them
+
+    The columnar store is used if it exists, then the archive, the
+    binary (npz) or CSV files otherwise. Time steps written to files
+    after the store or archive was built are read from the files.
+    """
+    files = get_time_steps(fdir, prefix, suffix)
+
+    def read_files(step):
+        return get_merged_csv(files[step], nprocs=nprocs)
+
+    path = os.path.join(fdir, store_name)
+    if os.path.exists(os.path.join(path, 'manifest.json')):
+        packed = SliceStore(path)
+    elif os.path.exists(os.path.join(fdir, archive_name)):
+        packed = SliceArchive(os.path.join(fdir, archive_name))
+    else:
+        return list(files), read_files
+
+    def read_step(step):
+        if step in packed.steps:
+            return packed.frame(step)
+        return read_files(step)
+
+    return sorted(set(packed.steps) | set(files)), read_step
+
+
+# ========================================================================
+#
+# Class definitions
+#
+# ========================================================================
+class StoreWriter:
+    """Append time steps to a columnar slice store
+
+    The geometry is written once to points.npy, the fields of all
+    time steps are appended to fields.f32 (steps x fields x points,
+    float32) and manifest.json lists the fields and time steps.
+    """
+
+    def __init__(self, odir):
+        os.makedirs(odir, exist_ok=True)
+        self.mname = os.path.join(odir, 'manifest.json')
+        self.pname = os.path.join(odir, 'points.npy')
+        self.fname = os.path.join(odir, 'fields.f32')
+
+        if os.path.exists(self.mname):
+            with open(self.mname, 'r') as f:
+                self.manifest = json.load(f)
+            self.points = np.load(self.pname)
+
+            # Drop a partially written time step
+            nbytes = 4 * len(self.manifest['fields']) * \
+                self.manifest['npoints']
+            with open(self.fname, 'ab') as f:
+                f.truncate(nbytes * len(self.manifest['steps']))
+        else:
+            self.manifest = {'fields': None, 'npoints': None, 'steps': []}
+            self.points = None
+
+    @property
+    def steps(self):
+        return self.manifest['steps']
+
+    def append(self, step, df):
+        """Append the dataframe of a time step to the store"""
+        if self.points is None:
+            self.points = df[point_columns].values
+            np.save(self.pname, self.points)
+            self.manifest['fields'] = [col for col in df.columns
+                                       if col not in point_columns]
+            self.manifest['npoints'] = len(self.points)
+        df = align_points(df, self.points)
+
+        with open(self.fname, 'ab') as f:
+            f.write(np.ascontiguousarray(
+                df[self.manifest['fields']].values.T,
+                dtype=np.float32).tobytes())
+        self.manifest['steps'].append(step)
+
+        # Rewrite the manifest after each step so that an interrupted
+        # conversion can be resumed (through a temporary file so that
+        # a reader never sees a partial manifest)
+        tmp = self.mname + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.mname)
+
+
+class SliceStore:
+    """Read-only, memory-mapped access to a columnar slice store"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), 'r') as f:
+            manifest = json.load(f)
+        self.fields = manifest['fields']
+        self.steps = manifest['steps']
+        self.points = np.load(os.path.join(path, 'points.npy'),
+                              mmap_mode='r')
+        self.data = np.memmap(os.path.join(path, 'fields.f32'),
+                              dtype=np.float32, mode='r',
+                              shape=(len(self.steps),
+                                     len(self.fields),
+                                     manifest['npoints']))
+
+    def field(self, step, name):
+        """Zero-copy view of a field at a time step"""
+        return self.data[self.steps.index(step), self.fields.index(name)]
+
+    def frame(self, step):
+        """Dataframe of a time step with the ParaView CSV columns"""
+        k = self.steps.index(step)
+        df = pd.DataFrame(np.asarray(self.points), columns=point_columns)
+        for j, name in enumerate(self.fields):
+            df[name] = self.data[k, j]
+        return df
+
+
+class ArchiveWriter:
+    """Pack time steps of a slice into a compressed archive file
+
+    The points are sorted (by x, y, z, so that a slice or a box is a
+    few contiguous chunks) and split in chunks of `chunk_size` points.
+    Each chunk of the geometry and of each field at each time step is
+    compressed separately, so that any time step or subset of points
+    is read without decompressing the rest. The fields listed in
+    `tolerances` are quantized to that absolute tolerance (lossy),
+    the others are stored with their precision. The index (offsets of
+    the chunks, bounding boxes of the point chunks) is written at the
+    end of the file when the writer is closed, with a trailer pointing
+    to it. Reopening an archive appends to it: the new chunks, then the
+    new index and trailer, are written after the previous ones, so an
+    interrupted append leaves the previous archive readable (see
+    `find_index`).
+    """
+
+    def __init__(self, fname, tolerances=None, chunk_size=65536, level=6):
+        self.fname = fname
+        self.level = level
+        if os.path.exists(fname):
+            archive = SliceArchive(fname)
+            self.index = archive.index
+            if tolerances is not None and \
+                    dict(tolerances) != self.index['tolerances']:
+                archive.close()
+                raise ValueError('Tolerances differ from those of ' + fname)
+            self.points = archive.points() if archive.steps else None
+            archive.close()
+
+            # Drop the partial data of an interrupted append, if any
+            self.f = open(fname, 'r+b')
+            self.f.seek(archive.end)
+            self.f.truncate()
+        else:
+            self.index = {'codec': codec,
+                          'chunk_size': chunk_size,
+                          'tolerances': dict(tolerances or {}),
+                          'npoints': None,
+                          'fields': None,
+                          'dtypes': None,
+                          'points': [],
+                          'bounds': [],
+                          'steps': [],
+                          'data': {},
+                          'frames': {}}
+            self.f = open(fname, 'wb')
+            self.f.write(archive_magic)
+            self.points = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    @property
+    def steps(self):
+        return self.index['steps']
+
+    def _write(self, arr):
+        """Write a compressed array, returns its offset and length"""
+        data = compress(arr, self.level)
+        offset = self.f.tell()
+        self.f.write(data)
+        return [offset, len(data)]
+
+    def _chunks(self, n):
+        """Slices of the chunks of n points"""
+        size = self.index['chunk_size']
+        return [slice(k, min(k + size, n)) for k in range(0, n, size)]
+
+    def _set_geometry(self, df):
+        """Write the (sorted) points of the first time step"""
+        points = df[point_columns].values
+        order = np.lexsort(points.T[::-1])
+        self.points = points[order]
+        idx = self.index
+        idx['npoints'] = len(points)
+        idx['fields'] = [col for col in df.columns
+                         if col not in point_columns]
+        idx['dtypes'] = {col: str(df[col].dtype) for col in idx['fields']}
+        for chunk in self._chunks(len(points)):
+            idx['points'].append(self._write(self.points[chunk]))
+            idx['bounds'].append(
+                self.points[chunk].min(axis=0).tolist()
+                + self.points[chunk].max(axis=0).tolist())
+
+    def append(self, step, df):
+        """Append the dataframe of a time step to the archive"""
+        if self.index['npoints'] is None:
+            self._set_geometry(df)
+        df = align_points(df, self.points)
+
+        entry = {}
+        for name in self.index['fields']:
+            values = df[name].values
+            tol = self.index['tolerances'].get(name)
+            blobs = []
+            for chunk in self._chunks(len(values)):
+                vals = values[chunk]
+                if tol is not None and np.all(np.isfinite(vals)):
+                    q, vmin = quantize(vals.astype(np.float64), tol)
+                    blobs.append(self._write(q) + [str(q.dtype), vmin])
+                else:
+                    blobs.append(self._write(vals.astype(
+                        self.index['dtypes'][name])))
+            entry[name] = blobs
+        self.index['data'][str(step)] = entry
+        self.index['steps'].append(step)
+
+    def add_frame(self, name, df, mtime=None):
+        """Store a dataframe (e.g. an average) losslessly"""
+        self.index['frames'][name] = {
+            'mtime': mtime,
+            'columns': list(df.columns),
+            'dtypes': [str(df[col].dtype) for col in df.columns],
+            'blobs': [self._write(df[col].values) for col in df.columns]}
+
+    def close(self):
+        """Write the index and the trailer"""
+        if self.f.closed:
+            return
+        self.index['offset'] = self.f.tell()
+        data = zlib.compress(json.dumps(self.index).encode())
+        self.f.write(data)
+        self.f.write(struct.pack('<QQ', self.index['offset'], len(data)))
+        self.f.write(archive_magic)
+        self.f.close()
+
+
+class SliceArchive:
+    """Random access to the time steps and points of a slice archive"""
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.f = open(fname, 'rb')
+        offset, length, self.end = find_index(self.f)
+        self.f.seek(offset)
+        self.index = json.loads(zlib.decompress(self.f.read(length)))
+        self.index['offset'] = offset
+        self.steps = self.index['steps']
+        self.fields = self.index['fields']
+        self.chunk_size = self.index['chunk_size']
+        self._points = {}
+
+    def close(self):
+        self.f.close()
+
+    def _read(self, blob, dtype):
+        """Decompress a chunk"""
+        self.f.seek(blob[0])
+        return decompress(self.f.read(blob[1]), dtype, self.index['codec'])
+
+    def _select(self, rows):
+        """Chunks touched by the (sorted) rows and their local indices"""
+        if rows is None:
+            nchunks = len(self.index['points'])
+            return [(k, None) for k in range(nchunks)]
+        rows = np.asarray(rows)
+        ids = rows // self.chunk_size
+        return [(k, rows[ids == k] - k * self.chunk_size)
+                for k in np.unique(ids)]
+
+    def _point_chunk(self, k):
+        """Decompressed (cached) points of a chunk"""
+        if k not in self._points:
+            self._points[k] = self._read(self.index['points'][k],
+                                         np.float64).reshape(-1, 3)
+        return self._points[k]
+
+    def points(self, rows=None):
+        """Coordinates of the points (all or the given rows)"""
+        lst = [self._point_chunk(k) if local is None
+               else self._point_chunk(k)[local]
+               for k, local in self._select(rows)]
+        return np.concatenate(lst) if lst else np.empty((0, 3))
+
+    def box(self, lo, hi):
+        """Rows of the points in the box [lo, hi]
+
+        Only the chunks whose bounding box intersects it are read.
+        """
+        lo = np.asarray(lo)
+        hi = np.asarray(hi)
+        rows = []
+        for k, bounds in enumerate(self.index['bounds']):
+            bounds = np.asarray(bounds)
+            if np.all(bounds[:3] <= hi) and np.all(bounds[3:] >= lo):
+                pts = self._point_chunk(k)
+                inside = np.all((pts >= lo) & (pts <= hi), axis=1)
+                rows.append(k * self.chunk_size + np.flatnonzero(inside))
+        return np.concatenate(rows) if rows else np.empty(0, np.int64)
+
+    def field(self, step, name, rows=None):
+        """Values of a field at a time step (all or the given rows)"""
+        blobs = self.index['data'][str(step)][name]
+        dtype = self.index['dtypes'][name]
+        lst = []
+        for k, local in self._select(rows):
+            blob = blobs[k]
+            if len(blob) > 2:
+                tol = self.index['tolerances'][name]
+                vals = (blob[3] + 2 * tol *
+                        self._read(blob, blob[2])).astype(dtype)
+            else:
+                vals = self._read(blob, dtype)
+            lst.append(vals if local is None else vals[local])
+        return np.concatenate(lst) if lst else np.empty(0, dtype)
+
+    def frame(self, step, rows=None):
+        """Dataframe of a time step with the ParaView CSV columns"""
+        df = pd.DataFrame(self.points(rows), columns=point_columns)
+        for name in self.fields:
+            df[name] = self.field(step, name, rows)
+        return df
+
+    def read_frame(self, name):
+        """Dataframe stored with `ArchiveWriter.add_frame`"""
+        frame = self.index['frames'][name]
+        return pd.DataFrame({col: self._read(blob, dtype)
+                             for col, dtype, blob in zip(
+                                 frame['columns'], frame['dtypes'],
+                                 frame['blobs'])})
@@ -0,0 +1,76 @@
+#
+# Tests of the scaling sweeps on the Nalu log excerpts of tests/data
+#
+# The excerpts have a wall time per step of 4.0 s on 1 node, 2.2 s on
+# 2 nodes and 1.25 s on 4 nodes for the 64M mesh (strong sweep), and
+# 4.0 s on 1 node for the 64M mesh and 4.4 s on 5 nodes for the 300M
+# mesh (weak sweep), after two slower setup steps.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import os
+import sys
+import json
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import scaling
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+ddir = os.path.join(os.path.dirname(__file__), 'data', 'scaling')
+cdir = os.path.join(os.path.dirname(__file__), '..', 'DES')
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def test_strong_scaling():
+    df = scaling.collect(os.path.join(ddir, 'strong'), skip=2)
+    assert list(df['ranks']) == [32, 64, 128]
+    assert np.allclose(df['wall_per_step'], [4.0, 2.2, 1.25])
+    assert np.allclose(df['speedup'], [1.0, 4.0 / 2.2, 3.2])
+    assert np.allclose(df['efficiency'], [1.0, 4.0 / 4.4, 0.8])
+    assert np.allclose(df['node_hours_per_step'],
+                       np.array([4.0, 4.4, 5.0]) / 3600)
+    assert df['weak_efficiency'].isna().all()
+
+
+def test_weak_scaling():
+    df = scaling.collect(os.path.join(ddir, 'weak'), skip=2)
+    df = df.set_index('case')
+    assert np.allclose(df['cells_per_rank'], [300e6 / 160, 2e6])
+    eff = df['weak_efficiency']
+    assert eff['mcalisterWing64M'] == pytest.approx(1.0)
+    assert eff['mcalisterWing300M'] == pytest.approx(
+        (4.0 / 2e6) / (4.4 / (300e6 / 160)))
+
+
+def test_weak_nodes():
+    assert scaling.weak_nodes([16, 32], 300e6, 64e6) == [75, 150]
+    assert scaling.weak_nodes([1], 1e6, 64e6) == [1]
+
+
+def test_generate_weak(tmp_path):
+    decks = [os.path.join(cdir, 'mcalisterWing64M.i'),
+             os.path.join(cdir, 'mcalisterWing300M.i')]
+    jobs = [os.path.join(cdir, 'mcalisterWing64M.job')]
+    cdirs = scaling.generate(decks, jobs, str(tmp_path), [16], [32],
+                             ['rcb'], weak=True)
+    cases = []
+    for d in cdirs:
+        with open(os.path.join(d, scaling.case_name), 'r') as f:
+            cases.append(json.load(f))
+    assert [c['nodes'] for c in cases] == [16, 75]
+    assert all(c['scaling'] == 'weak' for c in cases)
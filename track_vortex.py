@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+#
+# This tracks the vortex core in every slice of every time step
+#
+# Run this in the data directory, e.g. from /scratch/mhenryde/McalisterWing/DES/vortex_slices64M:
+#    > /path/to/script/track_vortex.py
+#
+# The core trajectories are written to vortex_cores.csv (columns step,
+# x, yc, zc, pmin, swirl).
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+import numpy as np
+from slice_io import (SliceStore, open_slices, align_points, point_columns,
+                      store_name)
+from vortex import track_cores
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Track the vortex core in all slices and time steps')
+    parser.add_argument(
+        '-r', '--radius', help='Radius of the core refinement', type=float,
+        default=0.1)
+    parser.add_argument(
+        '-p', '--nprocs', help='Number of processes reading the files',
+        type=int, default=1)
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Setup
+    fdir = os.getcwd()
+    oname = os.path.join(fdir, 'vortex_cores.csv')
+    path = os.path.join(fdir, store_name)
+
+    # ========================================================================
+    # Get all the time steps as (steps x points) arrays: directly from
+    # the columnar store if it has all of them, otherwise read and
+    # stack them
+    steps, read_step = open_slices(fdir, nprocs=args.nprocs)
+    store = SliceStore(path) \
+        if os.path.exists(os.path.join(path, 'manifest.json')) else None
+    if store is not None and set(steps) <= set(store.steps):
+        steps = store.steps
+        points = np.asarray(store.points)
+        fields = {name: store.data[:, j] for j, name in
+                  enumerate(store.fields)}
+    else:
+        points = None
+        lst = []
+        for step in steps:
+            df = read_step(step)
+            if points is None:
+                points = df[point_columns].values
+            lst.append(align_points(df, points))
+        fields = {name: np.array([df[name].values for df in lst])
+                  for name in ['pressure', 'velocity_:1', 'velocity_:2']}
+
+    # ========================================================================
+    # Track
+    cores = track_cores(points, fields['pressure'], fields['velocity_:1'],
+                        fields['velocity_:2'], radius=args.radius)
+    cores['step'] = np.asarray(steps)[cores['step']]
+    cores.to_csv(oname, index=False)
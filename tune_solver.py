@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+#
+# This sweeps the parameters of the linear solvers (deck) and of the
+# MueLu preconditioner (milestone.xml) of a case: it writes one short
+# run per variant of a parameter space (see solver_space.yaml), then
+# ranks the variants by wall time per step once they have run. A
+# variant is only kept if its linear solves converge and if its
+# residuals and wing forces stay close to those of the unmodified
+# case (variant 0). The best variant is written as a new deck and
+# milestone file.
+#
+# Generate the variants, e.g. from /scratch/mhenryde/McalisterWing:
+#    > /path/to/script/tune_solver.py generate -i DES/mcalisterWing64M.i -j DES/mcalisterWing64M.job -s solver_space.yaml -o tuning --submit
+#
+# and rank them once they have run:
+#    > /path/to/script/tune_solver.py collect tuning
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import argparse
+import os
+import re
+import json
+import glob
+import random
+import itertools
+import subprocess
+import numpy as np
+import pandas as pd
+import yaml
+from nalu_log import LogReader, LogParser, parse_deck, wall_per_step
+from forces import ForceReader, ForceHistory
+from scaling import make_deck, make_job
+
+
+# ========================================================================
+#
+# Some defaults variables
+#
+# ========================================================================
+variant_name = 'variant.json'
+submit_commands = {'.job': 'sbatch', '.pbs': 'qsub'}
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def format_value(value):
+    """Type and string of a MueLu parameter value"""
+    if isinstance(value, bool):
+        return 'bool', 'true' if value else 'false'
+    if isinstance(value, int):
+        return 'int', str(value)
+    if isinstance(value, float):
+        return 'double', repr(value)
+    return 'string', str(value)
+
+
+def list_contexts(lines):
+    """Names of the ParameterLists enclosing each line of a MueLu file"""
+    stack = []
+    contexts = []
+    for line in lines:
+        contexts.append(tuple(stack[1:]))
+        for m in re.finditer(r'<(/?)ParameterList\b([^>]*?)(/?)>', line):
+            if m.group(1):
+                stack.pop()
+            elif not m.group(3):
+                stack.append(re.search(r'name="([^"]*)"',
+                                       m.group(2)).group(1))
+    return contexts
+
+
+def set_parameter(text, path, value):
+    """Set a parameter of a MueLu parameter file
+
+    `path` is the name of the parameter, prefixed by the names of its
+    sublists, e.g. "smoother: params/schwarz: overlap level". The file
+    is edited line by line to keep its layout. Missing sublists and
+    parameters are added at the end of their list.
+    """
+    names = path.split('/')
+    lines = text.splitlines(keepends=True)
+    contexts = list_contexts(lines)
+    ptype, pvalue = format_value(value)
+
+    # Existing parameter
+    regex = r'<Parameter\s[^>]*name="{0:s}"'.format(re.escape(names[-1]))
+    for k, line in enumerate(lines):
+        if re.search(regex, line) and contexts[k] == tuple(names[:-1]):
+            lines[k] = re.sub(r'value="[^"]*"',
+                              'value="{0:s}"'.format(pvalue), line)
+            return ''.join(lines)
+
+    # Deepest existing list of the path
+    for depth in range(len(names) - 1, -1, -1):
+        close = [k for k, line in enumerate(lines)
+                 if '</ParameterList>' in line
+                 and contexts[k] == tuple(names[:depth])]
+        if close:
+            break
+    k = close[0]
+    indent = lines[k][:len(lines[k]) - len(lines[k].lstrip())]
+
+    new = []
+    for j, name in enumerate(names[depth:-1]):
+        new.append('{0:s}<ParameterList name="{1:s}">\n'.format(
+            indent + '  ' * (j + 1), name))
+    pindent = indent + '  ' * (len(names) - depth)
+    new.append('{0:s}<Parameter        {1:<39s} {2:<15s} '
+               'value="{3:s}"/>\n'.format(pindent,
+                                          'name="{0:s}"'.format(names[-1]),
+                                          'type="{0:s}"'.format(ptype),
+                                          pvalue))
+    for j in range(len(names) - depth - 2, -1, -1):
+        new.append('{0:s}</ParameterList>\n'.format(
+            indent + '  ' * (j + 1)))
+    lines[k:k] = new
+    return ''.join(lines)
+
+
+def make_milestone(text, params):
+    """MueLu parameter file with some parameters changed"""
+    for path, value in params.items():
+        text = set_parameter(text, path, value)
+    return text
+
+
+def set_solver_key(text, solver, key, value):
+    """Set a key of a linear solver block of a deck"""
+    lines = text.splitlines(keepends=True)
+    start = next(k for k, line in enumerate(lines)
+                 if re.match(r'^\s*-\s*name:\s*{0:s}\s*$'.format(
+                     re.escape(solver)), line))
+    indent = len(lines[start]) - len(lines[start].lstrip(' -'))
+    end = start + 1
+    while end < len(lines) and (
+            not lines[end].strip()
+            or len(lines[end]) - len(lines[end].lstrip(' ')) >= indent):
+        end += 1
+    while not lines[end - 1].strip():
+        end -= 1
+
+    regex = r'^(\s*{0:s}:\s*)\S+'.format(re.escape(key))
+    for k in range(start + 1, end):
+        if re.match(regex, lines[k]):
+            lines[k] = re.sub(regex, r'\g<1>{0:s}'.format(str(value)),
+                              lines[k])
+            break
+    else:
+        lines.insert(end, '{0:s}{1:s}: {2:s}\n'.format(' ' * indent, key,
+                                                      str(value)))
+    return ''.join(lines)
+
+
+def get_variants(space, max_variants=None, seed=0):
+    """Variants (dictionaries of parameters) of a parameter space
+
+    The keys are 'muelu/<parameter path>' or '<solver>/<key>'. The
+    first variant is the unmodified case. With `max_variants`, a
+    random sample of the full factorial space is used.
+    """
+    keys = ['muelu/' + path for path in space.get('muelu', {})]
+    values = list(space.get('muelu', {}).values())
+    for solver, params in space.get('solvers', {}).items():
+        keys += ['{0:s}/{1:s}'.format(solver, key) for key in params]
+        values += list(params.values())
+
+    variants = [dict(zip(keys, combo))
+                for combo in itertools.product(*values)]
+    if max_variants is not None and len(variants) > max_variants - 1:
+        variants = random.Random(seed).sample(variants, max_variants - 1)
+    return [{}] + variants
+
+
+def apply_variant(deck_text, xml_text, params):
+    """Deck and MueLu file of a variant"""
+    muelu = {key[len('muelu/'):]: value for key, value in params.items()
+             if key.startswith('muelu/')}
+    for key, value in params.items():
+        if not key.startswith('muelu/'):
+            solver, name = key.split('/', 1)
+            deck_text = set_solver_key(deck_text, solver, name, value)
+    return deck_text, make_milestone(xml_text, muelu)
+
+
+def get_xml_name(deck_text):
+    """Name of the MueLu parameter file of a deck"""
+    return re.search(r'^\s*muelu_xml_file_name:\s*(\S+)', deck_text,
+                     flags=re.M).group(1)
+
+
+def generate(deck, job, odir, space, nsteps=50, nodes=16, ppn=32,
+             walltime='00:30:00', max_variants=None, submit=False):
+    """Write (and submit) the run directories of the variants"""
+    tdir = os.path.dirname(os.path.abspath(deck))
+    with open(deck, 'r') as f:
+        deck_text = f.read()
+    with open(job, 'r') as f:
+        job_text = f.read()
+    xml_name = get_xml_name(deck_text)
+    with open(os.path.join(tdir, xml_name), 'r') as f:
+        xml_text = f.read()
+    base = os.path.splitext(os.path.basename(deck))[0]
+    decomposition = re.search(r'^\s*automatic_decomposition_type:\s*(\S+)',
+                              deck_text, flags=re.M).group(1)
+    outputs = re.findall(r'^\s*\w+_data_base_name:\s*(\S+)', deck_text,
+                         flags=re.M)
+
+    variants = get_variants(space, max_variants)
+    for k, params in enumerate(variants):
+        name = '{0:s}_v{1:03d}'.format(base, k)
+        cdir = os.path.join(odir, name)
+        os.makedirs(cdir, exist_ok=True)
+        vdeck, vxml = apply_variant(deck_text, xml_text, params)
+        with open(os.path.join(cdir, base + '.i'), 'w') as f:
+            f.write(make_deck(vdeck, tdir, decomposition, nsteps))
+        with open(os.path.join(cdir, xml_name), 'w') as f:
+            f.write(vxml)
+        jname = os.path.join(cdir, os.path.basename(job))
+        with open(jname, 'w') as f:
+            f.write(make_job(job_text, tdir, name, nodes, ppn, walltime))
+        for output in outputs:
+            os.makedirs(os.path.join(cdir, os.path.dirname(output)),
+                        exist_ok=True)
+        with open(os.path.join(cdir, variant_name), 'w') as f:
+            json.dump({'case': base,
+                       'variant': k,
+                       'deck': os.path.abspath(deck),
+                       'log': base + '.o',
+                       'params': params}, f, indent=2)
+        if submit:
+            command = submit_commands[os.path.splitext(jname)[1]]
+            subprocess.run([command, os.path.basename(jname)], cwd=cdir,
+                           check=True)
+    return len(variants)
+
+
+def read_run(cdir, variant, skip=5, nlast=10):
+    """Wall time, iterations, residuals and forces of a variant run"""
+    lname = os.path.join(cdir, variant['log'])
+    if not os.path.exists(lname):
+        return None
+    log = LogParser()
+    for line in LogReader(lname).read():
+        log.feed(line)
+    steps = log.step_table()
+    if len(steps) == 0:
+        return None
+
+    deck = os.path.join(cdir, variant['case'] + '.i')
+    solvers, _ = parse_deck(deck)
+    with open(deck, 'r') as f:
+        dat = yaml.safe_load(f)
+    max_iterations = {s['name']: s.get('max_iterations', np.inf)
+                      for s in dat['linear_solvers']}
+    failures = np.zeros(len(steps), dtype=bool)
+    for eq, solver in solvers.items():
+        if eq + '_max' in steps.columns:
+            failures |= steps[eq + '_max'].values >= max_iterations[solver]
+
+    run = {'variant': variant['variant'],
+           'nsteps': len(steps),
+           'wall_per_step': np.nanmedian(wall_per_step(steps)[skip:]),
+           'linear_failures': int(failures.sum()),
+           'norms': {col: steps[col].values[-nlast:].mean()
+                     for col in steps.columns if col.endswith('_norm')}}
+    for solver in sorted(set(solvers.values())):
+        eqs = [eq for eq, s in solvers.items() if s == solver]
+        run[solver + '_iters'] = steps[[eq for eq in eqs
+                                        if eq in steps.columns]] \
+            .sum(axis=1).mean()
+
+    # Wing forces at the end of the run
+    post = dat['realms'][0].get('post_processing', [])
+    fnames = [p['output_file_name'] for p in post
+              if 'force' in p.get('physics', '')]
+    if fnames and os.path.exists(os.path.join(cdir, fnames[0])):
+        history = ForceHistory()
+        history.update(ForceReader(os.path.join(cdir, fnames[0])).read())
+        run['forces'] = {name: history.data[name][-nlast:].mean()
+                         for name in history.signals}
+    return run
+
+
+def collect(odir, skip=5, force_tol=0.01, residual_factor=2.0):
+    """Table of the variants of a sweep, ranked by wall time per step
+
+    A variant is valid if none of its linear solves reached the
+    maximum number of iterations, its final nonlinear residuals are
+    within `residual_factor` of those of variant 0, and its final lift
+    and drag within `force_tol` (relative) of those of variant 0. The
+    residual and force checks are skipped if the data is missing.
+    """
+    lst = []
+    for vname in sorted(glob.glob(os.path.join(odir, '*', variant_name))):
+        with open(vname, 'r') as f:
+            variant = json.load(f)
+        run = read_run(os.path.dirname(vname), variant, skip)
+        if run is not None:
+            run['name'] = os.path.basename(os.path.dirname(vname))
+            lst.append((variant, run))
+
+    rows = []
+    for case in sorted(set(variant['case'] for variant, _ in lst)):
+        runs = {variant['variant']: (variant, run)
+                for variant, run in lst if variant['case'] == case}
+        base = runs.get(0, (None, None))[1]
+        for k, (variant, run) in sorted(runs.items()):
+            row = {'case': case}
+            row.update({key: run[key] for key in run
+                        if key not in ('norms', 'forces')})
+            row['residual_ratio'] = np.nan
+            row['force_drift'] = np.nan
+            if base is not None:
+                ratios = [run['norms'][col] / base['norms'][col]
+                          for col in run['norms']
+                          if base['norms'].get(col, 0) > 0]
+                if ratios:
+                    row['residual_ratio'] = max(ratios)
+                if 'forces' in run and 'forces' in base:
+                    row['force_drift'] = max(
+                        abs(run['forces'][name] / base['forces'][name] - 1)
+                        for name in run['forces'])
+            row['valid'] = (row['linear_failures'] == 0
+                            and not row['residual_ratio'] > residual_factor
+                            and not row['force_drift'] > force_tol)
+            row['params'] = json.dumps(variant['params'])
+            rows.append(row)
+
+    df = pd.DataFrame(rows)
+    if len(df) == 0:
+        return df
+    df.sort_values(by=['case', 'valid', 'wall_per_step'],
+                   ascending=[True, False, True], inplace=True)
+    return df.reset_index(drop=True)
+
+
+def write_best(df, odir):
+    """Write the deck and MueLu file of the best variant of each case"""
+    best = df[df['valid']].groupby('case').head(1)
+    for _, row in best.iterrows():
+        vname = os.path.join(odir, row['name'], variant_name)
+        with open(vname, 'r') as f:
+            variant = json.load(f)
+        tdir = os.path.dirname(variant['deck'])
+        with open(variant['deck'], 'r') as f:
+            deck_text = f.read()
+        xml_name = get_xml_name(deck_text)
+        with open(os.path.join(tdir, xml_name), 'r') as f:
+            xml_text = f.read()
+        vdeck, vxml = apply_variant(deck_text, xml_text, variant['params'])
+
+        bdir = os.path.join(odir, 'best_' + row['case'])
+        os.makedirs(bdir, exist_ok=True)
+        with open(os.path.join(bdir, os.path.basename(variant['deck'])),
+                  'w') as f:
+            f.write(vdeck)
+        with open(os.path.join(bdir, xml_name), 'w') as f:
+            f.write(vxml)
+        print('Best variant of {0:s}: {1:s} {2:s} -> {3:s}'.format(
+            row['case'], row['name'], row['params'], bdir))
+    return best
+
+
+# ========================================================================
+#
+# Main
+#
+# ========================================================================
+if __name__ == '__main__':
+
+    # ========================================================================
+    # Parse arguments
+    parser = argparse.ArgumentParser(
+        description='Sweep the linear solver and MueLu parameters')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    gen = subparsers.add_parser('generate', help='Write the variants')
+    gen.add_argument('-i', '--deck', help='Input deck', required=True)
+    gen.add_argument('-j', '--job', help='Job script', required=True)
+    gen.add_argument(
+        '-s', '--space', help='Parameter space', default='solver_space.yaml')
+    gen.add_argument(
+        '-o', '--odir', help='Directory of the variants', default='tuning')
+    gen.add_argument(
+        '-n', '--nsteps', help='Number of time steps', type=int, default=50)
+    gen.add_argument('--nodes', help='Number of nodes', type=int, default=16)
+    gen.add_argument('--ppn', help='Ranks per node', type=int, default=32)
+    gen.add_argument(
+        '--walltime', help='Walltime of the jobs', default='00:30:00')
+    gen.add_argument(
+        '--max-variants', help='Maximum number of variants (sampled)',
+        type=int)
+    gen.add_argument(
+        '--submit', help='Submit the jobs (sbatch or qsub)',
+        action='store_true')
+
+    col = subparsers.add_parser('collect', help='Rank the variants')
+    col.add_argument('odir', help='Directory of the variants')
+    col.add_argument(
+        '--skip', help='Number of (setup) steps to skip', type=int,
+        default=5)
+    col.add_argument(
+        '--force-tol', help='Tolerance on the relative lift and drag drift',
+        type=float, default=0.01)
+    col.add_argument(
+        '--residual-factor',
+        help='Maximum ratio of the residuals to those of variant 0',
+        type=float, default=2.0)
+    args = parser.parse_args()
+
+    # ========================================================================
+    # Generate
+    if args.command == 'generate':
+        with open(args.space, 'r') as f:
+            space = yaml.safe_load(f)
+        n = generate(args.deck, args.job, args.odir, space, args.nsteps,
+                     args.nodes, args.ppn, args.walltime, args.max_variants,
+                     args.submit)
+        print('Wrote {0:d} variants in {1:s}'.format(n, args.odir))
+
+    # ========================================================================
+    # Collect
+    else:
+        df = collect(args.odir, args.skip, args.force_tol,
+                     args.residual_factor)
+        if len(df) == 0:
+            raise SystemExit('No variants with a log in ' + args.odir)
+        df.to_csv(os.path.join(args.odir, 'variants.csv'), index=False)
+        print(df[['case', 'variant', 'wall_per_step', 'linear_failures',
+                  'residual_ratio', 'force_drift', 'valid',
+                  'params']].to_string(index=False))
+        write_best(df, args.odir)
@@ -0,0 +1,228 @@
+#
+# Vortex analysis of the vortex slices
+#
+# The functions work on arrays of all the time steps at once (steps x
+# points, e.g. from a SliceStore) and on all the x slices at once, so
+# there is no Python loop per slice or per time step.
+#
+# The points of all the slices are also indexed in one KD-tree (see
+# SliceTree) for radius queries around the cores and nearest neighbour
+# lineouts, so that the azimuthally averaged profiles of the vortex
+# only touch the points near the cores.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def get_slice_ids(x, decimals=6):
+    """x location of each slice and slice ID of each point"""
+    return np.unique(np.round(x, decimals), return_inverse=True)
+
+
+def track_cores(points, pressure, vy, vz, radius=0.1, chunk=16):
+    """Vortex core location in every slice of every time step
+
+    `points` is (npoints x 3), `pressure`, `vy` and `vz` are (nsteps x
+    npoints). The core is first located at the pressure minimum of
+    each slice, then refined to the centroid of the pressure deficit
+    (with respect to the mean pressure) within `radius` of the
+    minimum, which is not limited by the grid resolution. The peak
+    swirl is the maximum in-plane velocity magnitude within `radius`.
+
+    Returns a dataframe with the columns step (index of the time
+    step), x, yc, zc, pmin and swirl.
+    """
+    pressure = np.atleast_2d(pressure)
+    vy, vz = np.atleast_2d(vy), np.atleast_2d(vz)
+    xs, sid = get_slice_ids(points[:, 0])
+    y, z = points[:, 1], points[:, 2]
+    nslices = len(xs)
+
+    # Points sorted by slice
+    order = np.argsort(sid, kind='stable')
+    sid_sorted = sid[order]
+    starts = np.searchsorted(sid_sorted, np.arange(nslices))
+
+    lst = []
+    for first in range(0, pressure.shape[0], chunk):
+        p = np.asarray(pressure[first:first + chunk], dtype=np.float64)
+        nsteps = p.shape[0]
+        ngroups = nsteps * nslices
+        groups = (np.arange(nsteps)[:, None] * nslices + sid[None, :])
+
+        # Pressure minimum of each slice (first one in case of ties)
+        ps = p[:, order]
+        pmin = np.minimum.reduceat(ps, starts, axis=1)
+        steps, cols = np.nonzero(ps == pmin[:, sid_sorted])
+        _, first_min = np.unique(steps * nslices + sid_sorted[cols],
+                                 return_index=True)
+        imin = order[cols[first_min]].reshape(nsteps, nslices)
+        y0, z0 = y[imin], z[imin]
+
+        # Points within radius of the minimum
+        dy = y[None, :] - y0[:, sid]
+        dz = z[None, :] - z0[:, sid]
+        disk = (dy**2 + dz**2) <= radius**2
+        g = groups[disk]
+        count = np.bincount(g, minlength=ngroups)
+        pref = np.bincount(g, weights=p[disk], minlength=ngroups) / \
+            np.maximum(count, 1)
+
+        # Centroid of the pressure deficit
+        w = np.maximum(pref[g] - p[disk], 0.0)
+        wsum = np.bincount(g, weights=w, minlength=ngroups)
+        yc = np.bincount(g, weights=w * dy[disk], minlength=ngroups)
+        zc = np.bincount(g, weights=w * dz[disk], minlength=ngroups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            yc = np.where(wsum > 0, yc / wsum, 0.0) + y0.ravel()
+            zc = np.where(wsum > 0, zc / wsum, 0.0) + z0.ravel()
+
+        # Peak in-plane velocity
+        speed = np.sqrt(np.asarray(vy[first:first + chunk])[disk]**2
+                        + np.asarray(vz[first:first + chunk])[disk]**2)
+        swirl = np.zeros(ngroups)
+        np.maximum.at(swirl, g, speed)
+
+        lst.append(pd.DataFrame({
+            'step': np.repeat(np.arange(first, first + nsteps), nslices),
+            'x': np.tile(xs, nsteps),
+            'yc': yc,
+            'zc': zc,
+            'pmin': pmin.ravel(),
+            'swirl': swirl}))
+
+    return pd.concat(lst, ignore_index=True)
+
+
+def azimuthal_profiles(tree, yc, zc, vx, vy, vz, rmax=0.3, nbins=30):
+    """Azimuthally averaged velocity profiles around the core of each slice
+
+    `tree` is the SliceTree of the points, `yc` and `zc` are the core
+    locations in each slice (e.g. from `track_cores`) and `vx`, `vy`,
+    `vz` the velocity at the points. The points within `rmax` of the
+    cores are binned in radius and averaged with bincount. The
+    tangential velocity is positive counterclockwise in the y-z plane.
+
+    Returns a dataframe with the columns x, r (bin center), count, vt
+    (tangential) and vx (axial).
+    """
+    nslices = len(tree.xs)
+    rows = tree.radius(yc, zc, rmax)
+    g = np.repeat(np.arange(nslices), [len(r) for r in rows])
+    idx = np.concatenate(rows).astype(np.int64) if len(g) else \
+        np.empty(0, np.int64)
+
+    dy = tree.points[idx, 1] - np.asarray(yc)[g]
+    dz = tree.points[idx, 2] - np.asarray(zc)[g]
+    r = np.sqrt(dy**2 + dz**2)
+    dr = rmax / nbins
+    b = np.minimum((r / dr).astype(np.int64), nbins - 1)
+    key = g * nbins + b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vt = np.where(r > 0, (dy * vz[idx] - dz * vy[idx]) / r, 0.0)
+
+    n = nslices * nbins
+    count = np.bincount(key, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_vt = np.bincount(key, weights=vt, minlength=n) / count
+        mean_vx = np.bincount(key, weights=vx[idx], minlength=n) / count
+    return pd.DataFrame({'x': np.repeat(tree.xs, nbins),
+                         'r': np.tile((np.arange(nbins) + 0.5) * dr, nslices),
+                         'count': count,
+                         'vt': mean_vt,
+                         'vx': mean_vx})
+
+
+def core_properties(profiles):
+    """Core radius and peak swirl of each slice from its profile
+
+    The peak of the tangential velocity is refined with a parabola
+    through the bin of the maximum and its neighbours.
+    """
+    lst = []
+    for x, grp in profiles.groupby('x', sort=True):
+        r = grp['r'].values
+        vt = np.abs(grp['vt'].values)
+        ok = np.isfinite(vt)
+        if not ok.any():
+            lst.append({'x': x, 'core_radius': np.nan,
+                        'peak_swirl': np.nan})
+            continue
+        vt = np.where(ok, vt, -np.inf)
+        k = np.argmax(vt)
+        rc, vmax = r[k], vt[k]
+        if 0 < k < len(r) - 1 and np.all(np.isfinite(vt[k - 1:k + 2])):
+            a, b, c = vt[k - 1], vt[k], vt[k + 1]
+            den = a - 2 * b + c
+            if den < 0:
+                shift = 0.5 * (a - c) / den
+                rc = r[k] + shift * (r[1] - r[0])
+                vmax = b - 0.25 * (a - c) * shift
+        lst.append({'x': x, 'core_radius': rc, 'peak_swirl': vmax})
+    return pd.DataFrame(lst)
+
+
+# ========================================================================
+#
+# Class definitions
+#
+# ========================================================================
+class SliceTree:
+    """KD-tree of the points of all the slices
+
+    The slices are separated in the tree by replacing x with the slice
+    ID times a gap larger than the extent of the slices, so that a
+    query in one slice never returns points of another one and the
+    queries of all the slices are done in one call.
+    """
+
+    def __init__(self, points, decimals=6):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.xs, self.sid = get_slice_ids(self.points[:, 0], decimals)
+        yz = self.points[:, 1:]
+        self.gap = 4 * np.max(np.ptp(yz, axis=0)) + 1 if len(yz) else 1.0
+        self.tree = cKDTree(np.column_stack((self.sid * self.gap, yz)))
+
+    def _query_points(self, sid, y, z):
+        """Tree coordinates of points (y, z) in slices sid"""
+        sid, y, z = np.broadcast_arrays(sid, y, z)
+        return np.column_stack((sid.ravel() * self.gap, y.ravel(),
+                                z.ravel()))
+
+    def radius(self, yc, zc, r):
+        """Rows of the points within r of (yc, zc) in each slice"""
+        sid = np.arange(len(self.xs))
+        return self.tree.query_ball_point(self._query_points(sid, yc, zc),
+                                          r, return_sorted=False)
+
+    def nearest(self, sid, y, z, k=4):
+        """Rows and inverse distance weights of the k nearest points
+
+        `sid`, `y` and `z` are broadcast together. With k=1, this is a
+        nearest neighbour lookup.
+        """
+        dist, rows = self.tree.query(self._query_points(sid, y, z), k=k)
+        dist = dist.reshape(len(rows), -1)
+        rows = rows.reshape(len(rows), -1)
+        with np.errstate(divide='ignore'):
+            w = 1.0 / dist
+        exact = dist == 0
+        w[exact.any(axis=1)] = exact[exact.any(axis=1)]
+        return rows, w / w.sum(axis=1)[:, None]
+
+    def lineout(self, values, sid, y, z, k=4):
+        """Values (npoints, or nfields x npoints) along a line or points"""
+        rows, w = self.nearest(sid, y, z, k)
+        return np.sum(np.asarray(values)[..., rows] * w, axis=-1)
@@ -0,0 +1,110 @@
+#
+# Sectional analysis of the wing slices
+#
+# All the span stations are processed at once: the points are sorted
+# by (slice, angle) in one lexsort and the sectional coefficients are
+# integrated with bincount over the slice IDs.
+#
+
+# ========================================================================
+#
+# Imports
+#
+# ========================================================================
+import numpy as np
+import pandas as pd
+
+
+# ========================================================================
+#
+# Function definitions
+#
+# ========================================================================
+def sort_sections(df, x='x', y='y', z='z'):
+    """Sort the points of each span station around the section
+
+    Adds a `slice` column (ID of the span station) and returns the
+    dataframe sorted by slice, then counterclockwise (in the x-z
+    plane) by angle wrt the centroid of the section, and the index of
+    the first point of each slice.
+    """
+    yslices, sid = np.unique(df[y].values, return_inverse=True)
+    count = np.bincount(sid)
+    x0 = np.bincount(sid, weights=df[x].values) / count
+    z0 = np.bincount(sid, weights=df[z].values) / count
+    angle = np.arctan2(df[z].values - z0[sid], df[x].values - x0[sid])
+
+    order = np.lexsort((angle, sid))
+    df = df.iloc[order].reset_index(drop=True)
+    df['slice'] = sid[order]
+    starts = np.concatenate(([0], np.cumsum(count)[:-1]))
+    return df, starts
+
+
+def next_point(sid, starts):
+    """Index of the next point around each (closed) section"""
+    nxt = np.arange(1, len(sid) + 1)
+    ends = np.append(starts[1:], len(sid)) - 1
+    nxt[ends] = starts
+    return nxt
+
+
+def first_max(values, sid, starts):
+    """Index of the (first) maximum of the values of each slice"""
+    vmax = np.maximum.reduceat(values, starts)
+    idx = np.flatnonzero(values == vmax[sid])
+    return idx[np.unique(sid[idx], return_index=True)[1]]
+
+
+def sectional_coefficients(df, starts, cp='cp', x='x', y='y', z='z'):
+    """Normal force, axial force and pitching moment of each section
+
+    `df` is sorted by `sort_sections` and `cp` is the pressure
+    coefficient. The closed contour integrals are computed with the
+    trapezoid rule. The chord line of each section goes from the
+    trailing edge (the most downstream point) to the leading edge (the
+    point farthest from it), so the loads are in the axes of the
+    pitched section: the normal force is perpendicular to the chord
+    line and the axial force along it. The coefficients are normalized
+    by the local chord and the moment is about the local quarter chord
+    (positive nose up).
+
+    Returns a dataframe with the columns y, chord, alpha (nose up
+    incidence of the chord line in degrees), cn, ca and cm.
+    """
+    sid = df['slice'].values
+    nslices = len(starts)
+    xs, zs, cps = df[x].values, df[z].values, df[cp].values
+    nxt = next_point(sid, starts)
+
+    # Chord line, unit vectors along it and normal to it
+    te = first_max(xs, sid, starts)
+    dist = np.hypot(xs - xs[te][sid], zs - zs[te][sid])
+    le = first_max(dist, sid, starts)
+    chord = dist[le]
+    cx = (xs[te] - xs[le]) / chord
+    cz = (zs[te] - zs[le]) / chord
+    xref = xs[le] + 0.25 * chord * cx
+    zref = zs[le] + 0.25 * chord * cz
+
+    dx = xs[nxt] - xs
+    dz = zs[nxt] - zs
+    cpm = 0.5 * (cps + cps[nxt])
+    xm = 0.5 * (xs + xs[nxt]) - xref[sid]
+    zm = 0.5 * (zs + zs[nxt]) - zref[sid]
+
+    # Force coefficients in the x and z directions, then in the chord
+    # axes
+    cfz = np.bincount(sid, weights=cpm * dx, minlength=nslices) / chord
+    cfx = -np.bincount(sid, weights=cpm * dz, minlength=nslices) / chord
+    cn = cfz * cx - cfx * cz
+    ca = cfx * cx + cfz * cz
+    cm = -np.bincount(sid, weights=cpm * (xm * dx + zm * dz),
+                      minlength=nslices) / chord**2
+
+    return pd.DataFrame({'y': df[y].values[starts],
+                         'chord': chord,
+                         'alpha': np.degrees(np.arctan2(-cz, cx)),
+                         'cn': cn,
+                         'ca': ca,
+                         'cm': cm})